@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+
+from app.services.cache_service import (
+    dataset_cache, metadata_cache, context_cache, answer_cache, parse_flight, preview_flight, answer_flight
+)
+from app.services.worker_pool import worker_pool
+
+router = APIRouter(tags=["Cache"])
+
+@router.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    Devuelve los contadores de los cachés (archivos procesados, metadatos,
+    contextos y respuestas), de los trabajos compartidos entre peticiones simultáneas y del
+    pool de workers
+    
+    Returns:
+        Dict[str, Any]: Aciertos, fallos, expulsiones, ocupación en bytes, trabajos
+        compartidos y trabajos pendientes
+    """
+    return {
+        "datasets": dataset_cache.stats(),
+        "metadata": metadata_cache.stats(),
+        "contexts": context_cache.stats(),
+        "answers": answer_cache.stats(),
+        "single_flight": {
+            "parses": parse_flight.stats(),
+            "previews": preview_flight.stats(),
+            "answers": answer_flight.stats(),
+        },
+        "workers": worker_pool.stats(),
+    }
@@ -1,9 +1,19 @@
+import asyncio
+import json
+import time
 from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional
 
-from app.models.schemas import ChatRequest, ChatResponse
-from app.services.excel_service import ExcelService
+import pandas as pd
+
+from app.core.config import settings
+from app.models.schemas import ChatRequest, ChatResponse, BatchChatRequest, BatchChatResponse
+from app.services.excel_service import ExcelService, SheetNotFoundError
 from app.services.ai_service import AIService
+from app.services.query_service import QueryService
+from app.services.worker_pool import WorkerPoolSaturatedError
+from app.services.metrics import ANSWERS
 
 router = APIRouter(tags=["Chat"])
 
@@ -22,17 +32,30 @@ async def chat_with_excel(request: ChatRequest):
         # Obtener la ruta del archivo
         file_path = ExcelService.get_file_path(request.filename)
         
-        # Leer el archivo (Excel o CSV)
-        df, summary = ExcelService.read_file(file_path)
+        # Leer el archivo (Excel o CSV); en los libros, la hoja indicada o la primera
+        sheet = await ExcelService.resolve_sheet_async(file_path, request.sheet)
+        df, summary = await ExcelService.read_file_async(file_path, sheet)
+        
+        # Las preguntas de agregación simples se calculan localmente, sin llamar al
+        # modelo, en un hilo aparte (con un pool de procesos habría que copiar el DataFrame)
+        answer = await asyncio.to_thread(QueryService.try_answer, df, summary, request.question)
+        source = "local"
         
-        # Obtener respuesta del modelo de IA
-        answer = await AIService.get_answer(df, summary, request.question)
+        if answer is not None:
+            ANSWERS.inc(source="local")
+        else:
+            # Obtener respuesta del modelo de IA (en caché si la pregunta ya se hizo sobre esta versión)
+            dataset_version = await asyncio.to_thread(ExcelService.get_dataset_version, file_path)
+            answer = await AIService.get_answer(df, summary, request.question, dataset_version, sheet)
+            source = "ai"
         
         # Preparar contexto simplificado para la respuesta
         simplified_context = {
+            "sheet": sheet,
             "rows": summary["rows"],
             "columns": summary["columns"],
-            "column_names": summary["column_names"]
+            "column_names": summary["column_names"],
+            "source": source
         }
         
         return ChatResponse(
@@ -43,5 +66,170 @@ async def chat_with_excel(request: ChatRequest):
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"Archivo {request.filename} no encontrado")
     
+    except SheetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    except WorkerPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="El procesamiento del archivo superó el tiempo máximo")
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al procesar la consulta: {str(e)}")
+
+async def _answer_batch_question(
+    df: pd.DataFrame,
+    summary: Dict[str, Any],
+    question: str,
+    dataset_version: str,
+    sheet: Optional[str],
+    limit: asyncio.Semaphore
+) -> Dict[str, Any]:
+    """
+    Responde una pregunta de un lote; los errores se devuelven en la respuesta
+    en lugar de propagarse, para no interrumpir el resto del lote
+    """
+    async with limit:
+        start = time.perf_counter()
+        result: Dict[str, Any] = {"question": question}
+        try:
+            answer = await asyncio.to_thread(QueryService.try_answer, df, summary, question)
+            if answer is not None:
+                ANSWERS.inc(source="local")
+                result.update(answer=answer, source="local")
+            else:
+                answer = await AIService.get_answer(df, summary, question, dataset_version, sheet)
+                result.update(answer=answer, source="ai")
+        except HTTPException as e:
+            result["error"] = str(e.detail)
+        except Exception as e:
+            result["error"] = f"Error al procesar la consulta: {str(e)}"
+        result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return result
+
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_with_excel_batch(request: BatchChatRequest):
+    """
+    Procesa varias preguntas sobre un mismo archivo: lo lee y genera el contexto
+    una sola vez y responde las preguntas a la vez (hasta CHAT_BATCH_CONCURRENCY).
+    Un error en una pregunta se devuelve en su respuesta sin afectar a las demás.
+    
+    Args:
+        request: Solicitud con nombre de archivo, hoja y lista de preguntas
+        
+    Returns:
+        BatchChatResponse: Respuesta, origen, error y tiempo de cada pregunta (en el
+        mismo orden que las preguntas)
+    """
+    start = time.perf_counter()
+    try:
+        file_path = ExcelService.get_file_path(request.filename)
+        sheet = await ExcelService.resolve_sheet_async(file_path, request.sheet)
+        df, summary = await ExcelService.read_file_async(file_path, sheet)
+        dataset_version = await asyncio.to_thread(ExcelService.get_dataset_version, file_path)
+        
+        # El contexto se genera una vez (en un hilo, fuera del event loop) antes de
+        # repartir las preguntas; las llamadas al modelo lo toman del caché
+        await asyncio.to_thread(AIService.get_context_profile, df, summary, dataset_version, sheet)
+    
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Archivo {request.filename} no encontrado")
+    
+    except SheetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    except WorkerPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="El procesamiento del archivo superó el tiempo máximo")
+    
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al procesar la consulta: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al procesar la consulta: {str(e)}")
+    
+    limit = asyncio.Semaphore(settings.CHAT_BATCH_CONCURRENCY)
+    answers = await asyncio.gather(*(
+        _answer_batch_question(df, summary, question, dataset_version, sheet, limit)
+        for question in request.questions
+    ))
+    
+    return BatchChatResponse(
+        answers=answers,
+        context={
+            "sheet": sheet,
+            "rows": summary["rows"],
+            "columns": summary["columns"],
+            "column_names": summary["column_names"],
+        },
+        elapsed_ms=(time.perf_counter() - start) * 1000
+    )
+
+@router.post("/chat/stream")
+async def chat_with_excel_stream(request: ChatRequest):
+    """
+    Procesa una pregunta sobre un archivo Excel y devuelve la respuesta como
+    Server-Sent Events, enviando cada fragmento en cuanto lo genera el modelo
+    
+    Eventos:
+        data: {"delta": "..."}            fragmento de la respuesta
+        event: done / data: {"context"}   fin de la respuesta
+        event: error / data: {"detail"}   error a mitad de la respuesta
+    
+    Args:
+        request: Solicitud de chat con nombre de archivo y pregunta
+        
+    Returns:
+        StreamingResponse: Flujo text/event-stream
+    """
+    try:
+        file_path = ExcelService.get_file_path(request.filename)
+        sheet = await ExcelService.resolve_sheet_async(file_path, request.sheet)
+        df, summary = await ExcelService.read_file_async(file_path, sheet)
+        dataset_version = await asyncio.to_thread(ExcelService.get_dataset_version, file_path)
+    
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Archivo {request.filename} no encontrado")
+    
+    except SheetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    except WorkerPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="El procesamiento del archivo superó el tiempo máximo")
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al procesar la consulta: {str(e)}")
+    
+    local_answer = await asyncio.to_thread(QueryService.try_answer, df, summary, request.question)
+    if local_answer is not None:
+        ANSWERS.inc(source="local")
+    simplified_context = {
+        "sheet": sheet,
+        "rows": summary["rows"],
+        "columns": summary["columns"],
+        "column_names": summary["column_names"],
+        "source": "ai" if local_answer is None else "local"
+    }
+    
+    async def events():
+        try:
+            if local_answer is not None:
+                yield f"data: {json.dumps({'delta': local_answer}, ensure_ascii=False)}\n\n"
+            else:
+                async for delta in AIService.stream_answer(df, summary, request.question, dataset_version, sheet):
+                    yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+            yield f"event: done\ndata: {json.dumps({'context': simplified_context}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error en OpenAI: {str(e)}'}, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
\ No newline at end of file
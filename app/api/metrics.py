@@ -0,0 +1,98 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+import asyncio
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.services.cache_service import (
+    dataset_cache, context_cache, answer_cache, parse_flight, preview_flight, answer_flight
+)
+from app.services.metrics import registry, Gauge
+from app.services.worker_pool import worker_pool
+from app.services.janitor import janitor
+
+router = APIRouter(tags=["Metrics"])
+
+CACHES = {"datasets": dataset_cache, "contexts": context_cache, "answers": answer_cache}
+FLIGHTS = {"parses": parse_flight, "previews": preview_flight, "answers": answer_flight}
+
+# Estadísticas del catálogo (consultas a SQLite): se leen una vez por consulta de
+# las métricas, fuera del event loop, y las comparten todos sus indicadores
+_catalog_stats: Dict[str, Any] = {}
+
+
+def _cache_stat(field: str) -> List[Tuple[Sequence[str], float]]:
+    return [((name,), cache.stats()[field]) for name, cache in CACHES.items()]
+
+
+def _flight_stat(field: str) -> List[Tuple[Sequence[str], float]]:
+    return [((name,), flight.stats()[field]) for name, flight in FLIGHTS.items()]
+
+
+def _worker_stat(field: str) -> List[Tuple[Sequence[str], float]]:
+    stats = worker_pool.stats()
+    return [((stats["kind"],), stats[field])]
+
+
+# Los contadores de cachés y workers se leen en el momento de la consulta
+for field, kind, documentation in [
+    ("entries", "gauge", "Entradas en caché"),
+    ("bytes", "gauge", "Bytes ocupados en caché"),
+    ("max_bytes", "gauge", "Capacidad del caché en bytes"),
+    ("hits", "counter", "Aciertos de caché"),
+    ("misses", "counter", "Fallos de caché"),
+    ("evictions", "counter", "Entradas expulsadas por falta de espacio"),
+    ("invalidations", "counter", "Entradas invalidadas al cambiar o borrar un archivo"),
+    ("expirations", "counter", "Entradas caducadas"),
+]:
+    suffix = "_total" if kind == "counter" else ""
+    registry.register(Gauge(
+        f"excelia_cache_{field}{suffix}", documentation, ["cache"],
+        lambda field=field: _cache_stat(field), kind=kind
+    ))
+
+for field, kind, documentation in [
+    ("in_flight", "gauge", "Trabajos compartidos en curso"),
+    ("executions", "counter", "Trabajos ejecutados (análisis, vistas previas, llamadas al modelo)"),
+    ("coalesced", "counter", "Peticiones que reutilizaron un trabajo idéntico en curso"),
+]:
+    suffix = "_total" if kind == "counter" else ""
+    registry.register(Gauge(
+        f"excelia_singleflight_{field}{suffix}", documentation, ["flight"],
+        lambda field=field: _flight_stat(field), kind=kind
+    ))
+
+for field, kind, documentation in [
+    ("pending", "gauge", "Trabajos pendientes (en ejecución y en cola) del pool de workers"),
+    ("completed", "counter", "Trabajos terminados por el pool de workers"),
+    ("rejected", "counter", "Trabajos rechazados por saturación del pool"),
+    ("timeouts", "counter", "Trabajos que superaron el tiempo máximo"),
+]:
+    suffix = "_total" if kind == "counter" else ""
+    registry.register(Gauge(
+        f"excelia_worker_{field}{suffix}", documentation, ["kind"],
+        lambda field=field: _worker_stat(field), kind=kind
+    ))
+
+for field, documentation in [
+    ("files", "Archivos registrados en el catálogo"),
+    ("storage_bytes", "Espacio en disco de los archivos y sus artefactos derivados"),
+    ("quota_bytes", "Cuota de almacenamiento en bytes (0 sin límite)"),
+]:
+    registry.register(Gauge(
+        f"excelia_catalog_{field}", documentation, [],
+        lambda field=field: [((), _catalog_stats.get(field, 0))]
+    ))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Expone las métricas en formato de texto de Prometheus: histogramas de latencia
+    por etapa y por endpoint, bytes analizados, estado de los cachés y del pool de
+    workers y tokens consumidos por el modelo
+    
+    Returns:
+        PlainTextResponse: Texto de exposición (versión 0.0.4)
+    """
+    _catalog_stats.update(await asyncio.to_thread(janitor.stats))
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
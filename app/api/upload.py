@@ -1,11 +1,19 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
-import uuid
-from typing import List
+import asyncio
+import itertools
+from urllib.parse import quote
+from typing import List, Optional
 
-from app.services.excel_service import ExcelService
-from app.models.schemas import FilePreview
+from app.core.config import settings
+from app.services.excel_service import (
+    ExcelService, FileTooLargeError, SheetNotFoundError, ColumnNotFoundError, SchemaMismatchError
+)
+from app.services.catalog_service import catalog
+from app.services.export_service import EXPORT_FORMATS
+from app.services.worker_pool import WorkerPoolSaturatedError
+from app.models.schemas import FilePreview, SheetInfo, RowsPage, FileCatalogPage, AppendResult
 
 router = APIRouter(tags=["Upload"])
 
@@ -26,46 +34,124 @@ async def upload_excel(
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(status_code=400, detail="El archivo debe ser Excel (.xlsx o .xls) o CSV (.csv)")
     
+    # Rechazar de inmediato si el tamaño ya se conoce y supera el límite
+    if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El archivo supera el tamaño máximo permitido ({settings.MAX_UPLOAD_BYTES} bytes)"
+        )
+    
     try:
-        # Leer el contenido del archivo
-        file_content = await file.read()
-        
-        # Generar un nombre único para el archivo
-        unique_filename = f"{uuid.uuid4().hex}_{file.filename}"
+        # Guardar el archivo por bloques; si el contenido ya existe se reutiliza
+        file_path, deduplicated = await ExcelService.save_upload(file, file.filename)
         
-        # Guardar el archivo
-        file_path = ExcelService.save_file(file_content, unique_filename)
+        # Generar la copia columnar para las lecturas posteriores (en el pool de workers)
+        await ExcelService.convert_to_columnar(file_path)
         
         # Obtener vista previa
-        preview = ExcelService.get_preview(file_path)
+        preview = await ExcelService.get_preview_async(file_path)
+        preview["deduplicated"] = deduplicated
         
         return preview
     
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    except WorkerPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="El procesamiento del archivo superó el tiempo máximo")
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al procesar el archivo: {str(e)}")
 
 @router.get("/files/", response_model=List[str])
-async def list_files():
+async def list_files(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.ROWS_DEFAULT_LIMIT, ge=1, le=settings.ROWS_MAX_LIMIT)
+):
     """
-    Lista todos los archivos Excel disponibles
+    Lista los archivos disponibles, de los más recientes a los más antiguos
+    
+    Args:
+        offset: Primer archivo (desde 0)
+        limit: Número máximo de archivos
     
     Returns:
         List[str]: Lista de nombres de archivos
     """
     try:
-        files = [f for f in os.listdir(ExcelService.TEMP_DIR) 
-                if f.endswith(('.xlsx', '.xls', '.csv'))]
-        return files
+        # Consultas a SQLite fuera del event loop
+        return await asyncio.to_thread(catalog.names, offset, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar archivos: {str(e)}")
 
+@router.get("/files/catalog", response_model=FileCatalogPage)
+async def get_file_catalog(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.ROWS_DEFAULT_LIMIT, ge=1, le=settings.ROWS_MAX_LIMIT)
+):
+    """
+    Lista los archivos con su entrada completa en el catálogo (resumen, hash,
+    tamaño y fechas de subida y último acceso)
+    
+    Args:
+        offset: Primer archivo (desde 0)
+        limit: Número máximo de archivos
+    
+    Returns:
+        FileCatalogPage: Página del catálogo
+    """
+    try:
+        # Consultas a SQLite fuera del event loop
+        total = await asyncio.to_thread(catalog.count)
+        files = await asyncio.to_thread(catalog.records, offset, limit)
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "files": files,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al leer el catálogo: {str(e)}")
+
+@router.get("/files/{filename}/sheets", response_model=List[SheetInfo])
+async def list_sheets(filename: str):
+    """
+    Lista las hojas de un libro Excel con sus dimensiones y encabezados
+    
+    Args:
+        filename: Nombre del archivo
+        
+    Returns:
+        List[SheetInfo]: Una entrada por hoja (vacía para CSV)
+    """
+    file_path = ExcelService.get_file_path(filename)
+    
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    if not file_path.endswith('.xlsx'):
+        return []
+    
+    try:
+        return await ExcelService.run_sheet_index(file_path)
+    except WorkerPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="La lectura de las hojas superó el tiempo máximo")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al leer las hojas: {str(e)}")
+
 @router.get("/files/{filename}/preview", response_model=FilePreview)
-async def get_file_preview(filename: str):
+async def get_file_preview(filename: str, sheet: Optional[str] = Query(None)):
     """
     Obtiene una vista previa de un archivo Excel existente
     
     Args:
         filename: Nombre del archivo
+        sheet: Hoja del libro (por defecto la primera)
         
     Returns:
         FilePreview: Vista previa del archivo
@@ -76,11 +162,173 @@ async def get_file_preview(filename: str):
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     try:
-        preview = ExcelService.get_preview(file_path)
+        preview = await ExcelService.get_preview_async(file_path, sheet=sheet)
         return preview
+    except SheetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except WorkerPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="La vista previa superó el tiempo máximo")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener vista previa: {str(e)}")
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Indica si la cabecera If-None-Match incluye el ETag (comparación débil)"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in (value[2:] if value.startswith("W/") else value for value in candidates)
+
+@router.get("/files/{filename}/rows", response_model=RowsPage)
+async def get_file_rows(
+    filename: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.ROWS_DEFAULT_LIMIT, ge=1, le=settings.ROWS_MAX_LIMIT),
+    columns: Optional[List[str]] = Query(None),
+    sheet: Optional[str] = Query(None)
+):
+    """
+    Obtiene una página de filas de un archivo, opcionalmente solo algunas columnas.
+    Las páginas sin cambios se responden con 304 si el cliente envía If-None-Match.
+    
+    Args:
+        filename: Nombre del archivo
+        offset: Primera fila (desde 0)
+        limit: Número máximo de filas
+        columns: Columnas a devolver (parámetro repetido o separadas por comas)
+        sheet: Hoja del libro (por defecto la primera)
+        
+    Returns:
+        RowsPage: Página de filas
+    """
+    file_path = ExcelService.get_file_path(filename)
+    
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    if columns:
+        # "?columns=a,b" equivale a "?columns=a&columns=b"
+        columns = [name.strip() for value in columns for name in value.split(",") if name.strip()]
+    
+    try:
+        # La versión puede requerir leer los metadatos o calcular el hash del archivo
+        etag = await asyncio.to_thread(ExcelService.rows_etag, file_path, offset, limit, columns, sheet)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        
+        page = await ExcelService.get_rows_async(file_path, offset, limit, columns, sheet)
+        return JSONResponse(content=page, headers=headers)
+    except SheetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ColumnNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkerPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="La lectura de filas superó el tiempo máximo")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener filas: {str(e)}")
+
+@router.get("/files/{filename}/export")
+async def export_file(
+    filename: str,
+    format: str = Query("ndjson"),
+    columns: Optional[List[str]] = Query(None),
+    sheet: Optional[str] = Query(None)
+):
+    """
+    Descarga la tabla completa de un archivo como NDJSON, CSV o Arrow IPC. Se
+    envía por bloques, sin tener todo el resultado en memoria.
+    
+    Args:
+        filename: Nombre del archivo
+        format: Formato de salida (ndjson, csv o arrow)
+        columns: Columnas a exportar (parámetro repetido o separadas por comas)
+        sheet: Hoja del libro (por defecto la primera)
+        
+    Returns:
+        StreamingResponse: Contenido del archivo en el formato pedido
+    """
+    file_path = ExcelService.get_file_path(filename)
+    
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato no válido. Formatos disponibles: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    if columns:
+        columns = [name.strip() for value in columns for name in value.split(",") if name.strip()]
+    
+    try:
+        await catalog.touch_async(filename)
+        sheet = await ExcelService.resolve_sheet_async(file_path, sheet)
+        # La preparación y el primer bloque se hacen antes de responder, para que
+        # los errores lleguen como código de estado y no como una descarga cortada.
+        # En un hilo y no en el pool de workers: el generador no puede pasar a otro proceso
+        body = await asyncio.to_thread(ExcelService.export, file_path, format, sheet, columns)
+        first = await asyncio.to_thread(next, body, b"")
+    except SheetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ColumnNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar el archivo: {str(e)}")
+    
+    media_type, extension, _ = EXPORT_FORMATS[format]
+    download = os.path.splitext(ExcelService.original_name(file_path))[0] + extension
+    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(download)}"}
+    return StreamingResponse(itertools.chain([first], body), media_type=media_type, headers=headers)
+
+@router.post("/files/{filename}/append", response_model=AppendResult)
+async def append_rows(filename: str, file: UploadFile = File(...)):
+    """
+    Añade al final de un CSV existente las filas de otro CSV con las mismas
+    columnas, sin volver a procesar el archivo completo
+    
+    Args:
+        filename: Nombre del archivo existente
+        file: CSV con las filas nuevas (con encabezado si el original lo tiene)
+        
+    Returns:
+        AppendResult: Filas añadidas, dimensiones y nueva versión del archivo
+    """
+    file_path = ExcelService.get_file_path(filename)
+    
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    if not filename.endswith('.csv') or not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Solo se pueden añadir filas CSV a archivos CSV")
+    
+    try:
+        result = await ExcelService.append_rows_async(file_path, file)
+        summary = result["summary"]
+        return {
+            "filename": filename,
+            "appended_rows": result["appended_rows"],
+            "rows": summary["rows"],
+            "columns": summary["columns"],
+            "column_names": summary["column_names"],
+            "version": result["version"],
+        }
+    except SchemaMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except WorkerPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="La ampliación del archivo superó el tiempo máximo")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al añadir filas: {str(e)}")
+
 @router.delete("/files/{filename}")
 async def delete_file(filename: str):
     """
@@ -95,7 +343,7 @@ async def delete_file(filename: str):
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     try:
-        os.remove(file_path)
+        ExcelService.delete_file(file_path)
         return {"message": f"Archivo {filename} eliminado correctamente"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al eliminar archivo: {str(e)}")
@@ -11,6 +11,94 @@ class Settings(BaseSettings):
     # Directorio temporal para archivos
     TEMP_DIR: str = "temp_files"
     
+    # Tamaño máximo de un archivo subido y tamaño de bloque al guardarlo
+    MAX_UPLOAD_BYTES: int = 1024 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    
+    # Bytes iniciales usados para detectar el dialecto de un CSV y motor de lectura ("c" o "pyarrow")
+    CSV_SNIFF_BYTES: int = 64 * 1024
+    CSV_ENGINE: str = "c"
+    
+    # Archivos mayores que este tamaño se procesan por bloques de CHUNK_ROWS filas,
+    # conservando en memoria solo una muestra de CHUNKED_SAMPLE_ROWS filas
+    CHUNKED_THRESHOLD_BYTES: int = 256 * 1024 * 1024
+    CHUNK_ROWS: int = 100_000
+    CHUNKED_SAMPLE_ROWS: int = 1000
+    
+    # Memoria máxima (bytes) del caché de DataFrames procesados
+    DATASET_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    
+    # Metadatos ya leídos de los archivos (bytes de JSON), para no volver a leerlos en cada petición
+    METADATA_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    
+    # Cachés de contextos de prompt y de respuestas del modelo (bytes, caducidad en s)
+    CONTEXT_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    ANSWER_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    ANSWER_CACHE_TTL: float = 3600.0
+    
+    # Pool de workers para el análisis de archivos ("thread" o "process"),
+    # trabajos en cola admitidos antes de responder 503 y tiempo máximo por trabajo (s)
+    WORKER_POOL_KIND: str = "thread"
+    WORKER_POOL_SIZE: int = 4
+    WORKER_POOL_QUEUE: int = 16
+    WORKER_JOB_TIMEOUT: float = 120.0
+    
+    # OpenAI: credenciales, URL base opcional (servidor local compatible) y modelo
+    OPENAI_API_KEY: str = os.environ.get("OPENAI_API_KEY", "")
+    OPENAI_BASE_URL: str = os.environ.get("OPENAI_BASE_URL", "")
+    LLM_MODEL: str = "gpt-3.5-turbo"
+    LLM_TEMPERATURE: float = 0.3
+    LLM_MAX_TOKENS: int = 500
+    # Presupuesto (aproximado) de tokens del contexto del archivo en el prompt
+    LLM_CONTEXT_MAX_TOKENS: int = 1500
+    
+    # Conexiones y llamadas simultáneas al modelo, tiempo máximo por llamada (s)
+    # y reintentos con espera exponencial aleatoria
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TIMEOUT: float = 60.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+    
+    # Chat por lotes: preguntas por petición y preguntas resueltas a la vez
+    # (las llamadas al modelo siguen limitadas por LLM_MAX_CONCURRENCY)
+    CHAT_BATCH_MAX_QUESTIONS: int = 100
+    CHAT_BATCH_CONCURRENCY: int = 8
+    
+    # Catálogo de archivos (SQLite; por defecto dentro de TEMP_DIR) y limpieza periódica:
+    # se eliminan los archivos sin uso durante FILE_TTL_SECONDS y, si el espacio ocupado
+    # supera STORAGE_QUOTA_BYTES, los usados hace más tiempo (0 desactiva cada límite)
+    CATALOG_PATH: str = ""
+    FILE_TTL_SECONDS: float = 7 * 24 * 3600.0
+    STORAGE_QUOTA_BYTES: int = 10 * 1024 * 1024 * 1024
+    JANITOR_INTERVAL_SECONDS: float = 300.0
+    
+    # Perfil aproximado en el resumen: valores distintos (HyperLogLog), cuantiles
+    # (t-digest) y valores más frecuentes por columna, guardados con el archivo
+    APPROX_PROFILE: bool = True
+    
+    # Paginación del endpoint de filas
+    ROWS_DEFAULT_LIMIT: int = 100
+    ROWS_MAX_LIMIT: int = 1000
+    
+    # Exportación completa de un archivo: filas por bloque (limita la memoria usada)
+    EXPORT_CHUNK_ROWS: int = 10000
+    
+    # Compactación de los DataFrames tras la carga: tipos numéricos mínimos,
+    # categorías para el texto con pocos valores distintos (proporción máxima de
+    # valores únicos sobre no nulos) y texto Arrow para el resto
+    COMPACT_DATAFRAMES: bool = True
+    COMPACT_CATEGORY_MAX_RATIO: float = 0.5
+    
+    # Filas añadidas a un CSV: se guardan como segmentos de la copia columnar y,
+    # al llegar a este número de segmentos, se reescribe la copia completa
+    SIDECAR_MAX_SEGMENTS: int = 16
+    
+    # Observabilidad: nivel de los logs y registro de la duración de cada petición
+    LOG_LEVEL: str = "INFO"
+    LOG_REQUESTS: bool = True
+    
     # Token de Hugging Face
     HUGGINGFACE_API_KEY: str = os.environ.get("HUGGINGFACE_API_KEY", "")
     
@@ -1,20 +1,103 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, constr
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+from app.core.config import settings
+
 class FilePreview(BaseModel):
     """Esquema para la vista previa de un archivo Excel"""
     filename: str
-    rows: int
+    sheet: Optional[str] = None
+    sheets: Optional[List[str]] = None
+    # Sin dimensiones guardadas, rows es aproximado (rows_exact=False) o se omite
+    rows: Optional[int] = None
+    rows_exact: bool = True
     columns: int
     column_names: List[str]
     preview_data: List[Dict[str, Any]]
+    # Perfil aproximado por columna: distinct, distinct_exact, quantiles (numéricas) y top
+    approx_profile: Optional[Dict[str, Dict[str, Any]]] = None
+    deduplicated: bool = False
+
+class SheetInfo(BaseModel):
+    """Esquema para el índice de hojas de un libro Excel"""
+    name: str
+    rows: Optional[int] = None
+    columns: int
+    header: List[str]
+
+class RowsPage(BaseModel):
+    """Esquema para una página de filas de un archivo"""
+    filename: str
+    sheet: Optional[str] = None
+    offset: int
+    limit: int
+    total_rows: int
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+
+class AppendResult(BaseModel):
+    """Esquema para el resultado de añadir filas a un archivo"""
+    filename: str
+    appended_rows: int
+    rows: int
+    columns: int
+    column_names: List[str]
+    version: str
+
+class FileRecord(BaseModel):
+    """Esquema para la entrada de un archivo en el catálogo"""
+    filename: str
+    original_name: str
+    format: str
+    content_hash: Optional[str] = None
+    size_bytes: int
+    storage_bytes: int
+    rows: Optional[int] = None
+    columns: Optional[int] = None
+    column_names: Optional[List[str]] = None
+    dtypes: Optional[Dict[str, str]] = None
+    sheets: Optional[List[str]] = None
+    summary: Optional[Dict[str, Any]] = None
+    uploaded_at: datetime
+    last_accessed_at: datetime
+
+class FileCatalogPage(BaseModel):
+    """Esquema para una página del catálogo de archivos"""
+    total: int
+    offset: int
+    limit: int
+    files: List[FileRecord]
 
 class ChatRequest(BaseModel):
     """Esquema para solicitudes de chat"""
     filename: str
+    sheet: Optional[str] = None
     question: str = Field(..., min_length=1, max_length=500)
 
 class ChatResponse(BaseModel):
     """Esquema para respuestas de chat"""
     answer: str
     context: Optional[Dict[str, Any]] = None
+
+class BatchChatRequest(BaseModel):
+    """Esquema para solicitudes de chat con varias preguntas sobre un archivo"""
+    filename: str
+    sheet: Optional[str] = None
+    questions: List[constr(min_length=1, max_length=500)] = Field(
+        ..., min_items=1, max_items=settings.CHAT_BATCH_MAX_QUESTIONS
+    )
+
+class BatchAnswer(BaseModel):
+    """Esquema para la respuesta a una de las preguntas de un lote"""
+    question: str
+    answer: Optional[str] = None
+    source: Optional[str] = None
+    error: Optional[str] = None
+    elapsed_ms: float
+
+class BatchChatResponse(BaseModel):
+    """Esquema para respuestas de chat por lotes"""
+    answers: List[BatchAnswer]
+    context: Dict[str, Any]
+    elapsed_ms: float
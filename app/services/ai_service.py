@@ -1,74 +1,175 @@
-import os
-from typing import Dict, Any, Tuple
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Any, Tuple, List, AsyncIterator, Awaitable, Callable, Optional, Set, TypeVar
+import httpx
 import pandas as pd
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI
 from fastapi import HTTPException
 
+from app.core.config import settings
+from app.services.cache_service import context_cache, answer_cache, answer_flight
+from app.services.context_builder import ContextProfile, build_context_profile, normalize_text
+from app.services.metrics import span, observe_stage, ANSWERS, LLM_REQUESTS, LLM_RETRIES, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errores transitorios de la API que justifican reintentar la llamada
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+SYSTEM_PROMPT = (
+    "Eres un asistente que analiza datos de archivos Excel. "
+    "Responde preguntas basándote únicamente en el contexto proporcionado."
+)
+
 class AIService:
     """Servicio para interactuar con OpenAI API"""
-    
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY no está configurada")
-        self.client = OpenAI(api_key=api_key)
 
-    @staticmethod
-    def generate_dataframe_context(df: pd.DataFrame, summary: Dict[str, Any]) -> str:
+    # Cliente asíncrono compartido (un único pool de conexiones por proceso)
+    _client: Optional[AsyncOpenAI] = None
+    # Límite global de llamadas simultáneas al modelo
+    _semaphore: Optional[asyncio.Semaphore] = None
+    # Event loop al que pertenecen el cliente y el semáforo
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    # Cierres pendientes de clientes de loops anteriores (referencia para que no se pierdan)
+    _closing: Set[Any] = set()
+
+    @classmethod
+    def get_client(cls) -> AsyncOpenAI:
         """
-        Genera un contexto estructurado para el prompt de OpenAI.
-        Ejemplo de salida:
-        '''
-        El archivo tiene 100 filas y 5 columnas: [Ventas, Fecha, Producto, ...].
-        - Ventas: promedio=150 (min=10, max=300)
-        - Producto: valores únicos: [Laptop, Teléfono, Tablet]
-        Ejemplos de datos:
-        - Fila 1: Ventas=200, Fecha=2023-01-01, Producto=Laptop
-        '''
+        Obtiene el cliente compartido, creándolo en el primer uso
+
+        Returns:
+            AsyncOpenAI: Cliente con pool de conexiones acotado
         """
-        context_lines = [
-            f"El archivo tiene {summary['rows']} filas y {summary['columns']} columnas: {', '.join(summary['column_names'])}."
-        ]
+        cls._bind_loop()
+        if cls._client is None:
+            if not settings.OPENAI_API_KEY:
+                raise ValueError("OPENAI_API_KEY no está configurada")
 
-        # Estadísticas numéricas
-        if summary.get("numeric_columns"):
-            context_lines.append("\nEstadísticas numéricas:")
-            for col in summary["numeric_columns"]:
-                if col in summary.get("numeric_stats", {}).get("mean", {}):
-                    stats = summary["numeric_stats"]
-                    context_lines.append(
-                        f"- {col}: promedio={stats['mean'][col]:.2f} (min={stats['min'][col]}, max={stats['max'][col]})"
+            cls._client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                # Permite apuntar a un servidor local compatible (pruebas, proxies)
+                base_url=settings.OPENAI_BASE_URL or None,
+                timeout=settings.LLM_TIMEOUT,
+                # Los reintentos se gestionan aquí, con espera aleatoria
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
                     )
+                ),
+            )
+        return cls._client
+
+    @classmethod
+    def _bind_loop(cls) -> None:
+        # El pool de conexiones y el semáforo solo son válidos en el event loop que
+        # los creó (p. ej. TestClient usa un loop por petición): recrearlos si cambia
+        loop = asyncio.get_running_loop()
+        if cls._loop is not loop:
+            if cls._client is not None:
+                cls._close_client(cls._client, cls._loop)
+            cls._loop = loop
+            cls._client = None
+            cls._semaphore = None
+
+    @classmethod
+    def _close_client(cls, client: AsyncOpenAI, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """
+        Cierra en segundo plano el cliente de otro event loop para liberar su pool
+        de conexiones: en su propio loop si sigue en marcha o, si no, en el actual
+
+        Args:
+            client: Cliente que se deja de usar
+            loop: Event loop en el que se creó
+        """
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            future = asyncio.run_coroutine_threadsafe(cls._close_quietly(client), loop)
+        else:
+            future = asyncio.get_running_loop().create_task(cls._close_quietly(client))
+        cls._closing.add(future)
+        future.add_done_callback(cls._closing.discard)
 
-        # Valores categóricos
-        if summary.get("categorical_columns"):
-            context_lines.append("\nValores únicos en columnas categóricas:")
-            for col in summary["categorical_columns"][:3]:  # Limitar a 3 columnas
-                unique_vals = df[col].dropna().unique()[:5]
-                if len(unique_vals) > 0:
-                    context_lines.append(f"- {col}: {', '.join(map(str, unique_vals))}")
+    @staticmethod
+    async def _close_quietly(client: AsyncOpenAI) -> None:
+        try:
+            await client.close()
+        except Exception as e:
+            # Conexiones de un loop ya cerrado: no se pueden cerrar de forma ordenada
+            logger.debug("Error al cerrar el cliente de un event loop anterior: %s", e)
 
-        # Ejemplos de datos
-        if not df.empty:
-            context_lines.append("\nPrimeras filas de ejemplo:")
-            for _, row in df.head(2).iterrows():
-                example = ", ".join(f"{k}={v}" for k, v in row.items()[:3])
-                context_lines.append(f"- {example}")
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        cls._bind_loop()
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        return cls._semaphore
 
-        return "\n".join(context_lines)
+    @classmethod
+    async def close(cls) -> None:
+        """Cierra el cliente compartido y su pool de conexiones"""
+        if cls._client is not None:
+            if cls._loop is asyncio.get_running_loop():
+                await cls._client.close()
+            else:
+                cls._close_client(cls._client, cls._loop)
+        cls._client = None
+
+    @staticmethod
+    def generate_dataframe_context(
+        df: pd.DataFrame,
+        summary: Dict[str, Any],
+        question: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        Genera un contexto estructurado para el prompt de OpenAI, acotado a un
+        presupuesto de tokens y con las columnas más relevantes para la pregunta.
+        Ejemplo de salida:
+        '''
+        El archivo tiene 100 filas y 5 columnas: Ventas, Fecha, Producto, ...
+        Estadísticas numéricas:
+        - Ventas: promedio=150.00 (min=10, max=300)
+        Valores más frecuentes en columnas categóricas:
+        - Producto (3 valores distintos): Laptop, Teléfono, Tablet
+        Primeras filas de ejemplo:
+        - Ventas=200, Producto=Laptop
+        '''
+
+        Args:
+            df: DataFrame del archivo
+            summary: Resumen del archivo
+            question: Pregunta del usuario (ordena las columnas por relevancia)
+            max_tokens: Presupuesto de tokens (por defecto LLM_CONTEXT_MAX_TOKENS)
+
+        Returns:
+            str: Contexto para el prompt
+        """
+        return build_context_profile(df, summary).render(question, max_tokens)
 
     @staticmethod
     def process_file_data(file_data: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         """Convierte los datos del archivo en DataFrame y summary"""
         try:
             df = pd.DataFrame(file_data.get("data", []))
-            
+
             summary = {
                 "rows": len(df),
                 "columns": len(df.columns),
                 "column_names": list(df.columns),
                 "numeric_columns": df.select_dtypes(include=['number']).columns.tolist(),
-                "categorical_columns": df.select_dtypes(include=['object', 'category']).columns.tolist(),
+                "categorical_columns": df.select_dtypes(include=['object', 'category', 'string']).columns.tolist(),
                 "numeric_stats": {
                     "mean": df.mean(numeric_only=True).to_dict(),
                     "min": df.min(numeric_only=True).to_dict(),
@@ -79,30 +180,286 @@ class AIService:
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Error procesando datos: {str(e)}")
 
-    def get_answer(self, file_data: Dict[str, Any], question: str) -> str:
-        """Versión adaptada para recibir datos del frontend"""
+    @staticmethod
+    def build_messages(context: str, question: str) -> List[Dict[str, str]]:
+        """Construye los mensajes del chat a partir del contexto y la pregunta"""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Contexto:\n{context}\n\nPregunta: {question}"}
+        ]
+
+    @staticmethod
+    async def _with_retries(call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ejecuta una llamada a la API reintentando los errores transitorios
+        con espera exponencial y aleatoria (full jitter)
+
+        Args:
+            call: Función que lanza la llamada
+
+        Returns:
+            T: Resultado de la llamada
+        """
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= settings.LLM_MAX_RETRIES:
+                    raise
+                cap = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt)
+                logger.warning("Error transitorio del modelo (intento %d): %s", attempt + 1, e)
+                LLM_RETRIES.inc()
+                await asyncio.sleep(random.uniform(0, cap))
+                attempt += 1
+
+    @staticmethod
+    def _record_usage(usage: Any) -> None:
+        """Suma los tokens consumidos por una llamada (si la API los informa)"""
+        if usage is None:
+            return
+        LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+        LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """
+        Normaliza una pregunta para usarla como clave de caché: minúsculas,
+        sin tildes, sin signos de puntuación y con espacios simples
+        
+        Args:
+            question: Pregunta del usuario
+
+        Returns:
+            str: Pregunta normalizada
+        """
+        return normalize_text(question)
+
+    @staticmethod
+    def get_context_profile(
+        df: pd.DataFrame,
+        summary: Dict[str, Any],
+        dataset_version: Optional[str] = None,
+        sheet: Optional[str] = None
+    ) -> ContextProfile:
+        """
+        Obtiene los fragmentos de contexto por columna, reutilizándolos mientras el
+        archivo no cambie (no dependen de la pregunta)
+
+        Args:
+            df: DataFrame del archivo
+            summary: Resumen del archivo
+            dataset_version: Versión (hash del contenido) del archivo; sin ella no se usa caché
+            sheet: Hoja del libro a la que corresponde el DataFrame
+
+        Returns:
+            ContextProfile: Fragmentos de contexto de todas las columnas
+        """
+        if dataset_version is None:
+            with span("build_context"):
+                return build_context_profile(df, summary)
+
+        key = (dataset_version, sheet)
+        profile = context_cache.get(key)
+        if profile is None:
+            with span("build_context"):
+                profile = build_context_profile(df, summary)
+            context_cache.put(key, profile)
+        return profile
+
+    @staticmethod
+    def get_context(
+        df: pd.DataFrame,
+        summary: Dict[str, Any],
+        dataset_version: Optional[str] = None,
+        sheet: Optional[str] = None,
+        question: Optional[str] = None
+    ) -> str:
+        """
+        Obtiene el contexto del prompt para una pregunta: las columnas más
+        relevantes que caben en LLM_CONTEXT_MAX_TOKENS
+
+        Args:
+            df: DataFrame del archivo
+            summary: Resumen del archivo
+            dataset_version: Versión (hash del contenido) del archivo; sin ella no se usa caché
+            sheet: Hoja del libro a la que corresponde el DataFrame
+            question: Pregunta del usuario
+
+        Returns:
+            str: Contexto para el prompt
+        """
+        profile = AIService.get_context_profile(df, summary, dataset_version, sheet)
+        with span("rank_context"):
+            return profile.render(question)
+
+    @staticmethod
+    def _answer_key(dataset_version: str, sheet: Optional[str], question: str) -> Tuple[Any, ...]:
+        """Clave del caché de respuestas"""
+        return (
+            dataset_version,
+            sheet,
+            AIService.normalize_question(question),
+            settings.LLM_MODEL,
+            settings.LLM_TEMPERATURE,
+        )
+
+    @staticmethod
+    async def get_answer(
+        df: pd.DataFrame,
+        summary: Dict[str, Any],
+        question: str,
+        dataset_version: Optional[str] = None,
+        sheet: Optional[str] = None
+    ) -> str:
+        """
+        Obtiene la respuesta completa del modelo a una pregunta sobre el archivo.
+        Las respuestas se guardan en caché por versión del archivo y pregunta normalizada,
+        y las preguntas idénticas que llegan a la vez comparten la misma llamada.
+
+        Args:
+            df: DataFrame del archivo
+            summary: Resumen del archivo
+            question: Pregunta del usuario
+            dataset_version: Versión (hash del contenido) del archivo; sin ella no se usa caché
+            sheet: Hoja del libro a la que corresponde el DataFrame
+
+        Returns:
+            str: Respuesta generada
+        """
         if not question:
             raise ValueError("Se requiere una pregunta")
-            
+
+        if dataset_version is None:
+            answer = await AIService._complete(df, summary, question, None, sheet)
+            ANSWERS.inc(source="ai")
+            return answer
+
+        answer_key = AIService._answer_key(dataset_version, sheet, question)
+        cached = answer_cache.get(answer_key)
+        if cached is not None:
+            ANSWERS.inc(source="cache")
+            return cached
+
+        # Las preguntas idénticas simultáneas comparten una única llamada al modelo
+        shared = answer_flight.in_flight(answer_key)
+        answer = await answer_flight.run(
+            answer_key, lambda: AIService._complete(df, summary, question, dataset_version, sheet)
+        )
+        ANSWERS.inc(source="coalesced" if shared else "ai")
+        return answer
+
+    @staticmethod
+    async def _complete(
+        df: pd.DataFrame,
+        summary: Dict[str, Any],
+        question: str,
+        dataset_version: Optional[str],
+        sheet: Optional[str]
+    ) -> str:
+        """Llama al modelo para obtener la respuesta completa y la guarda en caché"""
         try:
-            df, summary = self.process_file_data(file_data)
-            context = self.generate_dataframe_context(df, summary)
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un asistente que analiza datos de archivos Excel. Responde preguntas basándote únicamente en el contexto proporcionado."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Contexto:\n{context}\n\nPregunta: {question}"
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-            return response.choices[0].message.content.strip()
+            context = await asyncio.to_thread(AIService.get_context, df, summary, dataset_version, sheet, question)
+            client = AIService.get_client()
+            messages = AIService.build_messages(context, question)
+
+            async with AIService._get_semaphore():
+                with span("llm_call"):
+                    response = await AIService._with_retries(
+                        lambda: client.chat.completions.create(
+                            model=settings.LLM_MODEL,
+                            messages=messages,
+                            temperature=settings.LLM_TEMPERATURE,
+                            max_tokens=settings.LLM_MAX_TOKENS
+                        )
+                    )
+            AIService._record_usage(getattr(response, "usage", None))
+            answer = response.choices[0].message.content.strip()
         except Exception as e:
+            LLM_REQUESTS.inc(mode="complete", outcome="error")
+            logger.error("Error en OpenAI: %s", e)
             raise HTTPException(status_code=500, detail=f"Error en OpenAI: {str(e)}")
+
+        LLM_REQUESTS.inc(mode="complete", outcome="ok")
+
+        if dataset_version is not None:
+            answer_cache.put(AIService._answer_key(dataset_version, sheet, question), answer)
+        return answer
+
+    @staticmethod
+    async def stream_answer(
+        df: pd.DataFrame,
+        summary: Dict[str, Any],
+        question: str,
+        dataset_version: Optional[str] = None,
+        sheet: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Obtiene la respuesta del modelo como flujo de fragmentos de texto.
+        Solo se reintenta el establecimiento del flujo, nunca a mitad de respuesta.
+        Una respuesta ya en caché se envía en un único fragmento.
+
+        Args:
+            df: DataFrame del archivo
+            summary: Resumen del archivo
+            question: Pregunta del usuario
+            dataset_version: Versión (hash del contenido) del archivo; sin ella no se usa caché
+            sheet: Hoja del libro a la que corresponde el DataFrame
+
+        Yields:
+            str: Fragmentos de la respuesta según llegan
+        """
+        if not question:
+            raise ValueError("Se requiere una pregunta")
+
+        if dataset_version is not None:
+            answer_key = AIService._answer_key(dataset_version, sheet, question)
+            cached = answer_cache.get(answer_key)
+            if cached is not None:
+                ANSWERS.inc(source="cache")
+                yield cached
+                return
+
+        context = await asyncio.to_thread(AIService.get_context, df, summary, dataset_version, sheet, question)
+        client = AIService.get_client()
+        messages = AIService.build_messages(context, question)
+
+        parts = []
+        start = time.perf_counter()
+        try:
+            async with AIService._get_semaphore():
+                stream = await AIService._with_retries(
+                    lambda: client.chat.completions.create(
+                        model=settings.LLM_MODEL,
+                        messages=messages,
+                        temperature=settings.LLM_TEMPERATURE,
+                        max_tokens=settings.LLM_MAX_TOKENS,
+                        stream=True,
+                        # El último fragmento incluye los tokens consumidos
+                        stream_options={"include_usage": True}
+                    )
+                )
+                observe_stage("llm_first_chunk", time.perf_counter() - start)
+                try:
+                    async for chunk in stream:
+                        AIService._record_usage(getattr(chunk, "usage", None))
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            yield parts[-1]
+                finally:
+                    # También si el cliente se desconecta a mitad de respuesta: liberar
+                    # la conexión del pool y que el modelo deje de generar tokens
+                    await stream.close()
+        except Exception as e:
+            LLM_REQUESTS.inc(mode="stream", outcome="error")
+            logger.error("Error en OpenAI: %s", e)
+            raise
+        finally:
+            observe_stage("llm_stream", time.perf_counter() - start)
+
+        LLM_REQUESTS.inc(mode="stream", outcome="ok")
+        ANSWERS.inc(source="ai")
+
+        # Solo se guardan las respuestas completas
+        if dataset_version is not None:
+            answer_cache.put(answer_key, "".join(parts).strip())
@@ -0,0 +1,247 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+def estimate_dataset_size(value: Any) -> int:
+    """
+    Estima el tamaño en bytes de una entrada (DataFrame, resumen) del caché
+
+    Args:
+        value: Tupla (DataFrame, resumen) almacenada en el caché
+
+    Returns:
+        int: Tamaño aproximado en bytes
+    """
+    df, _summary = value
+    # deep=True cuenta también el contenido de las columnas de tipo object
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def estimate_text_size(value: str) -> int:
+    """Tamaño en bytes de un texto almacenado en caché (contextos, respuestas)"""
+    return len(value.encode("utf-8"))
+
+
+def estimate_metadata_size(value: Any) -> int:
+    """Tamaño en bytes de unos metadatos en caché: el del JSON del que se leyeron"""
+    (_mtime_ns, size, _inode), _metadata = value
+    return size
+
+
+def estimate_context_size(value: Any) -> int:
+    """Tamaño en bytes de los fragmentos de contexto de una hoja (ContextProfile)"""
+    return value.nbytes
+
+
+class LRUCache:
+    """
+    Caché LRU acotado por tamaño total en bytes (no por número de entradas),
+    con caducidad opcional de las entradas
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int], ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._expires: Dict[Hashable, float] = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+        # Contadores para dimensionar el caché
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Devuelve el valor asociado a la clave o None si no está en caché"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            if self.ttl is not None and self._expires[key] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Inserta un valor y expulsa las entradas menos usadas hasta respetar el límite
+
+        Args:
+            key: Clave de la entrada
+            value: Valor a almacenar
+        """
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # Una entrada mayor que todo el caché no se almacena
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = value
+            self._sizes[key] = size
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Elimina todas las entradas cuya clave cumpla el predicado
+
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Vacía el caché sin reiniciar los contadores"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._expires.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve los contadores y la ocupación actual del caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        del self._entries[key]
+        self._total_bytes -= self._sizes.pop(key)
+        self._expires.pop(key, None)
+
+
+class SingleFlight:
+    """
+    Agrupa las llamadas simultáneas con la misma clave: la primera ejecuta el
+    trabajo y las que llegan mientras tanto esperan y comparten su resultado (o
+    su excepción). El trabajo se ejecuta como tarea propia, de modo que si se
+    cancela la petición que lo inició las demás siguen esperando el resultado.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        # Contadores: trabajos ejecutados y llamadas que reutilizaron uno en curso
+        self.executions = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ejecuta fn() o, si ya hay una ejecución en curso con la misma clave, espera su resultado
+
+        Args:
+            key: Clave del trabajo (p. ej. versión del archivo y hoja)
+            fn: Función que lanza el trabajo
+
+        Returns:
+            T: Resultado del trabajo
+        """
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+        # Las tareas solo se pueden esperar desde su event loop
+        if task is not None and task.get_loop() is loop:
+            self.coalesced += 1
+        else:
+            task = loop.create_task(fn())
+            self._calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Indica si hay una ejecución en curso con la clave"""
+        return key in self._calls
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Marca la excepción como leída aunque no quede nadie esperando
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve los trabajos en curso, ejecutados y compartidos"""
+        calls = self.executions + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / calls if calls else 0.0,
+        }
+
+
+# Caché compartido de DataFrames ya procesados, clave: (ruta, mtime, tamaño, hoja)
+dataset_cache = LRUCache(settings.DATASET_CACHE_MAX_BYTES, estimate_dataset_size)
+
+# Metadatos de los archivos ya leídos, clave: ruta del JSON; valor: ((mtime, tamaño, inodo), metadatos)
+metadata_cache = LRUCache(settings.METADATA_CACHE_MAX_BYTES, estimate_metadata_size)
+
+# Fragmentos de contexto por columna ya generados, clave: (versión del archivo, hoja)
+context_cache = LRUCache(settings.CONTEXT_CACHE_MAX_BYTES, estimate_context_size)
+
+# Respuestas del modelo, clave: (versión del archivo, hoja, pregunta normalizada, modelo, temperatura)
+answer_cache = LRUCache(settings.ANSWER_CACHE_MAX_BYTES, estimate_text_size, ttl=settings.ANSWER_CACHE_TTL)
+
+
+# Trabajos en curso compartidos entre peticiones simultáneas:
+# análisis de archivos e índices de hojas, clave: (ruta, mtime, tamaño, hoja)
+parse_flight = SingleFlight()
+# vistas previas, clave: (ruta, mtime, tamaño, hoja, filas)
+preview_flight = SingleFlight()
+# respuestas del modelo, con la misma clave que el caché de respuestas
+answer_flight = SingleFlight()
+
+
+def invalidate_dataset_version(version: str) -> int:
+    """
+    Elimina los contextos y respuestas en caché de una versión de un archivo
+
+    Args:
+        version: Versión (hash del contenido) del archivo
+
+    Returns:
+        int: Número de entradas eliminadas
+    """
+    def matches(key: Hashable) -> bool:
+        return key[0] == version
+
+    return context_cache.invalidate(matches) + answer_cache.invalidate(matches)
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Las columnas JSON se guardan como texto y se decodifican al leer
+_JSON_FIELDS = ("column_names", "dtypes", "sheets", "summary")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    filename TEXT PRIMARY KEY,
+    original_name TEXT NOT NULL,
+    format TEXT NOT NULL,
+    content_hash TEXT,
+    size_bytes INTEGER NOT NULL,
+    storage_bytes INTEGER NOT NULL,
+    rows INTEGER,
+    columns INTEGER,
+    column_names TEXT,
+    dtypes TEXT,
+    sheets TEXT,
+    summary TEXT,
+    uploaded_at REAL NOT NULL,
+    last_accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_uploaded_at ON files (uploaded_at);
+CREATE INDEX IF NOT EXISTS files_last_accessed_at ON files (last_accessed_at);
+"""
+
+
+class FileCatalog:
+    """
+    Catálogo persistente (SQLite) de los archivos subidos: resumen, hash, tamaño
+    y fechas de subida y último acceso. Evita recorrer el directorio o volver a
+    analizar los archivos para listarlos.
+    """
+
+    # Un acceso solo se registra si el anterior es más antiguo que esto (segundos)
+    TOUCH_INTERVAL = 60.0
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_path: Optional[str] = None
+        self._lock = threading.Lock()
+        # Último acceso registrado por archivo: evita ir a SQLite en cada lectura
+        self._touched: Dict[str, float] = {}
+        self._touched_lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        """Ruta de la base de datos (por defecto dentro del directorio de archivos)"""
+        if self._path or settings.CATALOG_PATH:
+            return self._path or settings.CATALOG_PATH
+        # Importación diferida: ExcelService importa este módulo
+        from app.services.excel_service import ExcelService
+        return os.path.join(ExcelService.TEMP_DIR, ".catalog.sqlite3")
+
+    def _connect(self) -> sqlite3.Connection:
+        path = os.path.abspath(self.path)
+        if self._conn is None or self._conn_path != path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            # WAL: las lecturas no bloquean las escrituras
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            if self._conn is not None:
+                self._conn.close()
+            self._conn, self._conn_path = conn, path
+        return self._conn
+
+    def _execute(self, sql: str, params: Tuple[Any, ...] = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+
+    def record(
+        self,
+        filename: str,
+        original_name: str,
+        size_bytes: int,
+        storage_bytes: int,
+        content_hash: Optional[str] = None,
+        summary: Optional[Dict[str, Any]] = None,
+        sheets: Optional[List[str]] = None,
+        uploaded_at: Optional[float] = None
+    ) -> None:
+        """
+        Registra (o actualiza) un archivo en el catálogo
+
+        Args:
+            filename: Nombre del archivo guardado
+            original_name: Nombre con el que se subió
+            size_bytes: Tamaño del archivo original
+            storage_bytes: Espacio total en disco (original y artefactos derivados)
+            content_hash: Hash SHA-256 del contenido (versión)
+            summary: Resumen del archivo (primera hoja en los libros Excel)
+            sheets: Nombres de las hojas, si es un libro Excel
+            uploaded_at: Fecha de subida (por defecto ahora)
+        """
+        now = time.time()
+        summary = summary or {}
+        self._execute(
+            """
+            INSERT INTO files (
+                filename, original_name, format, content_hash, size_bytes, storage_bytes,
+                rows, columns, column_names, dtypes, sheets, summary, uploaded_at, last_accessed_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (filename) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                size_bytes = excluded.size_bytes,
+                storage_bytes = excluded.storage_bytes,
+                rows = COALESCE(excluded.rows, files.rows),
+                columns = COALESCE(excluded.columns, files.columns),
+                column_names = COALESCE(excluded.column_names, files.column_names),
+                dtypes = COALESCE(excluded.dtypes, files.dtypes),
+                sheets = COALESCE(excluded.sheets, files.sheets),
+                summary = COALESCE(excluded.summary, files.summary),
+                last_accessed_at = excluded.last_accessed_at
+            """,
+            (
+                filename,
+                original_name,
+                os.path.splitext(filename)[1].lstrip("."),
+                content_hash,
+                size_bytes,
+                storage_bytes,
+                summary.get("rows"),
+                summary.get("columns"),
+                json.dumps(summary["column_names"], ensure_ascii=False) if "column_names" in summary else None,
+                json.dumps(summary["dtypes"], ensure_ascii=False) if "dtypes" in summary else None,
+                json.dumps(sheets, ensure_ascii=False) if sheets is not None else None,
+                json.dumps(summary, ensure_ascii=False, default=str) if summary else None,
+                uploaded_at or now,
+                now,
+            ),
+        )
+
+    def touch(self, filename: str) -> None:
+        """Registra un acceso al archivo (como mucho uno por TOUCH_INTERVAL)"""
+        now = time.time()
+        if not self._touch_due(filename, now):
+            return
+        self._execute(
+            "UPDATE files SET last_accessed_at = ? WHERE filename = ? AND last_accessed_at < ?",
+            (now, filename, now - self.TOUCH_INTERVAL),
+        )
+
+    async def touch_async(self, filename: str) -> None:
+        """Versión de touch para los endpoints: la escritura en SQLite se hace en un hilo"""
+        if self._touch_due(filename, time.time(), record=False):
+            await asyncio.to_thread(self.touch, filename)
+
+    def _touch_due(self, filename: str, now: float, record: bool = True) -> bool:
+        """Indica si hay que registrar el acceso (y, con record, lo anota en memoria)"""
+        with self._touched_lock:
+            if now - self._touched.get(filename, 0.0) < self.TOUCH_INTERVAL:
+                return False
+            if record:
+                if len(self._touched) >= 10_000:
+                    # Olvidar los accesos ya caducados para que el registro no crezca sin límite
+                    self._touched = {
+                        name: when for name, when in self._touched.items() if now - when < self.TOUCH_INTERVAL
+                    }
+                self._touched[filename] = now
+            return True
+
+    def remove(self, filename: str) -> None:
+        """Elimina un archivo del catálogo"""
+        with self._touched_lock:
+            self._touched.pop(filename, None)
+        self._execute("DELETE FROM files WHERE filename = ?", (filename,))
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Registro completo de un archivo, o None si no está en el catálogo"""
+        rows = self._execute("SELECT * FROM files WHERE filename = ?", (filename,))
+        return self._to_record(rows[0]) if rows else None
+
+    def names(self, offset: int = 0, limit: int = 100) -> List[str]:
+        """Nombres de los archivos, de los más recientes a los más antiguos"""
+        rows = self._execute(
+            "SELECT filename FROM files ORDER BY uploaded_at DESC, filename LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+        return [row["filename"] for row in rows]
+
+    def records(self, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Registros completos de los archivos, de los más recientes a los más antiguos"""
+        rows = self._execute(
+            "SELECT * FROM files ORDER BY uploaded_at DESC, filename LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+        return [self._to_record(row) for row in rows]
+
+    def count(self) -> int:
+        """Número de archivos del catálogo"""
+        return self._execute("SELECT COUNT(*) AS n FROM files")[0]["n"]
+
+    def storage_bytes(self) -> int:
+        """Espacio total ocupado por los archivos del catálogo"""
+        return self._execute("SELECT COALESCE(SUM(storage_bytes), 0) AS total FROM files")[0]["total"]
+
+    def expired(self, ttl: float) -> List[str]:
+        """Archivos sin accesos durante más de ttl segundos"""
+        rows = self._execute(
+            "SELECT filename FROM files WHERE last_accessed_at < ? ORDER BY last_accessed_at",
+            (time.time() - ttl,),
+        )
+        return [row["filename"] for row in rows]
+
+    def least_recently_used(self) -> List[Tuple[str, int]]:
+        """Archivos y espacio ocupado, del acceso más antiguo al más reciente"""
+        rows = self._execute("SELECT filename, storage_bytes FROM files ORDER BY last_accessed_at, uploaded_at")
+        return [(row["filename"], row["storage_bytes"]) for row in rows]
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        for field in _JSON_FIELDS:
+            if record.get(field) is not None:
+                record[field] = json.loads(record[field])
+        return record
+
+
+# Catálogo compartido por los endpoints
+catalog = FileCatalog()
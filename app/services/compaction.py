@@ -0,0 +1,98 @@
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+
+def _string_dtype() -> Any:
+    """Tipo de texto respaldado por Arrow si pyarrow está instalado"""
+    try:
+        import pyarrow  # noqa: F401
+        return pd.StringDtype("pyarrow")
+    except ImportError:
+        return pd.StringDtype()
+
+
+def _compact_integer(series: pd.Series) -> pd.Series:
+    # El tipo entero con signo más pequeño que admite el rango (sin pérdida)
+    return pd.to_numeric(series, downcast="integer")
+
+
+def _compact_float(series: pd.Series) -> pd.Series:
+    # float32 solo si todos los valores se representan exactamente; si no, los
+    # resúmenes mostrarían errores de redondeo
+    if series.dtype == np.float32:
+        return series
+    candidate = series.astype(np.float32)
+    if np.array_equal(candidate.to_numpy(np.float64), series.to_numpy(), equal_nan=True):
+        return candidate
+    return series
+
+
+def _compact_text(series: pd.Series, max_ratio: float) -> Optional[pd.Series]:
+    """
+    Codifica una columna de texto como categoría si tiene pocos valores distintos,
+    o como texto Arrow si es de tipo object
+
+    Returns:
+        Optional[pd.Series]: Columna convertida, o None si se deja como está
+    """
+    if pd.api.types.is_object_dtype(series.dtype):
+        # Solo columnas cuyos valores son todos texto (no mezclas con números o fechas)
+        if pd.api.types.infer_dtype(series, skipna=True) != "string":
+            return None
+    elif not pd.api.types.is_string_dtype(series.dtype):
+        return None
+
+    non_null = series.count()
+    if non_null and series.nunique(dropna=True) <= max_ratio * non_null:
+        return series.astype("category")
+    if pd.api.types.is_object_dtype(series.dtype):
+        return series.astype(_string_dtype())
+    return None
+
+
+def compact_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Reduce la memoria de un DataFrame recién cargado: enteros y decimales al tipo
+    más pequeño sin pérdida, categorías para el texto con pocos valores distintos
+    (productos, regiones, estados) y texto respaldado por Arrow para el resto
+
+    Args:
+        df: DataFrame tal como lo devuelve pandas
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, Any]]: DataFrame compactado y memoria antes y
+        después (before_bytes, after_bytes) con las columnas convertidas
+    """
+    before = int(df.memory_usage(index=True, deep=True).sum())
+    max_ratio = settings.COMPACT_CATEGORY_MAX_RATIO
+    columns = {}
+    converted = {}
+
+    for position, col in enumerate(df.columns):
+        series = df.iloc[:, position]
+        dtype = series.dtype
+        if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+            compacted = _compact_integer(series)
+        elif pd.api.types.is_float_dtype(dtype) and isinstance(dtype, np.dtype):
+            compacted = _compact_float(series)
+        else:
+            compacted = _compact_text(series, max_ratio)
+
+        if compacted is not None and compacted.dtype != dtype:
+            columns[position] = compacted
+            converted[str(col)] = f"{dtype} -> {compacted.dtype}"
+
+    if columns:
+        df = df.copy(deep=False)
+        for position, series in columns.items():
+            # Por posición: admite nombres de columna repetidos
+            df.isetitem(position, series)
+
+    after = int(df.memory_usage(index=True, deep=True).sum()) if columns else before
+    return df, {"before_bytes": before, "after_bytes": after, "converted": converted}
@@ -0,0 +1,334 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+# Valores más frecuentes que se muestran por columna categórica
+TOP_VALUES = 5
+# Filas y columnas de los ejemplos de datos
+SAMPLE_ROWS = 2
+SAMPLE_COLUMNS = 6
+# Parte del presupuesto que puede ocupar la lista de nombres de columnas
+NAMES_BUDGET_SHARE = 0.3
+# Longitud máxima de cada valor mostrado
+MAX_VALUE_CHARS = 40
+# Una columna categórica con hasta estos valores distintos sirve para agrupar
+GROUPABLE_MAX_VALUES = 50
+
+# Palabras de la pregunta que no identifican columnas
+_STOPWORDS = {
+    "cual", "cuales", "que", "los", "las", "del", "por", "para", "con", "sin", "una", "uno",
+    "unos", "unas", "sus", "mas", "menos", "como", "cuanto", "cuanta", "cuantos", "cuantas",
+    "hay", "son", "esta", "este", "estos", "estas", "entre", "cada", "todos", "todas", "donde",
+    "cuando", "quien", "the", "and", "what", "which", "how", "many", "much",
+}
+
+_SECTIONS = {
+    "numeric": "Estadísticas numéricas:",
+    "categorical": "Valores más frecuentes en columnas categóricas:",
+    "datetime": "Columnas de fecha:",
+    "other": "Otras columnas:",
+}
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un texto para compararlo: minúsculas, sin tildes, sin signos de
+    puntuación y con espacios simples. Los puntos, guiones y barras de números
+    y fechas se conservan ("10.5", "-3", "2023-01-05").
+
+    Args:
+        text: Texto a normalizar
+
+    Returns:
+        str: Texto normalizado
+    """
+    text = unicodedata.normalize("NFKD", str(text).casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[¿?¡!,;:\"'()_]|[.\-/](?!\d)|(?<!\d)[./]|(?<=[^\d\s])-", " ", text)
+    return " ".join(text.split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación del número de tokens de un texto (unos 4 caracteres por token)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+def _format_number(value: Any) -> str:
+    value = float(value)
+    if np.isnan(value):
+        return "-"
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+def _format_value(value: Any) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return "-"
+    text = str(value)
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS - 1] + "…"
+
+
+class ColumnFragment:
+    """Descripción de una columna para el contexto, con lo necesario para ordenarla"""
+
+    __slots__ = ("position", "name", "kind", "text", "tokens", "name_terms", "value_terms", "prior", "samples")
+
+    def __init__(
+        self,
+        position: int,
+        name: str,
+        kind: str,
+        text: str,
+        value_terms: List[str],
+        prior: float,
+        samples: List[str]
+    ):
+        self.position = position
+        self.name = name
+        self.kind = kind
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.name_terms = normalize_text(name)
+        self.value_terms = value_terms
+        self.prior = prior
+        self.samples = samples
+
+
+class ContextProfile:
+    """
+    Fragmentos de contexto de todas las columnas de una hoja. No depende de la
+    pregunta, por lo que se guarda en caché por versión del archivo y hoja; para
+    cada pregunta solo se ordenan las columnas y se eligen las que caben.
+    """
+
+    def __init__(self, rows: int, columns: int, fragments: List[ColumnFragment]):
+        self.rows = rows
+        self.columns = columns
+        self.fragments = fragments
+        # Tamaño aproximado para el caché acotado en bytes
+        self.nbytes = sum(
+            len(f.text) + len(f.name_terms) + sum(map(len, f.value_terms)) + sum(map(len, f.samples)) + 200
+            for f in fragments
+        )
+
+    def rank(self, question: Optional[str]) -> List[ColumnFragment]:
+        """
+        Ordena las columnas por relevancia para la pregunta: coincidencia con el
+        nombre de la columna o con alguno de sus valores frecuentes y, a igualdad,
+        tipo y cardinalidad (prior) y posición en la hoja
+
+        Args:
+            question: Pregunta del usuario (sin ella solo cuenta el prior)
+
+        Returns:
+            List[ColumnFragment]: Columnas de la más a la menos relevante
+        """
+        normalized = f" {normalize_text(question)} " if question else ""
+        terms = {word for word in normalized.split() if len(word) >= 3 and word not in _STOPWORDS}
+
+        def score(fragment: ColumnFragment) -> float:
+            value = fragment.prior
+            if not normalized:
+                return value
+            name = fragment.name_terms
+            if len(name) >= 3 and f" {name} " in normalized:
+                value += 10
+            else:
+                for word in name.split():
+                    if len(word) < 3 or word in _STOPWORDS:
+                        continue
+                    # Admite plurales y derivados ("ventas" / "venta", "region" / "regiones")
+                    if any(word == term or (min(len(word), len(term)) >= 4 and
+                                            (word.startswith(term) or term.startswith(word)))
+                           for term in terms):
+                        value += 4
+            if any(f" {term} " in normalized for term in fragment.value_terms):
+                value += 5
+            return value
+
+        scores = [score(fragment) for fragment in self.fragments]
+        order = sorted(range(len(self.fragments)), key=lambda i: (-scores[i], self.fragments[i].position))
+        return [self.fragments[i] for i in order]
+
+    def render(self, question: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+        """
+        Genera el texto del contexto dentro del presupuesto de tokens: cabecera con
+        las dimensiones y los nombres de columnas (recortados si no caben), las
+        columnas más relevantes y unas filas de ejemplo
+
+        Args:
+            question: Pregunta del usuario
+            max_tokens: Presupuesto de tokens (por defecto LLM_CONTEXT_MAX_TOKENS)
+
+        Returns:
+            str: Contexto para el prompt
+        """
+        budget = max_tokens or settings.LLM_CONTEXT_MAX_TOKENS
+        ranked = self.rank(question)
+
+        # Nombres de columnas: todos si caben en su parte del presupuesto; si no,
+        # los más relevantes
+        names_budget = int(budget * NAMES_BUDGET_SHARE)
+        names = [fragment.name for fragment in self.fragments]
+        names_text = ", ".join(names)
+        if estimate_tokens(names_text) > names_budget:
+            shown, used = [], 0
+            for fragment in ranked:
+                cost = estimate_tokens(fragment.name) + 1
+                if used + cost > names_budget:
+                    break
+                shown.append(fragment.name)
+                used += cost
+            names_text = f"{', '.join(shown)} (y {len(names) - len(shown)} columnas más)"
+        header = f"El archivo tiene {self.rows} filas y {self.columns} columnas: {names_text}."
+        used = estimate_tokens(header)
+
+        # Columnas más relevantes mientras quepan (las que no caben se saltan:
+        # puede caber alguna más corta)
+        selected: Dict[str, List[ColumnFragment]] = {kind: [] for kind in _SECTIONS}
+        chosen: List[ColumnFragment] = []
+        for fragment in ranked:
+            cost = fragment.tokens
+            if not selected[fragment.kind]:
+                cost += estimate_tokens(_SECTIONS[fragment.kind])
+            if used + cost > budget:
+                continue
+            selected[fragment.kind].append(fragment)
+            chosen.append(fragment)
+            used += cost
+
+        lines = [header]
+        for kind, title in _SECTIONS.items():
+            if selected[kind]:
+                lines.append(f"\n{title}")
+                lines.extend(fragment.text for fragment in selected[kind])
+
+        # Filas de ejemplo con las columnas más relevantes incluidas
+        sample_columns = [fragment for fragment in chosen if fragment.samples][:SAMPLE_COLUMNS]
+        if sample_columns:
+            examples = ["\nPrimeras filas de ejemplo:"]
+            for row in range(min(len(fragment.samples) for fragment in sample_columns)):
+                examples.append("- " + ", ".join(
+                    f"{fragment.name}={fragment.samples[row]}" for fragment in sample_columns
+                ))
+            if used + estimate_tokens("\n".join(examples)) <= budget:
+                lines.extend(examples)
+
+        return "\n".join(lines)
+
+
+def build_context_profile(df: pd.DataFrame, summary: Dict[str, Any]) -> ContextProfile:
+    """
+    Calcula los fragmentos de contexto de todas las columnas. Las estadísticas
+    numéricas salen del resumen (o de una única agregación si no están), las
+    fechas de una única agregación min/max y las columnas categóricas del perfil
+    aproximado del resumen (o, si no lo hay, de su recuento de valores); las
+    filas de ejemplo se convierten por columnas.
+
+    Args:
+        df: DataFrame del archivo
+        summary: Resumen del archivo
+
+    Returns:
+        ContextProfile: Fragmentos por columna
+    """
+    column_names = [str(name) for name in df.columns]
+    numeric_columns = set(summary.get("numeric_columns", []))
+    categorical_columns = set(summary.get("categorical_columns", []))
+    missing = summary.get("missing_values", {})
+    stats = summary.get("numeric_stats") or {}
+    approx = summary.get("approx_profile") or {}
+    non_null = df.count()
+
+    kinds = []
+    for position, name in enumerate(column_names):
+        dtype = df.dtypes.iloc[position]
+        if name in numeric_columns:
+            kinds.append("numeric")
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            kinds.append("datetime")
+        elif name in categorical_columns:
+            kinds.append("categorical")
+        else:
+            kinds.append("other")
+
+    # Estadísticas numéricas que no trae el resumen, en una sola agregación
+    numeric_positions = [p for p, kind in enumerate(kinds) if kind == "numeric"]
+    absent = [p for p in numeric_positions if column_names[p] not in stats.get("mean", {})]
+    if absent and len(df):
+        computed = df.iloc[:, absent].agg(["mean", "min", "max"])
+        stats = {key: {**stats.get(key, {}), **computed.loc[key].to_dict()} for key in ("mean", "min", "max")}
+
+    # Rango de las fechas: una reducción por bloques para todas las columnas
+    datetime_positions = [p for p, kind in enumerate(kinds) if kind == "datetime"]
+    date_ranges = None
+    if datetime_positions and len(df):
+        dates = df.iloc[:, datetime_positions]
+        date_ranges = (dates.min().tolist(), dates.max().tolist())
+
+    head = df.head(SAMPLE_ROWS)
+    fragments = []
+    for position, name in enumerate(column_names):
+        kind = kinds[position]
+        count = int(non_null.iloc[position])
+        missing_count = int(missing.get(name, len(df) - count))
+        suffix = f", {missing_count} vacíos" if missing_count else ""
+        value_terms: List[str] = []
+        prior = 0.0
+
+        profile = approx.get(name) or {}
+        if kind == "numeric" and name in stats.get("mean", {}):
+            median = profile.get("quantiles", {}).get("median")
+            median_text = f", mediana≈{_format_number(median)}" if median is not None else ""
+            text = (
+                f"- {name}: promedio={_format_number(stats['mean'][name])}{median_text} "
+                f"(min={_format_number(stats['min'][name])}, max={_format_number(stats['max'][name])}{suffix})"
+            )
+            prior = 1.0
+        elif kind == "datetime" and date_ranges is not None:
+            index = datetime_positions.index(position)
+            low, high = date_ranges[0][index], date_ranges[1][index]
+            text = f"- {name}: desde {low} hasta {high}{suffix}"
+            prior = 1.0
+        elif kind == "categorical":
+            if "top" in profile:
+                # Sketches del resumen: sin recorrer los valores de la columna (y de
+                # todo el archivo, aunque solo haya una muestra en memoria)
+                top = [_format_value(item["value"]) for item in profile["top"][:TOP_VALUES]]
+                distinct = profile["distinct"]
+                distinct_text = str(distinct) if profile.get("distinct_exact") else f"~{distinct}"
+                count = summary.get("rows", len(df)) - missing_count
+            else:
+                series = df.iloc[:, position]
+                counts = series.value_counts(dropna=True, sort=True)
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    # Las categorías sin filas también aparecen en el recuento (al final)
+                    counts = counts.iloc[:int(np.count_nonzero(counts.to_numpy()))]
+                top = [_format_value(value) for value in counts.index[:TOP_VALUES]]
+                distinct = len(counts)
+                distinct_text = str(distinct)
+            text = f"- {name} ({distinct_text} valores distintos{suffix})"
+            if top:
+                # Sin valores frecuentes si ninguno supera la cota de error de los recuentos
+                text += f": {', '.join(top)}"
+            value_terms = [term for term in (normalize_text(value) for value in top) if len(term) >= 3]
+            if distinct <= GROUPABLE_MAX_VALUES:
+                prior = 1.0
+            elif count and distinct > 0.9 * count:
+                # Identificadores y texto libre: poco útiles para el modelo
+                prior = -1.0
+        else:
+            text = f"- {name}: tipo {df.dtypes.iloc[position]}{suffix}"
+
+        if count == 0:
+            prior -= 3.0
+        samples = [_format_value(value) for value in head.iloc[:, position].tolist()]
+        fragments.append(ColumnFragment(position, name, kind, text, value_terms, prior, samples))
+
+    return ContextProfile(summary.get("rows", len(df)), summary.get("columns", len(column_names)), fragments)
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+def iso_strings(series: pd.Series) -> np.ndarray:
+    """
+    Convierte una columna de fechas a texto ISO 8601 (como Timestamp.isoformat).
+    Las fechas sin zona horaria ni fracciones de segundo se convierten de una vez.
+
+    Args:
+        series: Columna de fechas
+
+    Returns:
+        np.ndarray: Textos (de tipo object; los nulos quedan como "NaT" o NaN)
+    """
+    values = series.to_numpy()
+    if values.dtype.kind == "M":
+        seconds = values.astype("datetime64[s]")
+        valid = ~np.isnat(values)
+        if np.array_equal(seconds[valid], values[valid]):
+            return np.datetime_as_string(seconds).astype(object)
+    # Con zona horaria o fracciones de segundo: valor a valor
+    return np.array(series.map(lambda value: value.isoformat(), na_action="ignore"), dtype=object)
+
+
+def text_values(series: pd.Series) -> np.ndarray:
+    """Valores de una columna como texto (None para los nulos), convertidos por columna"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Se convierten solo las categorías; el código -1 (nulo) toma el None final
+        categories = text_values(pd.Series(dtype.categories))
+        return np.append(categories, None)[series.cat.codes.to_numpy()]
+
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        values = iso_strings(series)
+    elif pd.api.types.is_object_dtype(dtype):
+        # Columnas con tipos mezclados (p. ej. fechas y texto en Excel): valor a valor
+        values = np.array([
+            value.isoformat() if isinstance(value, (pd.Timestamp, datetime)) else str(value)
+            for value in series.to_numpy()
+        ], dtype=object)
+    else:
+        values = np.array(series.astype(str), dtype=object)
+    values[series.isna().to_numpy()] = None
+    return values
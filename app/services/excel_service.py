@@ -1,15 +1,63 @@
+import numpy as np
 import pandas as pd
 import os
+import asyncio
 import csv
 import io
 import chardet
-from typing import Dict, List, Any, Tuple
+import codecs
+import hashlib
+import json
+import uuid
+import glob
+import logging
+import shutil
+import threading
+import time
+import weakref
+from typing import Dict, List, Any, Tuple, Hashable, Optional, Iterator
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.services.cache_service import (
+    dataset_cache, metadata_cache, invalidate_dataset_version, parse_flight, preview_flight
+)
+from app.services.catalog_service import catalog
+from app.services.profiling import SummaryAccumulator
+from app.services.sketches import SKETCHES_FORMAT
+from app.services.compaction import compact_dataframe
+from app.services.worker_pool import worker_pool
+from app.services.export_service import EXPORT_FORMATS, to_json_records
+from app.services.metrics import span, timed, BYTES_PARSED, ROWS_PARSED, ROWS_EXPORTED
+
+logger = logging.getLogger(__name__)
+
+class FileTooLargeError(ValueError):
+    """El archivo subido supera el tamaño máximo permitido"""
+
+class SheetNotFoundError(ValueError):
+    """La hoja solicitada no existe en el archivo"""
+
+class ColumnNotFoundError(ValueError):
+    """Alguna de las columnas solicitadas no existe en el archivo"""
+
+class SchemaMismatchError(ValueError):
+    """Las filas añadidas no tienen las columnas o los tipos del archivo existente"""
 
 class ExcelService:
     """Servicio para procesar archivos Excel y CSV"""
     
     TEMP_DIR = "temp_files"
     
+    # Un cerrojo por archivo: las ampliaciones de un mismo archivo no se solapan
+    # (se liberan solos cuando ninguna ampliación los usa)
+    _append_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+    
+    # Un cerrojo por archivo de metadatos para las escrituras (leer, actualizar y
+    # reemplazar); se liberan solos cuando ningún hilo los usa
+    _metadata_locks: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+    _metadata_locks_guard = threading.Lock()
+    
     @staticmethod
     def save_file(file_content: bytes, filename: str) -> str:
         """Guarda un archivo en el directorio temporal"""
@@ -21,15 +69,156 @@ class ExcelService:
             f.write(file_content)
         return file_path
     
+    @staticmethod
+    async def save_upload(upload: UploadFile, filename: str) -> Tuple[str, bool]:
+        """
+        Guarda un archivo subido leyéndolo por bloques, sin cargarlo entero en memoria.
+        El hash SHA-256 se calcula durante la copia y da nombre al archivo, de modo
+        que volver a subir el mismo contenido reutiliza el archivo ya guardado.
+        
+        Args:
+            upload: Archivo recibido por FastAPI
+            filename: Nombre original del archivo
+            
+        Returns:
+            Tuple[str, bool]: Ruta del archivo guardado y si ya existía (deduplicado)
+            
+        Raises:
+            FileTooLargeError: Si el archivo supera MAX_UPLOAD_BYTES
+        """
+        tmp_path, digest = await ExcelService._receive_upload(upload)
+        try:
+            # Búsqueda del duplicado, renombrado y metadatos: fuera del event loop
+            return await asyncio.to_thread(ExcelService._store_upload, tmp_path, digest.hexdigest(), filename)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    @staticmethod
+    def _store_upload(tmp_path: str, content_hash: str, filename: str) -> Tuple[str, bool]:
+        """
+        Guarda con su nombre definitivo un archivo ya recibido, o lo descarta si
+        su contenido ya estaba guardado
+        
+        Args:
+            tmp_path: Temporal con el contenido recibido
+            content_hash: Hash SHA-256 (hexadecimal) del contenido
+            filename: Nombre original del archivo
+            
+        Returns:
+            Tuple[str, bool]: Ruta del archivo guardado y si ya existía (deduplicado)
+        """
+        content_id = content_hash[:32]
+        existing = ExcelService._find_by_content_id(content_id)
+        if existing is not None:
+            os.remove(tmp_path)
+            return existing, True
+        
+        file_path = os.path.join(ExcelService.TEMP_DIR, f"{content_id}_{filename}")
+        # Un archivo con el mismo nombre cuyo contenido cambió después (se le
+        # añadieron filas) no se sobrescribe
+        suffix = 1
+        while os.path.exists(file_path):
+            suffix += 1
+            file_path = os.path.join(ExcelService.TEMP_DIR, f"{content_id}-{suffix}_{filename}")
+        os.replace(tmp_path, file_path)
+        ExcelService._register_content_id(content_id, file_path)
+        # El hash completo identifica la versión del contenido (cachés de contexto y respuestas)
+        ExcelService.save_metadata(file_path, version=content_hash)
+        return file_path, False
+    
+    @staticmethod
+    async def _receive_upload(upload: UploadFile) -> Tuple[str, "hashlib._Hash"]:
+        """
+        Copia un archivo subido a un temporal por bloques, calculando su hash SHA-256
+        
+        Args:
+            upload: Archivo recibido por FastAPI
+            
+        Returns:
+            Tuple[str, hashlib._Hash]: Ruta del temporal y hash del contenido
+            
+        Raises:
+            FileTooLargeError: Si el archivo supera MAX_UPLOAD_BYTES
+        """
+        os.makedirs(ExcelService.TEMP_DIR, exist_ok=True)
+        
+        max_bytes = settings.MAX_UPLOAD_BYTES
+        tmp_path = os.path.join(ExcelService.TEMP_DIR, f".upload-{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        written = 0
+        
+        try:
+            with span("save_upload"):
+                # La escritura y el hash de cada bloque se hacen en un hilo: un
+                # archivo grande no debe bloquear el event loop
+                f = await asyncio.to_thread(open, tmp_path, "wb")
+                try:
+                    while True:
+                        chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        written += len(chunk)
+                        if written > max_bytes:
+                            raise FileTooLargeError(
+                                f"El archivo supera el tamaño máximo permitido ({max_bytes} bytes)"
+                            )
+                        await asyncio.to_thread(ExcelService._write_block, f, digest, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return tmp_path, digest
+    
+    @staticmethod
+    def _write_block(f: Any, digest: "hashlib._Hash", chunk: bytes) -> None:
+        """Escribe un bloque recibido y lo añade al hash del contenido"""
+        digest.update(chunk)
+        f.write(chunk)
+    
+    @staticmethod
+    def _content_index_path(content_id: str) -> str:
+        """Obtiene la ruta de la entrada del índice de contenido (hash -> archivo)"""
+        return os.path.join(ExcelService.TEMP_DIR, ".content_index", content_id)
+    
+    @staticmethod
+    def _find_by_content_id(content_id: str) -> Optional[str]:
+        """Busca un archivo ya guardado con el mismo contenido"""
+        index_path = ExcelService._content_index_path(content_id)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                filename = f.read().strip()
+        except FileNotFoundError:
+            return None
+        
+        file_path = ExcelService.get_file_path(filename)
+        if not os.path.exists(file_path):
+            # El archivo se eliminó por otra vía: descartar la entrada huérfana
+            os.remove(index_path)
+            return None
+        return file_path
+    
+    @staticmethod
+    def _register_content_id(content_id: str, file_path: str) -> None:
+        """Registra el archivo guardado en el índice de contenido"""
+        index_path = ExcelService._content_index_path(content_id)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(index_path, "w", encoding="utf-8") as f:
+            f.write(os.path.basename(file_path))
+    
     @staticmethod
     def get_file_path(filename: str) -> str:
         """Obtiene la ruta completa de un archivo"""
         return os.path.join(ExcelService.TEMP_DIR, filename)
     
     @staticmethod
+    @timed("detect_encoding")
     def detect_encoding(file_path: str) -> str:
         """
-        Detecta la codificación del archivo
+        Detecta la codificación del archivo a partir de una muestra inicial acotada
         
         Args:
             file_path: Ruta al archivo
@@ -38,8 +227,38 @@ class ExcelService:
             str: Codificación detectada
         """
         with open(file_path, 'rb') as f:
-            result = chardet.detect(f.read())
-        return result['encoding'] or 'utf-8'
+            sample = f.read(settings.CSV_SNIFF_BYTES)
+        return ExcelService._detect_sample_encoding(sample)
+    
+    @staticmethod
+    def _detect_sample_encoding(sample: bytes) -> str:
+        """
+        Detecta la codificación de una muestra de bytes
+        
+        Args:
+            sample: Primeros bytes del archivo
+            
+        Returns:
+            str: Codificación detectada
+        """
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        
+        # UTF-8 es lo más habitual; la muestra puede cortar un carácter multibyte al final
+        try:
+            sample.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError as e:
+            if e.start >= len(sample) - 3 and e.reason == 'unexpected end of data':
+                return 'utf-8'
+        
+        result = chardet.detect(sample)
+        if not result['encoding'] or (result.get('confidence') or 0) < 0.5:
+            # Las exportaciones de Excel en Windows suelen usar cp1252
+            return 'cp1252'
+        return result['encoding']
     
     @staticmethod
     def detect_delimiter(file_path: str, encoding: str) -> str:
@@ -75,154 +294,1882 @@ class ExcelService:
             
             return delimiter
         except Exception as e:
-            print(f"Error al detectar delimitador: {str(e)}")
+            logger.warning("Error al detectar delimitador: %s", e)
             return ','  # Valor por defecto
     
     @staticmethod
-    def read_file(file_path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    @timed("detect_dialect")
+    def detect_dialect(file_path: str) -> Dict[str, Any]:
         """
-        Lee un archivo Excel o CSV y devuelve el DataFrame y un resumen
+        Detecta codificación, delimitador, comillas y encabezado de un CSV
+        usando solo una muestra inicial de tamaño fijo (CSV_SNIFF_BYTES),
+        por lo que el coste no crece con el tamaño del archivo
         
+        Args:
+            file_path: Ruta al archivo CSV
+            
         Returns:
-            Tuple[pd.DataFrame, Dict[str, Any]]: DataFrame y resumen del archivo
+            Dict[str, Any]: Dialecto detectado (encoding, delimiter, quotechar, header)
         """
+        with open(file_path, 'rb') as f:
+            sample = f.read(settings.CSV_SNIFF_BYTES)
+        
+        encoding = ExcelService._detect_sample_encoding(sample)
+        text = sample.decode(encoding, errors='replace')
+        
+        # Si la muestra no cubre todo el archivo, descartar la última línea incompleta
+        if len(sample) == settings.CSV_SNIFF_BYTES and '\n' in text:
+            text = text[:text.rfind('\n') + 1]
+        
+        sniffer = csv.Sniffer()
         try:
-            # Determinar el tipo de archivo por su extensión
-            if file_path.endswith('.csv'):
-                # Detectar codificación
-                encoding = ExcelService.detect_encoding(file_path)
-                print(f"Codificación detectada: {encoding}")
-                
-                # Detectar delimitador
-                delimiter = ExcelService.detect_delimiter(file_path, encoding)
-                print(f"Delimitador detectado: '{delimiter}'")
-                
-                # Intentar leer el CSV con los parámetros detectados
-                try:
-                    df = pd.read_csv(file_path, encoding=encoding, sep=delimiter, engine='python')
-                except Exception as e:
-                    print(f"Error al leer CSV con parámetros detectados: {str(e)}")
-                    
-                    # Intentar con diferentes combinaciones
-                    encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-                    delimiters = [',', ';', '\t', '|']
-                    
-                    for enc in encodings:
-                        for sep in delimiters:
-                            try:
-                                df = pd.read_csv(file_path, encoding=enc, sep=sep, engine='python')
-                                # Si llegamos aquí, la lectura fue exitosa
-                                print(f"Lectura exitosa con encoding={enc}, sep={sep}")
-                                break
-                            except Exception:
-                                continue
-                        else:
-                            # Continuar con el siguiente encoding si no se encontró un delimitador que funcione
-                            continue
-                        # Si llegamos aquí, se encontró una combinación que funciona
-                        break
-                    else:
-                        # Si todas las combinaciones fallan, intentar con el sniffer de CSV
-                        try:
-                            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                                dialect = csv.Sniffer().sniff(f.read(4096))
-                                f.seek(0)
-                                reader = csv.reader(f, dialect)
-                                data = list(reader)
-                            
-                            # Convertir a DataFrame
-                            if data:
-                                headers = data[0]
-                                df = pd.DataFrame(data[1:], columns=headers)
-                            else:
-                                raise ValueError("No se pudieron leer datos del archivo CSV")
-                        except Exception as csv_error:
-                            print(f"Error con sniffer CSV: {str(csv_error)}")
-                            # Último recurso: leer como texto y dividir manualmente
-                            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                                lines = [line.strip() for line in f if line.strip()]
-                            
-                            if not lines:
-                                raise ValueError("El archivo está vacío")
-                            
-                            # Intentar dividir por el delimitador más común en la primera línea
-                            first_line = lines[0]
-                            counts = {d: first_line.count(d) for d in delimiters}
-                            best_delimiter = max(counts.items(), key=lambda x: x[1])[0]
-                            
-                            # Dividir todas las líneas
-                            data = [line.split(best_delimiter) for line in lines]
-                            headers = data[0]
-                            
-                            # Crear DataFrame
-                            df = pd.DataFrame(data[1:], columns=headers)
+            sniffed = sniffer.sniff(text, delimiters=',;\t|')
+            delimiter = sniffed.delimiter
+            quotechar = sniffed.quotechar or '"'
+        except csv.Error:
+            # Recurrir al conteo de delimitadores en las primeras líneas
+            delimiter = ExcelService.detect_delimiter(file_path, encoding)
+            quotechar = '"'
+        
+        # Sniffer.has_header falla con columnas solo de texto: exigir además
+        # que la primera fila contenga algún valor numérico para descartar encabezado
+        header = True
+        try:
+            if not sniffer.has_header(text):
+                first_row = next(csv.reader(io.StringIO(text), delimiter=delimiter, quotechar=quotechar), [])
+                header = not any(ExcelService._is_number(value) for value in first_row)
+        except (csv.Error, StopIteration):
+            pass
+        
+        dialect = {
+            "encoding": encoding,
+            "delimiter": delimiter,
+            "quotechar": quotechar,
+            "header": header,
+        }
+        logger.debug("Codificación detectada: %s, delimitador detectado: %r", encoding, delimiter)
+        return dialect
+    
+    @staticmethod
+    def _is_number(value: str) -> bool:
+        """Indica si un texto representa un número"""
+        try:
+            float(value.replace(',', '.'))
+            return True
+        except ValueError:
+            return False
+    
+    @staticmethod
+    def get_dialect(file_path: str) -> Dict[str, Any]:
+        """
+        Obtiene el dialecto de un CSV, detectándolo solo la primera vez
+        y guardándolo en los metadatos del archivo para las lecturas siguientes
+        
+        Args:
+            file_path: Ruta al archivo CSV
+            
+        Returns:
+            Dict[str, Any]: Dialecto del archivo
+        """
+        metadata = ExcelService.load_metadata(file_path)
+        if "dialect" in metadata:
+            return metadata["dialect"]
+        
+        dialect = ExcelService.detect_dialect(file_path)
+        ExcelService.save_metadata(file_path, dialect=dialect)
+        return dialect
+    
+    @staticmethod
+    def metadata_path(file_path: str) -> str:
+        """Obtiene la ruta del archivo de metadatos asociado a un archivo"""
+        return f"{file_path}.meta.json"
+    
+    @staticmethod
+    def load_metadata(file_path: str) -> Dict[str, Any]:
+        """
+        Lee los metadatos guardados de un archivo si siguen siendo válidos. El JSON
+        ya leído se reutiliza mientras no cambie (fecha, tamaño e inodo), así que
+        el resultado se comparte entre lecturas y no debe modificarse.
+        
+        Args:
+            file_path: Ruta al archivo original
+            
+        Returns:
+            Dict[str, Any]: Metadatos, o un diccionario vacío si no existen o el archivo cambió
+        """
+        path = os.path.abspath(ExcelService.metadata_path(file_path))
+        try:
+            meta_stat = os.stat(path)
+            stamp = (meta_stat.st_mtime_ns, meta_stat.st_size, meta_stat.st_ino)
+            cached = metadata_cache.get(path)
+            if cached is not None and cached[0] == stamp:
+                metadata = cached[1]
             else:
-                # Para archivos Excel, asegurarse de que openpyxl está instalado
-                try:
-                    df = pd.read_excel(file_path, engine='openpyxl')
-                except ImportError:
-                    raise ImportError("Missing optional dependency 'openpyxl'. Please install it using: pip install openpyxl")
+                with open(path, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+                metadata_cache.put(path, (stamp, metadata))
+            stat = os.stat(file_path)
+        except (FileNotFoundError, ValueError):
+            return {}
+        
+        if metadata.get("source") != {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}:
+            return {}
+        return metadata
+    
+    @staticmethod
+    def metadata_lock(file_path: str) -> Any:
+        """
+        Cerrojo (reentrante) de los metadatos de un archivo: quien lee los metadatos
+        para modificarlos debe tenerlo hasta guardarlos
+        
+        Args:
+            file_path: Ruta al archivo original
             
-            # Crear resumen del DataFrame
-            summary = {
-                "rows": len(df),
-                "columns": len(df.columns),
-                "column_names": df.columns.tolist(),
-                "dtypes": {col: str(df[col].dtype) for col in df.columns},
-                "missing_values": df.isna().sum().to_dict(),
-                "numeric_columns": df.select_dtypes(include=['number']).columns.tolist(),
-                "categorical_columns": df.select_dtypes(include=['object', 'category']).columns.tolist()
-            }
-            
-            # Agregar estadísticas básicas para columnas numéricas (CORRECCIÓN APLICADA AQUÍ)
-            if summary["numeric_columns"]:
-                numeric_stats = {}
-                desc = df[summary["numeric_columns"]].describe()
-                for stat in ['mean', 'min', 'max']:
-                    if stat in desc.index:
-                        numeric_stats[stat] = desc.loc[stat].to_dict()
-                
-                summary["numeric_stats"] = numeric_stats
+        Returns:
+            threading.RLock: Cerrojo del archivo
+        """
+        key = os.path.abspath(file_path)
+        with ExcelService._metadata_locks_guard:
+            lock = ExcelService._metadata_locks.get(key)
+            if lock is None:
+                lock = threading.RLock()
+                ExcelService._metadata_locks[key] = lock
+            return lock
+    
+    @staticmethod
+    def save_metadata(file_path: str, **values: Any) -> Dict[str, Any]:
+        """
+        Actualiza los metadatos de un archivo con los valores indicados
+        
+        Args:
+            file_path: Ruta al archivo original
+            **values: Claves a añadir o reemplazar
             
-            return df, summary
-        except Exception as e:
-            raise ValueError(f"Error al leer el archivo: {str(e)}")
+        Returns:
+            Dict[str, Any]: Metadatos resultantes
+        """
+        with ExcelService.metadata_lock(file_path):
+            # Copia: los metadatos leídos se comparten con el caché
+            metadata = dict(ExcelService.load_metadata(file_path))
+            metadata.update(values)
+            
+            stat = os.stat(file_path)
+            metadata["source"] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+            
+            path = os.path.abspath(ExcelService.metadata_path(file_path))
+            meta_stat = ExcelService._write_json(path, metadata)
+            # Las lecturas siguientes no vuelven a analizar el JSON recién escrito
+            metadata_cache.put(path, ((meta_stat.st_mtime_ns, meta_stat.st_size, meta_stat.st_ino), metadata))
+            return metadata
     
     @staticmethod
-    def get_preview(file_path: str, rows: int = 5) -> Dict[str, Any]:
+    def _write_json(path: str, data: Dict[str, Any]) -> os.stat_result:
         """
-        Obtiene una vista previa de un archivo Excel o CSV
+        Escribe un JSON de forma atómica (temporal y renombrado)
+        
+        Args:
+            path: Ruta del archivo
+            data: Contenido
+            
+        Returns:
+            os.stat_result: Datos del archivo escrito
+        """
+        # Temporal con nombre único: los hilos de un mismo proceso comparten pid
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            stat = os.stat(tmp_path)
+            os.replace(tmp_path, path)
+            return stat
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    @staticmethod
+    def _csv_read_kwargs(dialect: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Construye los argumentos de pd.read_csv a partir del dialecto detectado
+        
+        Args:
+            dialect: Dialecto del archivo
+            
+        Returns:
+            Dict[str, Any]: Argumentos para pd.read_csv
+        """
+        kwargs = {
+            "encoding": dialect["encoding"],
+            "sep": dialect["delimiter"],
+            "quotechar": dialect["quotechar"],
+            "header": 0 if dialect["header"] else None,
+            "engine": settings.CSV_ENGINE,
+        }
+        if settings.CSV_ENGINE != "pyarrow":
+            # Bytes inválidos fuera de la muestra o filas irregulares no deben abortar la lectura
+            kwargs["encoding_errors"] = "replace"
+            kwargs["on_bad_lines"] = "warn"
+        return kwargs
+    
+    @staticmethod
+    def cache_key(file_path: str, sheet: Optional[str] = None) -> Hashable:
+        """
+        Construye la clave de caché de un archivo a partir de su ruta, mtime y tamaño
         
         Args:
             file_path: Ruta al archivo
-            rows: Número de filas para la vista previa
+            sheet: Hoja ya resuelta (None para CSV)
             
         Returns:
-            Dict[str, Any]: Información de vista previa del archivo
+            Hashable: Clave que cambia si el archivo se modifica
+        """
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, sheet)
+    
+    @staticmethod
+    def invalidate_cache(file_path: str) -> int:
+        """
+        Elimina del caché todas las versiones procesadas de un archivo
+        
+        Args:
+            file_path: Ruta al archivo
+            
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        path = os.path.abspath(file_path)
+        return dataset_cache.invalidate(lambda key: key[0] == path)
+    
+    @staticmethod
+    def read_file(file_path: str, sheet: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Lee un archivo Excel o CSV y devuelve el DataFrame y un resumen.
+        Los resultados se guardan en caché mientras el archivo no cambie;
+        el DataFrame devuelto es compartido y no debe modificarse.
+        
+        Args:
+            file_path: Ruta al archivo
+            sheet: Nombre de la hoja (por defecto la primera)
+        
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, Any]]: DataFrame y resumen del archivo
+        """
+        sheet = ExcelService.resolve_sheet(file_path, sheet)
+        key = ExcelService.cache_key(file_path, sheet)
+        cached = dataset_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = ExcelService._load(file_path, sheet)
+        dataset_cache.put(key, result)
+        return result
+    
+    @staticmethod
+    async def read_file_async(file_path: str, sheet: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Versión de read_file para los endpoints: consulta el caché en el event loop
+        y, si no está, analiza el archivo en el pool de workers
+        
+        Args:
+            file_path: Ruta al archivo
+            sheet: Nombre de la hoja (por defecto la primera)
+        
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, Any]]: DataFrame y resumen del archivo
+            
+        Raises:
+            SheetNotFoundError: Si la hoja no existe
+            WorkerPoolSaturatedError: Si el pool no admite más trabajos
+            asyncio.TimeoutError: Si el análisis supera WORKER_JOB_TIMEOUT
+        """
+        await catalog.touch_async(os.path.basename(file_path))
+        sheet = await ExcelService.resolve_sheet_async(file_path, sheet)
+        key = ExcelService.cache_key(file_path, sheet)
+        cached = dataset_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        async def load() -> Tuple[pd.DataFrame, Dict[str, Any]]:
+            result = await worker_pool.run(ExcelService._load, file_path, sheet)
+            dataset_cache.put(key, result)
+            return result
+        
+        # Las peticiones simultáneas sobre la misma versión comparten un único análisis
+        return await parse_flight.run(key, load)
+    
+    @staticmethod
+    async def convert_to_columnar(file_path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Procesa un archivo recién subido: construye el índice de hojas, genera la
+        copia columnar (Feather) de la primera hoja para que las lecturas posteriores
+        no tengan que volver a analizarlo y lo registra en el catálogo. El resto de
+        hojas se cargan bajo demanda.
+        
+        Args:
+            file_path: Ruta al archivo original
+            
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, Any]]: DataFrame y resumen del archivo
+        """
+        df, summary = await ExcelService.read_file_async(file_path)
+        ExcelService.register_in_catalog(file_path, summary)
+        return df, summary
+    
+    @staticmethod
+    def original_name(file_path: str) -> str:
+        """Nombre con el que se subió un archivo (sin el prefijo del id de contenido)"""
+        filename = os.path.basename(file_path)
+        prefix, _, name = filename.partition("_")
+        content_id = prefix.split("-", 1)[0]
+        if name and len(content_id) == 32 and all(c in "0123456789abcdef" for c in content_id):
+            return name
+        return filename
+    
+    @staticmethod
+    def storage_bytes(file_path: str) -> int:
+        """Espacio en disco de un archivo y de sus artefactos derivados"""
+        total = 0
+        for path in [file_path] + ExcelService.derived_paths(file_path):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+    
+    @staticmethod
+    def register_in_catalog(file_path: str, summary: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Registra o actualiza un archivo en el catálogo con su resumen, hash y tamaño
+        
+        Args:
+            file_path: Ruta al archivo
+            summary: Resumen de la primera hoja, si ya se ha calculado
+        """
+        metadata = ExcelService.load_metadata(file_path)
+        stat = os.stat(file_path)
+        if summary is None:
+            # Archivos anteriores al catálogo: dimensiones guardadas en los metadatos
+            shape = metadata.get("datasets", {}).get("", {}).get("shape")
+            summary = {"rows": shape[0], "columns": shape[1]} if shape else None
+        sheets = metadata.get("sheets")
+        catalog.record(
+            os.path.basename(file_path),
+            ExcelService.original_name(file_path),
+            size_bytes=stat.st_size,
+            storage_bytes=ExcelService.storage_bytes(file_path),
+            content_hash=metadata.get("version"),
+            summary=summary,
+            sheets=[entry["name"] for entry in sheets] if sheets else None,
+            uploaded_at=stat.st_mtime,
+        )
+    
+    @staticmethod
+    def sync_catalog() -> Tuple[int, int]:
+        """
+        Sincroniza el catálogo con el directorio: registra los archivos que no están
+        (subidos antes de existir el catálogo) y elimina las entradas sin archivo
+        
+        Returns:
+            Tuple[int, int]: Entradas añadidas y eliminadas
+        """
+        if not os.path.isdir(ExcelService.TEMP_DIR):
+            return 0, 0
+        on_disk = {
+            name for name in os.listdir(ExcelService.TEMP_DIR)
+            if name.endswith(('.xlsx', '.xls', '.csv'))
+        }
+        in_catalog = set(catalog.names(limit=-1))
+        
+        added = 0
+        for name in sorted(on_disk - in_catalog):
+            try:
+                ExcelService.register_in_catalog(ExcelService.get_file_path(name))
+                added += 1
+            except FileNotFoundError:
+                pass
+        for name in in_catalog - on_disk:
+            catalog.remove(name)
+        return added, len(in_catalog - on_disk)
+    
+    @staticmethod
+    def _load(file_path: str, sheet: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Carga un archivo sin pasar por el caché, usando la copia columnar si existe.
+        Los archivos mayores que CHUNKED_THRESHOLD_BYTES se procesan por bloques.
+        
+        Args:
+            file_path: Ruta al archivo
+            sheet: Hoja ya resuelta (None para CSV)
+        
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, Any]]: DataFrame y resumen del archivo
+        """
+        if ExcelService.use_chunked_mode(file_path):
+            return ExcelService._load_chunked(file_path, sheet)
+        
+        # La copia columnar ya guarda los tipos compactados
+        df = ExcelService._read_sidecar(file_path, sheet)
+        stored = ExcelService.get_sheet_metadata(file_path, sheet) if df is not None else {}
+        memory = stored.get("memory")
+        if df is None or (memory is None and settings.COMPACT_DATAFRAMES):
+            if df is None:
+                df = ExcelService._parse_file(file_path, sheet)
+            df, memory = ExcelService.compact(df)
+            ExcelService._write_sidecar(file_path, df, sheet)
+            stored = {}
+        
+        with span("summary"):
+            saved = stored.get("accumulator")
+            profile = stored.get("approx_profile")
+            if saved is not None and (profile is not None or not settings.APPROX_PROFILE):
+                # Los metadatos vigentes corresponden a esta copia columnar: el resumen
+                # no se vuelve a calcular y el perfil aproximado ya está calculado
+                # (los sketches solo se leen para ampliar el resumen)
+                summary = SummaryAccumulator.from_dict(saved).to_summary()
+                if profile is not None and settings.APPROX_PROFILE:
+                    summary["approx_profile"] = profile
+            else:
+                accumulator = SummaryAccumulator().update(df)
+                ExcelService._save_summary_metadata(file_path, sheet, accumulator, memory)
+                summary = accumulator.to_summary()
+        if memory:
+            summary["memory"] = memory
+        return df, summary
+    
+    @staticmethod
+    @timed("compact")
+    def compact(df: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[Dict[str, Any]]]:
+        """
+        Compacta los tipos de un DataFrame recién analizado (ver compact_dataframe)
+        
+        Args:
+            df: DataFrame recién analizado
+            
+        Returns:
+            Tuple[pd.DataFrame, Optional[Dict[str, Any]]]: DataFrame y memoria antes y
+            después, o el mismo DataFrame y None si COMPACT_DATAFRAMES está desactivado
+        """
+        if not settings.COMPACT_DATAFRAMES:
+            return df, None
+        return compact_dataframe(df)
+    
+    @staticmethod
+    @timed("sheet_index")
+    def get_sheet_index(file_path: str) -> List[Dict[str, Any]]:
+        """
+        Obtiene el índice de hojas de un libro XLSX (nombre, dimensiones y encabezado).
+        Se construye una sola vez con una pasada en modo solo lectura y se guarda
+        en los metadatos del archivo.
+        
+        Args:
+            file_path: Ruta al archivo XLSX
+            
+        Returns:
+            List[Dict[str, Any]]: Una entrada por hoja (name, rows, columns, header)
         """
+        metadata = ExcelService.load_metadata(file_path)
+        if "sheets" in metadata:
+            return metadata["sheets"]
+        
         try:
-            df, summary = ExcelService.read_file(file_path)
-            
-            # Convertir las primeras filas a diccionario para la vista previa
-            preview_data = df.head(rows).to_dict(orient="records")
-            
-            # Asegurar que los valores son serializables a JSON
-            for i, row in enumerate(preview_data):
-                for key, value in row.items():
-                    if pd.isna(value):
-                        preview_data[i][key] = None
-                    elif isinstance(value, pd.Timestamp):
-                        preview_data[i][key] = value.isoformat()
-                    else:
-                        # Convertir todo a string para evitar problemas de serialización
-                        preview_data[i][key] = str(value)
-            
-            return {
-                "filename": os.path.basename(file_path),
-                "rows": summary["rows"],
-                "columns": summary["columns"],
-                "column_names": summary["column_names"],
-                "preview_data": preview_data
-            }
-        except Exception as e:
-            raise ValueError(f"Error al obtener vista previa: {str(e)}")
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportError("Missing optional dependency 'openpyxl'. Please install it using: pip install openpyxl")
+        
+        sheets = []
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                first = next(worksheet.iter_rows(max_row=1, values_only=True), ())
+                header = ExcelService._header_names(first)
+                # Dimensiones declaradas en el propio archivo (None si no las declara)
+                max_row = worksheet.max_row
+                sheets.append({
+                    "name": worksheet.title,
+                    "rows": max(max_row - 1, 0) if max_row else None,
+                    "columns": len(header),
+                    "header": header,
+                })
+        finally:
+            workbook.close()
+        
+        ExcelService.save_metadata(file_path, sheets=sheets)
+        return sheets
+    
+    @staticmethod
+    def get_sheet_names(file_path: str) -> Optional[List[str]]:
+        """Nombres de las hojas de un libro XLSX, o None para otros formatos"""
+        if not file_path.endswith('.xlsx'):
+            return None
+        return [entry["name"] for entry in ExcelService.get_sheet_index(file_path)]
+    
+    @staticmethod
+    def resolve_sheet(file_path: str, sheet: Optional[str]) -> Optional[str]:
+        """
+        Valida la hoja solicitada y devuelve su nombre (la primera si no se indica)
+        
+        Args:
+            file_path: Ruta al archivo
+            sheet: Nombre de la hoja solicitada o None
+            
+        Returns:
+            Optional[str]: Nombre de la hoja, o None para CSV (y .xls sin hoja indicada)
+            
+        Raises:
+            SheetNotFoundError: Si la hoja no existe o el archivo no tiene hojas
+        """
+        if file_path.endswith('.csv'):
+            if sheet is not None:
+                raise SheetNotFoundError("Los archivos CSV no tienen hojas")
+            return None
+        if not file_path.endswith('.xlsx'):
+            # Los .xls no tienen índice: pandas valida la hoja al leerla
+            return sheet
+        
+        names = ExcelService.get_sheet_names(file_path)
+        if not names:
+            raise SheetNotFoundError("El libro no contiene hojas")
+        if sheet is None:
+            return names[0]
+        if sheet not in names:
+            raise SheetNotFoundError(f"La hoja '{sheet}' no existe. Hojas disponibles: {', '.join(names)}")
+        return sheet
+    
+    @staticmethod
+    async def run_sheet_index(file_path: str) -> List[Dict[str, Any]]:
+        """Versión de get_sheet_index que construye el índice en el pool de workers si falta"""
+        sheets = ExcelService.load_metadata(file_path).get("sheets")
+        if sheets is None:
+            sheets = await parse_flight.run(
+                ("sheets", ExcelService.cache_key(file_path)),
+                lambda: worker_pool.run(ExcelService.get_sheet_index, file_path)
+            )
+        return sheets
+    
+    @staticmethod
+    async def resolve_sheet_async(file_path: str, sheet: Optional[str]) -> Optional[str]:
+        """Versión de resolve_sheet que construye el índice de hojas en el pool de workers si falta"""
+        if file_path.endswith('.xlsx'):
+            await ExcelService.run_sheet_index(file_path)
+        return ExcelService.resolve_sheet(file_path, sheet)
+    
+    @staticmethod
+    def _header_names(values: Tuple[Any, ...]) -> List[str]:
+        """Nombres de columna a partir de la primera fila de una hoja (como hace pandas)"""
+        return [
+            str(value) if value is not None else f"Unnamed: {i}"
+            for i, value in enumerate(values)
+        ]
+    
+    @staticmethod
+    def get_sheet_metadata(file_path: str, sheet: Optional[str]) -> Dict[str, Any]:
+        """Metadatos guardados de una hoja concreta (dimensiones, acumulador del resumen)"""
+        return ExcelService.load_metadata(file_path).get("datasets", {}).get(sheet or "", {})
+    
+    @staticmethod
+    def save_sheet_metadata(file_path: str, sheet: Optional[str], **values: Any) -> None:
+        """Actualiza los metadatos de una hoja concreta"""
+        with ExcelService.metadata_lock(file_path):
+            stored = ExcelService.load_metadata(file_path).get("datasets", {})
+            datasets = {name: dict(entry) for name, entry in stored.items()}
+            datasets.setdefault(sheet or "", {}).update(values)
+            ExcelService.save_metadata(file_path, datasets=datasets)
+    
+    @staticmethod
+    def use_chunked_mode(file_path: str) -> bool:
+        """Indica si un archivo debe procesarse por bloques en lugar de cargarse entero"""
+        return (
+            file_path.endswith(('.csv', '.xlsx'))
+            and os.path.getsize(file_path) > settings.CHUNKED_THRESHOLD_BYTES
+        )
+    
+    @staticmethod
+    @timed("parse_chunked")
+    def _load_chunked(file_path: str, sheet: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Construye el resumen de un archivo grande bloque a bloque, sin tener la tabla
+        completa en memoria. Solo se conservan las primeras CHUNKED_SAMPLE_ROWS filas.
+        
+        Args:
+            file_path: Ruta al archivo
+            sheet: Hoja ya resuelta (None para CSV)
+            
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, Any]]: Muestra de filas iniciales y resumen completo
+        """
+        sample_rows = settings.CHUNKED_SAMPLE_ROWS
+        metadata = ExcelService.get_sheet_metadata(file_path, sheet)
+        stored = metadata.get("accumulator")
+        profile = metadata.get("approx_profile") if settings.APPROX_PROFILE else None
+        
+        if stored is not None:
+            # El archivo ya se recorrió antes: basta con leer la muestra
+            accumulator = SummaryAccumulator.from_dict(stored)
+            sample = next(ExcelService.iter_chunks(file_path, sample_rows, sheet), pd.DataFrame())
+        else:
+            accumulator = SummaryAccumulator()
+            samples = []
+            kept = 0
+            for chunk in ExcelService.iter_chunks(file_path, settings.CHUNK_ROWS, sheet):
+                accumulator.update(chunk)
+                if kept < sample_rows:
+                    samples.append(chunk.head(sample_rows - kept))
+                    kept += len(samples[-1])
+            sample = pd.concat(samples, ignore_index=True) if samples else pd.DataFrame()
+            ExcelService._save_summary_metadata(file_path, sheet, accumulator)
+            file_format = os.path.splitext(file_path)[1].lstrip('.')
+            BYTES_PARSED.inc(os.path.getsize(file_path), format=file_format)
+            ROWS_PARSED.inc(accumulator.rows, format=file_format)
+        
+        sample, memory = ExcelService.compact(sample)
+        summary = accumulator.to_summary()
+        if stored is not None and profile is not None:
+            summary["approx_profile"] = profile
+        summary["sampled"] = True
+        summary["sample_rows"] = len(sample)
+        if memory:
+            # Solo de la muestra: la tabla completa no se tiene en memoria
+            summary["memory"] = memory
+        return sample, summary
+    
+    @staticmethod
+    def iter_chunks(file_path: str, chunksize: int, sheet: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        Recorre un archivo en bloques de filas sin cargarlo completo
+        
+        Args:
+            file_path: Ruta al archivo CSV o XLSX
+            chunksize: Número de filas por bloque
+            sheet: Hoja ya resuelta (por defecto la primera)
+            
+        Yields:
+            pd.DataFrame: Bloques consecutivos del archivo
+        """
+        if file_path.endswith('.csv'):
+            kwargs = ExcelService._csv_read_kwargs(ExcelService.get_dialect(file_path))
+            if kwargs["engine"] == "pyarrow":
+                # El motor pyarrow no admite lectura por bloques
+                kwargs.update(engine="c", encoding_errors="replace", on_bad_lines="warn")
+            with pd.read_csv(file_path, chunksize=chunksize, **kwargs) as reader:
+                for chunk in reader:
+                    if kwargs["header"] is None:
+                        chunk.columns = [f"Columna {i + 1}" for i in range(len(chunk.columns))]
+                    yield chunk
+        elif file_path.endswith('.xlsx'):
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise ImportError("Missing optional dependency 'openpyxl'. Please install it using: pip install openpyxl")
+            
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+                rows = worksheet.iter_rows(values_only=True)
+                first = next(rows, None)
+                if first is None:
+                    return
+                header = ExcelService._header_names(first)
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= chunksize:
+                        yield pd.DataFrame(batch, columns=header)
+                        batch = []
+                if batch:
+                    yield pd.DataFrame(batch, columns=header)
+            finally:
+                workbook.close()
+        else:
+            df, _ = ExcelService.read_file(file_path, sheet)
+            for start in range(0, len(df), chunksize):
+                yield df.iloc[start:start + chunksize]
+    
+    @staticmethod
+    def _save_summary_metadata(
+        file_path: str,
+        sheet: Optional[str],
+        accumulator: SummaryAccumulator,
+        memory: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Guarda en los metadatos de la hoja las dimensiones, el acumulador del resumen,
+        el perfil aproximado y la memoria; los sketches van a su propio archivo
+        """
+        # Las dimensiones y el perfil permiten a la vista previa no leer todo el archivo
+        with ExcelService.metadata_lock(file_path):
+            ExcelService.save_sketches(file_path, sheet, accumulator)
+            ExcelService.save_sheet_metadata(file_path, sheet, **ExcelService._summary_metadata(accumulator, memory))
+    
+    @staticmethod
+    def _summary_metadata(accumulator: SummaryAccumulator, memory: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Metadatos de una hoja a partir de su acumulador"""
+        return {
+            "shape": {
+                "rows": accumulator.rows,
+                "columns": len(accumulator.column_names or []),
+                "column_names": accumulator.column_names or [],
+            },
+            "accumulator": accumulator.to_dict(),
+            "approx_profile": accumulator.to_summary().get("approx_profile"),
+            "memory": memory,
+        }
+    
+    @staticmethod
+    def sketches_path(file_path: str, sheet: Optional[str] = None) -> str:
+        """Obtiene la ruta de los sketches del perfil aproximado de un archivo o de una de sus hojas"""
+        return ExcelService.sidecar_path(file_path, sheet)[:-len(".feather")] + ".sketches.json"
+    
+    @staticmethod
+    def load_sketches(file_path: str, sheet: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Lee los sketches guardados de un archivo o de una hoja si siguen siendo válidos.
+        No se leen con los metadatos: solo hacen falta para ampliar el resumen.
+        
+        Args:
+            file_path: Ruta al archivo original
+            sheet: Hoja ya resuelta (None para CSV)
+            
+        Returns:
+            Optional[Dict[str, Any]]: Sketches por columna, o None si no existen, el archivo
+            cambió o se guardaron con otro formato
+        """
+        try:
+            with open(ExcelService.sketches_path(file_path, sheet), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            stat = os.stat(file_path)
+        except (FileNotFoundError, ValueError):
+            return None
+        
+        if data.get("source") != {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}:
+            return None
+        if data.get("format") != SKETCHES_FORMAT:
+            # Formato anterior (p. ej. valores frecuentes sin cota de error)
+            return None
+        return data.get("sketches")
+    
+    @staticmethod
+    def save_sketches(file_path: str, sheet: Optional[str], accumulator: SummaryAccumulator) -> None:
+        """
+        Guarda los sketches de un acumulador (o borra los anteriores si no tiene)
+        
+        Args:
+            file_path: Ruta al archivo original
+            sheet: Hoja ya resuelta (None para CSV)
+            accumulator: Acumulador del resumen
+        """
+        path = ExcelService.sketches_path(file_path, sheet)
+        sketches = accumulator.sketches_to_dict()
+        if sketches is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        stat = os.stat(file_path)
+        ExcelService._write_json(path, {
+            "source": {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size},
+            "format": SKETCHES_FORMAT,
+            "sketches": sketches,
+        })
+    
+    @staticmethod
+    def sidecar_path(file_path: str, sheet: Optional[str] = None) -> str:
+        """Obtiene la ruta de la copia columnar (Feather) de un archivo o de una de sus hojas"""
+        if sheet is None:
+            return f"{file_path}.feather"
+        # Los nombres de hoja pueden tener caracteres no válidos en rutas
+        sheet_id = hashlib.sha1(sheet.encode("utf-8")).hexdigest()[:12]
+        return f"{file_path}.sheet-{sheet_id}.feather"
+    
+    @staticmethod
+    def derived_paths(file_path: str) -> List[str]:
+        """Obtiene las rutas de los artefactos generados a partir de un archivo"""
+        paths = [
+            ExcelService.sidecar_path(file_path),
+            ExcelService.metadata_path(file_path),
+            ExcelService.sketches_path(file_path),
+        ]
+        paths.extend(glob.glob(f"{glob.escape(file_path)}.sheet-*.feather"))
+        sidecar = glob.escape(ExcelService.sidecar_path(file_path))
+        paths.extend(glob.glob(f"{sidecar}.segments-*/*.feather"))
+        paths.extend(glob.glob(f"{glob.escape(file_path)}.sheet-*.sketches.json"))
+        
+        # Los archivos se nombran "<id de contenido>_<nombre original>"
+        content_id = os.path.basename(file_path).split("_", 1)[0]
+        index_path = ExcelService._content_index_path(content_id)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                if f.read().strip() == os.path.basename(file_path):
+                    paths.append(index_path)
+        return paths
+    
+    @staticmethod
+    def delete_file(file_path: str) -> None:
+        """
+        Elimina un archivo junto con sus artefactos derivados y sus entradas en caché
+        
+        Args:
+            file_path: Ruta al archivo
+        """
+        version = ExcelService.load_metadata(file_path).get("version")
+        
+        os.remove(file_path)
+        for path in ExcelService.derived_paths(file_path):
+            if os.path.exists(path):
+                os.remove(path)
+        ExcelService._remove_segments(ExcelService.sidecar_path(file_path))
+        catalog.remove(os.path.basename(file_path))
+        ExcelService.invalidate_cache(file_path)
+        metadata_path = os.path.abspath(ExcelService.metadata_path(file_path))
+        metadata_cache.invalidate(lambda key: key == metadata_path)
+        if version:
+            invalidate_dataset_version(version)
+    
+    @staticmethod
+    def get_dataset_version(file_path: str) -> str:
+        """
+        Obtiene la versión de un archivo: el hash SHA-256 de su contenido (tras añadir
+        filas, el hash de la versión anterior y de las filas añadidas).
+        Se calcula al subirlo; para archivos anteriores se calcula y se guarda una vez.
+        
+        Args:
+            file_path: Ruta al archivo
+            
+        Returns:
+            str: Versión del archivo
+        """
+        version = ExcelService.load_metadata(file_path).get("version")
+        if version:
+            return version
+        
+        digest = hashlib.sha256()
+        with span("hash_content"), open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                digest.update(block)
+        version = digest.hexdigest()
+        ExcelService.save_metadata(file_path, version=version)
+        return version
+    
+    @staticmethod
+    async def append_rows_async(file_path: str, upload: UploadFile) -> Dict[str, Any]:
+        """
+        Añade al final de un CSV existente las filas de un CSV subido, sin volver a
+        analizar el archivo completo: valida el esquema con las columnas y tipos
+        guardados, actualiza el resumen con el acumulador guardado y solo invalida
+        las entradas en caché de este archivo
+        
+        Args:
+            file_path: Ruta al CSV existente
+            upload: CSV con las filas nuevas (con encabezado si el original lo tiene)
+            
+        Returns:
+            Dict[str, Any]: Filas añadidas, resumen actualizado y nueva versión
+            
+        Raises:
+            FileTooLargeError: Si el archivo subido supera MAX_UPLOAD_BYTES
+            SchemaMismatchError: Si las filas no encajan con el archivo existente
+        """
+        path = os.path.abspath(file_path)
+        lock = ExcelService._append_locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            part_path, digest = await ExcelService._receive_upload(upload)
+            try:
+                df, summary, previous_version, appended = await worker_pool.run(
+                    ExcelService.append_rows, file_path, part_path, digest.hexdigest()
+                )
+            finally:
+                os.remove(part_path)
+            
+            # Solo las entradas de este archivo: su DataFrame y los contextos y
+            # respuestas de la versión anterior
+            ExcelService.invalidate_cache(file_path)
+            if previous_version:
+                invalidate_dataset_version(previous_version)
+            if df is not None:
+                dataset_cache.put(ExcelService.cache_key(file_path), (df, summary))
+            # Catálogo (SQLite) y metadatos en disco: fuera del event loop
+            await asyncio.to_thread(ExcelService.register_in_catalog, file_path, summary)
+            version = await asyncio.to_thread(ExcelService.get_dataset_version, file_path)
+        
+        return {
+            "appended_rows": appended,
+            "summary": summary,
+            "version": version,
+        }
+    
+    @staticmethod
+    @timed("append_rows")
+    def append_rows(
+        file_path: str,
+        part_path: str,
+        part_digest: str
+    ) -> Tuple[Optional[pd.DataFrame], Dict[str, Any], Optional[str], int]:
+        """
+        Añade las filas de part_path al CSV y actualiza la copia columnar (un
+        segmento con las filas nuevas) y los metadatos (se ejecuta en el pool de workers)
+        
+        Args:
+            file_path: Ruta al CSV existente
+            part_path: CSV con las filas nuevas
+            part_digest: Hash SHA-256 del CSV con las filas nuevas
+            
+        Returns:
+            Tuple: DataFrame completo (solo si se reescribió la copia columnar),
+            resumen actualizado, versión anterior y filas añadidas
+        """
+        if not file_path.endswith('.csv'):
+            raise SchemaMismatchError("Solo se pueden añadir filas a archivos CSV")
+        
+        # Los metadatos se leen al principio y se reemplazan al final: ninguna otra
+        # escritura de este archivo debe colarse entre medias
+        with ExcelService.metadata_lock(file_path):
+            metadata = ExcelService.load_metadata(file_path)
+            if "accumulator" not in metadata.get("datasets", {}).get("", {}):
+                # Archivo aún no procesado: generar su resumen y copia columnar una vez
+                ExcelService._load(file_path)
+                metadata = ExcelService.load_metadata(file_path)
+            # Copia: los metadatos leídos se comparten con el caché
+            metadata = dict(metadata, datasets=dict(metadata["datasets"]))
+            previous_version = metadata.get("version") or ExcelService.get_dataset_version(file_path)
+            dialect = metadata.get("dialect") or ExcelService.get_dialect(file_path)
+            accumulator = SummaryAccumulator.from_dict(
+                metadata["datasets"][""]["accumulator"], ExcelService.load_sketches(file_path)
+            )
+            
+            # La copia columnar se abre antes de modificar el original (deja de ser vigente)
+            chunked = ExcelService.use_chunked_mode(file_path)
+            table = None if chunked else ExcelService._open_sidecar(file_path)
+            
+            # Validar y convertir las filas nuevas antes de escribir nada
+            chunk, raw = ExcelService._read_append_rows(part_path, dialect, accumulator)
+            segment = ExcelService._segment_table(chunk, table) if table is not None else None
+            encoding = ExcelService._append_encoding(file_path, dialect)
+            terminator, ends_with_newline = ExcelService._line_terminator(file_path, dialect, encoding)
+            # Se escriben los textos recibidos, no los valores convertidos ("50", no "50.0")
+            text = raw.to_csv(
+                sep=dialect["delimiter"],
+                quotechar=dialect["quotechar"],
+                header=False,
+                index=False,
+                lineterminator=terminator,
+            )
+            if not ends_with_newline:
+                text = terminator + text
+            try:
+                data = text.encode(encoding)
+            except UnicodeEncodeError as e:
+                raise SchemaMismatchError(
+                    f"Las filas nuevas contienen caracteres que no admite la codificación del archivo ({dialect['encoding']}): {e}"
+                )
+            
+            with open(file_path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            
+            df, memory = None, metadata["datasets"][""].get("memory")
+            if segment is not None and ExcelService._append_segment(file_path, segment):
+                # Solo se escriben y se resumen las filas nuevas, con los tipos de la copia
+                accumulator.update(segment.to_pandas())
+            elif table is not None:
+                # Los tipos compactados no admiten las filas nuevas o hay demasiados
+                # segmentos: volver a compactar la tabla completa y reescribir la copia
+                previous = table.to_pandas()
+                df, memory = ExcelService.compact(pd.concat([previous, chunk], ignore_index=True))
+                ExcelService._write_sidecar(file_path, df)
+                accumulator.update(df.iloc[len(previous):])
+            else:
+                accumulator.update(chunk)
+            
+            # Nueva versión derivada de la anterior y del contenido añadido (sin volver a
+            # calcular el hash del archivo completo)
+            metadata.pop("source", None)
+            metadata["version"] = hashlib.sha256(f"{previous_version}:{part_digest}".encode("utf-8")).hexdigest()
+            metadata["datasets"][""] = ExcelService._summary_metadata(accumulator, memory)
+            ExcelService.save_sketches(file_path, None, accumulator)
+            ExcelService.save_metadata(file_path, **metadata)
+            # El nombre ya no corresponde al contenido: volver a subir el original no
+            # debe reutilizar este archivo
+            ExcelService._unregister_content_id(file_path)
+        
+        file_format = "csv"
+        BYTES_PARSED.inc(os.path.getsize(part_path), format=file_format)
+        ROWS_PARSED.inc(len(chunk), format=file_format)
+        
+        summary = accumulator.to_summary()
+        if memory:
+            summary["memory"] = memory
+        return df, summary, previous_version, len(chunk)
+    
+    @staticmethod
+    def _read_append_rows(
+        part_path: str,
+        dialect: Dict[str, Any],
+        accumulator: SummaryAccumulator
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Lee las filas que se van a añadir y las valida contra el esquema guardado:
+        mismas columnas y valores convertibles al tipo de cada columna
+        
+        Args:
+            part_path: CSV con las filas nuevas (puede usar otra codificación o delimitador)
+            dialect: Dialecto del archivo existente
+            accumulator: Acumulador del resumen del archivo existente
+            
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Filas nuevas con los tipos del archivo
+            existente y tal como se recibieron (texto)
+        """
+        column_names = accumulator.column_names or []
+        part_dialect = ExcelService.detect_dialect(part_path)
+        try:
+            # Todo como texto: la conversión se hace columna a columna según el esquema
+            chunk = pd.read_csv(
+                part_path,
+                encoding=part_dialect["encoding"],
+                sep=part_dialect["delimiter"],
+                quotechar=part_dialect["quotechar"],
+                header=0 if dialect["header"] else None,
+                dtype=str,
+                engine="c",
+            )
+        except (ValueError, pd.errors.ParserError) as e:
+            raise SchemaMismatchError(f"No se pudieron leer las filas nuevas: {e}")
+        
+        if dialect["header"]:
+            received = [str(name) for name in chunk.columns]
+            if received != column_names:
+                raise SchemaMismatchError(
+                    f"Las columnas no coinciden con las del archivo. Esperadas: {column_names}; recibidas: {received}"
+                )
+        elif len(chunk.columns) != len(column_names):
+            raise SchemaMismatchError(
+                f"Se esperaban {len(column_names)} columnas y se recibieron {len(chunk.columns)}"
+            )
+        chunk.columns = column_names
+        raw = chunk.copy()
+        
+        invalid = []
+        for position, col in enumerate(column_names):
+            converted = ExcelService._convert_append_values(chunk.iloc[:, position], accumulator.dtypes.get(col))
+            if converted is None:
+                invalid.append(col)
+            else:
+                chunk.isetitem(position, converted)
+        if invalid:
+            raise SchemaMismatchError(f"Valores no válidos para el tipo de las columnas: {', '.join(invalid)}")
+        return chunk, raw
+    
+    @staticmethod
+    def _convert_append_values(values: pd.Series, dtype: Any) -> Optional[pd.Series]:
+        """
+        Convierte los textos recibidos de una columna a su tipo guardado. Las celdas
+        vacías se admiten en todas las columnas (valores faltantes); las columnas de
+        texto o categóricas admiten cualquier texto, igual que al analizar el archivo.
+        
+        Args:
+            values: Valores de la columna tal como se recibieron
+            dtype: Tipo de la columna en el archivo existente
+            
+        Returns:
+            Optional[pd.Series]: Valores convertidos, o None si alguno no es del tipo
+        """
+        present = values.notna()
+        if pd.api.types.is_bool_dtype(dtype):
+            converted = values.str.lower().map({"true": True, "false": False})
+            if converted[present].isna().any():
+                return None
+            return converted.astype(bool) if present.all() else converted
+        if pd.api.types.is_numeric_dtype(dtype):
+            converted = pd.to_numeric(values, errors="coerce")
+            if (converted.isna() & present).any():
+                return None
+            if pd.api.types.is_integer_dtype(dtype) and (converted[present] % 1 != 0).any():
+                return None
+            return converted
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            tz = getattr(dtype, "tz", None)
+            converted = pd.to_datetime(values, errors="coerce", format="ISO8601", utc=tz is not None)
+            if (converted.isna() & present).any():
+                return None
+            return converted.dt.tz_convert(tz) if tz is not None else converted
+        if dtype is None or pd.api.types.is_string_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+            return values
+        # Otros tipos (duraciones, periodos...) no se pueden validar desde texto
+        return None
+    
+    @staticmethod
+    def _append_encoding(file_path: str, dialect: Dict[str, Any]) -> str:
+        """Codificación con la que se escriben las filas añadidas (sin marca BOM)"""
+        encoding = codecs.lookup(dialect["encoding"]).name
+        if encoding == "utf-8-sig":
+            return "utf-8"
+        if encoding == "utf-16":
+            with open(file_path, "rb") as f:
+                return "utf-16-be" if f.read(2) == codecs.BOM_UTF16_BE else "utf-16-le"
+        return encoding
+    
+    @staticmethod
+    def _line_terminator(file_path: str, dialect: Dict[str, Any], encoding: str) -> Tuple[str, bool]:
+        """
+        Fin de línea usado por un archivo y si el archivo ya termina en uno
+        
+        Returns:
+            Tuple[str, bool]: Fin de línea ("\r\n" o "\n") y si el archivo termina en salto de línea
+        """
+        with open(file_path, "rb") as f:
+            sample = f.read(settings.CSV_SNIFF_BYTES)
+            f.seek(max(0, os.path.getsize(file_path) - 4))
+            tail = f.read()
+        terminator = "\r\n" if "\r\n" in sample.decode(dialect["encoding"], errors="replace") else "\n"
+        return terminator, not tail or tail.endswith("\n".encode(encoding))
+    
+    @staticmethod
+    def _unregister_content_id(file_path: str) -> None:
+        """Elimina la entrada del índice de contenido que apunta al archivo"""
+        content_id = os.path.basename(file_path).split("_", 1)[0]
+        index_path = ExcelService._content_index_path(content_id)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                if f.read().strip() != os.path.basename(file_path):
+                    return
+            os.remove(index_path)
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    @timed("write_sidecar")
+    def _write_sidecar(file_path: str, df: pd.DataFrame, sheet: Optional[str] = None) -> bool:
+        """
+        Escribe el DataFrame en formato Feather sin compresión junto al original,
+        de modo que pueda leerse después con memory mapping
+        
+        Args:
+            file_path: Ruta al archivo original
+            df: DataFrame ya procesado
+            sheet: Hoja ya resuelta (None para CSV)
+            
+        Returns:
+            bool: True si la copia columnar se escribió correctamente
+        """
+        try:
+            from pyarrow import feather
+        except ImportError:
+            return False
+        
+        sidecar = ExcelService.sidecar_path(file_path, sheet)
+        tmp_path = f"{sidecar}.{uuid.uuid4().hex}.tmp"
+        try:
+            # Escribir en un temporal y renombrar para que otros workers
+            # nunca lean un archivo a medio escribir
+            feather.write_feather(df, tmp_path, compression="uncompressed")
+            # Los segmentos se asocian al inode de la copia: los de una copia ya
+            # borrada con el mismo inode no deben leerse con la nueva
+            inode = os.stat(tmp_path).st_ino
+            shutil.rmtree(ExcelService._segments_dir(sidecar, inode), ignore_errors=True)
+            os.replace(tmp_path, sidecar)
+            ExcelService._remove_segments(sidecar, keep=inode)
+            return True
+        except Exception as e:
+            # Columnas con tipos mixtos o nombres no textuales no son representables en Arrow
+            logger.warning("No se pudo generar la copia columnar: %s", e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+    
+    @staticmethod
+    @timed("read_sidecar")
+    def _read_sidecar(
+        file_path: str,
+        sheet: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Lee la copia columnar de un archivo con memory mapping si está vigente.
+        Con columnas o ventana de filas solo se convierte a pandas esa parte.
+        
+        Args:
+            file_path: Ruta al archivo original
+            sheet: Hoja ya resuelta (None para CSV)
+            columns: Columnas a leer (por defecto todas)
+            offset: Primera fila a leer
+            limit: Número máximo de filas (por defecto hasta el final)
+            
+        Returns:
+            Optional[pd.DataFrame]: DataFrame o None si no hay copia válida
+        """
+        table = ExcelService._open_sidecar(file_path, sheet, columns)
+        if table is None:
+            return None
+        
+        try:
+            if offset or limit is not None:
+                table = table.slice(offset, limit)
+            df = table.to_pandas()
+            if offset:
+                df.index = pd.RangeIndex(offset, offset + len(df))
+            return df
+        except Exception as e:
+            logger.warning("Error al leer la copia columnar: %s", e)
+            return None
+    
+    @staticmethod
+    def _open_sidecar(file_path: str, sheet: Optional[str] = None, columns: Optional[List[str]] = None) -> Optional[Any]:
+        """
+        Abre la copia columnar con memory mapping, sin convertirla a pandas
+        
+        Args:
+            file_path: Ruta al archivo original
+            sheet: Hoja ya resuelta (None para CSV)
+            columns: Columnas a leer (por defecto todas)
+            
+        Returns:
+            Optional[pyarrow.Table]: Tabla o None si no hay copia válida
+        """
+        sidecar = ExcelService.sidecar_path(file_path, sheet)
+        try:
+            from pyarrow import feather
+        except ImportError:
+            return None
+        
+        try:
+            # La copia solo es válida si es posterior al archivo original
+            stat = os.stat(sidecar)
+            if stat.st_mtime_ns < os.stat(file_path).st_mtime_ns:
+                return None
+            table = feather.read_table(sidecar, columns=columns, memory_map=True)
+            segments = ExcelService._sidecar_segments(sidecar, stat.st_ino)
+            if segments:
+                import pyarrow as pa
+                # Filas añadidas después de escribir la copia, en el mismo esquema
+                table = pa.concat_tables(
+                    [table] + [feather.read_table(path, columns=columns, memory_map=True) for path in segments]
+                )
+            return table
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Error al leer la copia columnar: %s", e)
+            return None
+    
+    @staticmethod
+    def _segments_dir(sidecar: str, inode: int) -> str:
+        """Directorio de los segmentos (filas añadidas) de una copia columnar concreta"""
+        return f"{sidecar}.segments-{inode}"
+    
+    @staticmethod
+    def _sidecar_segments(sidecar: str, inode: int) -> List[str]:
+        """Rutas de los segmentos de una copia columnar, en el orden en que se añadieron"""
+        directory = ExcelService._segments_dir(sidecar, inode)
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith(".feather"))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name) for name in names]
+    
+    @staticmethod
+    def _remove_segments(sidecar: str, keep: Optional[int] = None) -> None:
+        """Elimina los segmentos de las copias columnares anteriores (salvo los de keep)"""
+        for directory in glob.glob(f"{glob.escape(sidecar)}.segments-*"):
+            if keep is None or directory != ExcelService._segments_dir(sidecar, keep):
+                shutil.rmtree(directory, ignore_errors=True)
+    
+    @staticmethod
+    def _segment_table(chunk: pd.DataFrame, table: Any) -> Optional[Any]:
+        """
+        Convierte las filas añadidas al esquema de la copia columnar
+        
+        Args:
+            chunk: Filas nuevas ya validadas
+            table: Copia columnar vigente
+            
+        Returns:
+            Optional[pyarrow.Table]: Filas nuevas con los tipos de la copia, o None si
+            no se pueden representar sin pérdida (p. ej. enteros fuera del rango del
+            tipo compactado o decimales que no caben en float32)
+        """
+        import pyarrow as pa
+        
+        try:
+            segment = pa.Table.from_pandas(chunk, preserve_index=False).cast(table.schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, ValueError):
+            return None
+        # La conversión a decimales más pequeños no comprueba la precisión
+        for position, field in enumerate(table.schema):
+            if pa.types.is_floating(field.type):
+                expected = chunk.iloc[:, position].to_numpy(dtype=np.float64, na_value=np.nan)
+                converted = segment.column(position).to_numpy().astype(np.float64)
+                if not np.array_equal(converted, expected, equal_nan=True):
+                    return None
+        return segment
+    
+    @staticmethod
+    def _append_segment(file_path: str, segment: Any) -> bool:
+        """
+        Añade las filas nuevas a la copia columnar como un segmento más, sin
+        reescribir las anteriores, y la marca como vigente
+        
+        Args:
+            file_path: Ruta al CSV (ya ampliado)
+            segment: Filas nuevas con el esquema de la copia (ver _segment_table)
+            
+        Returns:
+            bool: True si se escribió el segmento; False si la copia ya tiene
+            SIDECAR_MAX_SEGMENTS segmentos o no existe (hay que reescribirla)
+        """
+        from pyarrow import feather
+        
+        sidecar = ExcelService.sidecar_path(file_path)
+        try:
+            stat = os.stat(sidecar)
+        except FileNotFoundError:
+            return False
+        segments = ExcelService._sidecar_segments(sidecar, stat.st_ino)
+        if len(segments) >= settings.SIDECAR_MAX_SEGMENTS:
+            return False
+        
+        directory = ExcelService._segments_dir(sidecar, stat.st_ino)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+        try:
+            feather.write_feather(segment, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, os.path.join(directory, f"{len(segments) + 1:06d}.feather"))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # La copia sigue siendo válida: posterior al original ampliado
+        mtime = max(time.time_ns(), os.stat(file_path).st_mtime_ns)
+        os.utime(sidecar, ns=(stat.st_atime_ns, mtime))
+        return True
+    
+    @staticmethod
+    def build_summary(df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Crea el resumen (filas, columnas, tipos, valores faltantes, estadísticas) de un DataFrame
+        
+        Args:
+            df: DataFrame a resumir
+            
+        Returns:
+            Dict[str, Any]: Resumen del DataFrame
+        """
+        return SummaryAccumulator().update(df).to_summary()
+    
+    @staticmethod
+    @timed("parse")
+    def _parse_file(file_path: str, sheet: Optional[str] = None) -> pd.DataFrame:
+        """
+        Analiza un archivo Excel o CSV original. En los libros Excel solo se
+        analiza la hoja indicada (por defecto la primera).
+        
+        Returns:
+            pd.DataFrame: Contenido del archivo
+        """
+        try:
+            # Determinar el tipo de archivo por su extensión
+            if file_path.endswith('.csv'):
+                # Un solo análisis con los parámetros detectados (o guardados) del dialecto
+                kwargs = ExcelService._csv_read_kwargs(ExcelService.get_dialect(file_path))
+                try:
+                    df = pd.read_csv(file_path, **kwargs)
+                except (ImportError, ValueError) as e:
+                    if kwargs["engine"] != "pyarrow":
+                        raise
+                    # El motor pyarrow no admite todos los dialectos: repetir con el motor C
+                    logger.info("Error al leer CSV con pyarrow, usando el motor C: %s", e)
+                    kwargs.update(engine="c", encoding_errors="replace", on_bad_lines="warn")
+                    df = pd.read_csv(file_path, **kwargs)
+                
+                if kwargs["header"] is None:
+                    df.columns = [f"Columna {i + 1}" for i in range(len(df.columns))]
+            else:
+                # Para archivos Excel, asegurarse de que openpyxl está instalado
+                try:
+                    df = pd.read_excel(
+                        file_path,
+                        sheet_name=sheet if sheet is not None else 0,
+                        engine='openpyxl'
+                    )
+                except ImportError:
+                    raise ImportError("Missing optional dependency 'openpyxl'. Please install it using: pip install openpyxl")
+            
+            file_format = os.path.splitext(file_path)[1].lstrip('.')
+            BYTES_PARSED.inc(os.path.getsize(file_path), format=file_format)
+            ROWS_PARSED.inc(len(df), format=file_format)
+            return df
+        except Exception as e:
+            raise ValueError(f"Error al leer el archivo: {str(e)}")
+    
+    @staticmethod
+    def get_preview(file_path: str, rows: int = 5, sheet: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Obtiene una vista previa de un archivo Excel o CSV.
+        Si el archivo no está en caché, solo se leen las primeras filas y las
+        dimensiones salen de los metadatos guardados; sin ellos, el número de filas
+        se marca como aproximado (rows_exact) o se omite.
+        
+        Args:
+            file_path: Ruta al archivo
+            rows: Número de filas para la vista previa
+            sheet: Nombre de la hoja (por defecto la primera)
+            
+        Returns:
+            Dict[str, Any]: Información de vista previa del archivo
+            
+        Raises:
+            SheetNotFoundError: Si la hoja no existe
+        """
+        sheet = ExcelService.resolve_sheet(file_path, sheet)
+        try:
+            preview = ExcelService._preview_from_cache(file_path, rows, sheet)
+            if preview is not None:
+                return preview
+            
+            head, shape = ExcelService._read_head(file_path, rows, sheet)
+            return ExcelService._build_preview(file_path, head, shape, sheet)
+        except Exception as e:
+            raise ValueError(f"Error al obtener vista previa: {str(e)}")
+    
+    @staticmethod
+    async def get_preview_async(file_path: str, rows: int = 5, sheet: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Versión de get_preview para los endpoints: si el archivo no está en caché,
+        la lectura de las primeras filas se hace en el pool de workers
+        
+        Args:
+            file_path: Ruta al archivo
+            rows: Número de filas para la vista previa
+            sheet: Nombre de la hoja (por defecto la primera)
+            
+        Returns:
+            Dict[str, Any]: Información de vista previa del archivo
+        """
+        await catalog.touch_async(os.path.basename(file_path))
+        sheet = await ExcelService.resolve_sheet_async(file_path, sheet)
+        preview = ExcelService._preview_from_cache(file_path, rows, sheet)
+        if preview is not None:
+            return preview
+        return await preview_flight.run(
+            ExcelService.cache_key(file_path, sheet) + (rows,),
+            lambda: worker_pool.run(ExcelService.get_preview, file_path, rows, sheet)
+        )
+    
+    @staticmethod
+    def _preview_from_cache(file_path: str, rows: int, sheet: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Construye la vista previa a partir del DataFrame en caché, si lo hay"""
+        cached = dataset_cache.get(ExcelService.cache_key(file_path, sheet))
+        if cached is None:
+            return None
+        
+        df, summary = cached
+        return ExcelService._build_preview(file_path, df.head(rows), summary, sheet)
+    
+    @staticmethod
+    def _build_preview(
+        file_path: str,
+        head: pd.DataFrame,
+        shape: Dict[str, Any],
+        sheet: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Compone la respuesta de vista previa a partir de las primeras filas y las dimensiones"""
+        return {
+            "filename": os.path.basename(file_path),
+            "sheet": sheet,
+            "sheets": ExcelService.get_sheet_names(file_path),
+            "rows": shape["rows"],
+            "rows_exact": shape.get("rows_exact", True),
+            "columns": shape["columns"],
+            "column_names": shape["column_names"],
+            "preview_data": ExcelService._to_json_records(head),
+            # Del resumen en caché o, si solo se leyeron las primeras filas, de los metadatos
+            "approx_profile": shape.get("approx_profile"),
+        }
+    
+    @staticmethod
+    @timed("read_head")
+    def _read_head(file_path: str, rows: int, sheet: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Lee solo las primeras filas de un archivo y sus dimensiones
+        
+        Args:
+            file_path: Ruta al archivo
+            rows: Número de filas a leer
+            sheet: Hoja ya resuelta (por defecto la primera)
+            
+        Returns:
+            Tuple[pd.DataFrame, Dict[str, Any]]: Primeras filas y dimensiones (rows, columns,
+            column_names y, si está guardado, approx_profile). Si aún no hay dimensiones
+            guardadas, rows_exact es False y rows es aproximado o None
+        """
+        stored = ExcelService.get_sheet_metadata(file_path, sheet)
+        shape = stored.get("shape")
+        if shape is not None and stored.get("approx_profile") is not None:
+            shape = dict(shape, approx_profile=stored["approx_profile"])
+        
+        if file_path.endswith('.csv'):
+            kwargs = ExcelService._csv_read_kwargs(ExcelService.get_dialect(file_path))
+            if kwargs["engine"] == "pyarrow":
+                # El motor pyarrow no admite nrows
+                kwargs.update(engine="c", encoding_errors="replace", on_bad_lines="warn")
+            head = pd.read_csv(file_path, nrows=rows, **kwargs)
+            if kwargs["header"] is None:
+                head.columns = [f"Columna {i + 1}" for i in range(len(head.columns))]
+            
+            if shape is None:
+                # Sin dimensiones guardadas no se recorre el archivo: contar saltos de
+                # línea no da el número de filas (campos entre comillas con saltos,
+                # terminadores \r, líneas en blanco), así que se omite hasta el análisis
+                shape = {
+                    "rows": None,
+                    "rows_exact": False,
+                    "columns": len(head.columns),
+                    "column_names": head.columns.tolist(),
+                }
+        elif file_path.endswith('.xlsx'):
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise ImportError("Missing optional dependency 'openpyxl'. Please install it using: pip install openpyxl")
+            
+            # Modo solo lectura: las filas se leen bajo demanda sin cargar el libro completo
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+                values = list(worksheet.iter_rows(max_row=rows + 1, values_only=True))
+                total_rows = worksheet.max_row
+            finally:
+                workbook.close()
+            
+            if not values:
+                head = pd.DataFrame()
+            else:
+                head = pd.DataFrame(values[1:], columns=ExcelService._header_names(values[0]))
+            
+            if shape is None and total_rows is None:
+                # El libro no declara sus dimensiones: hace falta leerlo completo
+                df, summary = ExcelService.read_file(file_path, sheet)
+                return df.head(rows), summary
+            if shape is None:
+                # Dimensión declarada por el libro: puede incluir filas vacías
+                shape = {
+                    "rows": max(total_rows - 1, 0),
+                    "rows_exact": False,
+                    "columns": len(head.columns),
+                    "column_names": head.columns.tolist(),
+                }
+        else:
+            # openpyxl no lee .xls en modo solo lectura: lectura completa (queda en caché)
+            df, summary = ExcelService.read_file(file_path, sheet)
+            return df.head(rows), summary
+        
+        return head, shape
+    
+    @staticmethod
+    def get_rows(
+        file_path: str,
+        offset: int = 0,
+        limit: int = 100,
+        columns: Optional[List[str]] = None,
+        sheet: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Obtiene una ventana de filas y columnas de un archivo sin volver a analizarlo:
+        del DataFrame en caché, de la copia columnar (solo las columnas pedidas) o,
+        para archivos procesados por bloques, leyendo directamente esas filas
+        
+        Args:
+            file_path: Ruta al archivo
+            offset: Primera fila (desde 0)
+            limit: Número máximo de filas
+            columns: Columnas a devolver (por defecto todas)
+            sheet: Nombre de la hoja (por defecto la primera)
+            
+        Returns:
+            Dict[str, Any]: Página de filas (offset, limit, total_rows, columns, rows)
+            
+        Raises:
+            SheetNotFoundError: Si la hoja no existe
+            ColumnNotFoundError: Si alguna columna no existe
+        """
+        sheet = ExcelService.resolve_sheet(file_path, sheet)
+        page = ExcelService._rows_from_cache(file_path, offset, limit, columns, sheet)
+        if page is not None:
+            return page
+        
+        shape = ExcelService.get_sheet_metadata(file_path, sheet).get("shape")
+        if shape is not None:
+            selected = ExcelService._select_columns(shape["column_names"], columns)
+            window = ExcelService._read_sidecar(file_path, sheet, selected, offset, limit)
+            if window is None and ExcelService.use_chunked_mode(file_path):
+                window = ExcelService._read_window(file_path, offset, limit, sheet)[selected]
+            if window is not None:
+                return ExcelService._build_rows_page(file_path, sheet, window, shape["rows"], offset, limit)
+        
+        # Primera lectura: se analiza una vez (queda en caché y con copia columnar)
+        df, summary = ExcelService.read_file(file_path, sheet)
+        if summary.get("sampled"):
+            selected = ExcelService._select_columns(summary["column_names"], columns)
+            window = ExcelService._read_window(file_path, offset, limit, sheet)[selected]
+            return ExcelService._build_rows_page(file_path, sheet, window, summary["rows"], offset, limit)
+        return ExcelService._slice_rows(file_path, sheet, df, offset, limit, columns)
+    
+    @staticmethod
+    def rows_etag(
+        file_path: str,
+        offset: int,
+        limit: int,
+        columns: Optional[List[str]] = None,
+        sheet: Optional[str] = None
+    ) -> str:
+        """
+        ETag de una página de filas: cambia si cambia el contenido del archivo
+        o los parámetros de la página
+        
+        Returns:
+            str: ETag entre comillas, listo para la cabecera
+        """
+        key = json.dumps(
+            [ExcelService.get_dataset_version(file_path), sheet, offset, limit, columns or []],
+            ensure_ascii=False
+        )
+        return f'"{hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]}"'
+    
+    @staticmethod
+    async def get_rows_async(
+        file_path: str,
+        offset: int = 0,
+        limit: int = 100,
+        columns: Optional[List[str]] = None,
+        sheet: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Versión de get_rows para los endpoints: sin caché, la lectura se hace en el pool de workers"""
+        await catalog.touch_async(os.path.basename(file_path))
+        sheet = await ExcelService.resolve_sheet_async(file_path, sheet)
+        page = ExcelService._rows_from_cache(file_path, offset, limit, columns, sheet)
+        if page is not None:
+            return page
+        return await worker_pool.run(ExcelService.get_rows, file_path, offset, limit, columns, sheet)
+    
+    @staticmethod
+    def _rows_from_cache(
+        file_path: str,
+        offset: int,
+        limit: int,
+        columns: Optional[List[str]],
+        sheet: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Página de filas a partir del DataFrame en caché, si lo hay y está completo"""
+        cached = dataset_cache.get(ExcelService.cache_key(file_path, sheet))
+        if cached is None:
+            return None
+        df, summary = cached
+        if summary.get("sampled"):
+            # En modo por bloques el caché solo tiene una muestra
+            return None
+        return ExcelService._slice_rows(file_path, sheet, df, offset, limit, columns)
+    
+    @staticmethod
+    def _slice_rows(
+        file_path: str,
+        sheet: Optional[str],
+        df: pd.DataFrame,
+        offset: int,
+        limit: int,
+        columns: Optional[List[str]]
+    ) -> Dict[str, Any]:
+        selected = ExcelService._select_columns(df.columns.tolist(), columns)
+        window = df.iloc[offset:offset + limit][selected]
+        return ExcelService._build_rows_page(file_path, sheet, window, len(df), offset, limit)
+    
+    @staticmethod
+    def _select_columns(available: List[str], columns: Optional[List[str]]) -> List[str]:
+        """Valida las columnas pedidas y devuelve la proyección (todas si no se indican)"""
+        if not columns:
+            return list(available)
+        missing = [col for col in columns if col not in available]
+        if missing:
+            raise ColumnNotFoundError(f"Columnas no encontradas: {', '.join(missing)}")
+        return list(columns)
+    
+    @staticmethod
+    def _build_rows_page(
+        file_path: str,
+        sheet: Optional[str],
+        window: pd.DataFrame,
+        total_rows: int,
+        offset: int,
+        limit: int
+    ) -> Dict[str, Any]:
+        """Compone la respuesta de una página de filas"""
+        return {
+            "filename": os.path.basename(file_path),
+            "sheet": sheet,
+            "offset": offset,
+            "limit": limit,
+            "total_rows": total_rows,
+            "columns": window.columns.tolist(),
+            "rows": ExcelService._to_json_records(window),
+        }
+    
+    @staticmethod
+    def export(
+        file_path: str,
+        file_format: str,
+        sheet: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> Iterator[bytes]:
+        """
+        Exporta una hoja completa en bloques de EXPORT_CHUNK_ROWS filas, de modo
+        que la memoria usada no depende del número de filas
+        
+        Args:
+            file_path: Ruta al archivo
+            file_format: Formato de salida (ndjson, csv o arrow)
+            sheet: Hoja ya resuelta (por defecto la primera)
+            columns: Columnas a exportar (por defecto todas)
+            
+        Returns:
+            Iterator[bytes]: Contenido serializado, bloque a bloque
+            
+        Raises:
+            ColumnNotFoundError: Si alguna columna no existe
+        """
+        serializer = EXPORT_FORMATS[file_format][2]
+        chunks = ExcelService._export_chunks(file_path, sheet, columns, settings.EXPORT_CHUNK_ROWS)
+        
+        def counted() -> Iterator[pd.DataFrame]:
+            for chunk in chunks:
+                ROWS_EXPORTED.inc(len(chunk), format=file_format)
+                yield chunk
+        
+        return serializer(counted())
+    
+    @staticmethod
+    def _export_chunks(
+        file_path: str,
+        sheet: Optional[str],
+        columns: Optional[List[str]],
+        chunk_rows: int
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Elige de dónde leer la hoja completa (DataFrame en caché, copia columnar
+        con memory mapping o, para archivos grandes sin copia, el original por
+        bloques) y valida las columnas antes de empezar
+        """
+        cached = dataset_cache.get(ExcelService.cache_key(file_path, sheet))
+        if cached is not None and not cached[1].get("sampled"):
+            df = cached[0]
+            selected = ExcelService._select_columns(df.columns.tolist(), columns)
+            return ExcelService._iter_frame(df[selected] if columns else df, chunk_rows)
+        
+        table = ExcelService._open_sidecar(file_path, sheet)
+        if table is not None:
+            selected = ExcelService._select_columns(table.column_names, columns)
+            return ExcelService._iter_table(table.select(selected) if columns else table, chunk_rows)
+        
+        if ExcelService.use_chunked_mode(file_path):
+            if ExcelService.get_sheet_metadata(file_path, sheet).get("accumulator") is None:
+                # Primer recorrido: deja el resumen (y los tipos de todo el archivo) en los metadatos
+                ExcelService.read_file(file_path, sheet)
+            stored = ExcelService.get_sheet_metadata(file_path, sheet)["accumulator"]
+            selected = ExcelService._select_columns(stored["column_names"], columns)
+            return ExcelService._iter_source(file_path, sheet, selected, stored["dtypes"], chunk_rows)
+        
+        df, _ = ExcelService.read_file(file_path, sheet)
+        selected = ExcelService._select_columns(df.columns.tolist(), columns)
+        return ExcelService._iter_frame(df[selected] if columns else df, chunk_rows)
+    
+    @staticmethod
+    def _iter_frame(df: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        yield df.iloc[:chunk_rows]
+        for start in range(chunk_rows, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    
+    @staticmethod
+    def _iter_table(table: Any, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        # Cada bloque se convierte a pandas por separado: las páginas de la copia
+        # mapeada se leen del disco a medida que se recorren
+        yield table.slice(0, chunk_rows).to_pandas()
+        for start in range(chunk_rows, table.num_rows, chunk_rows):
+            yield table.slice(start, chunk_rows).to_pandas()
+    
+    @staticmethod
+    def _iter_source(
+        file_path: str,
+        sheet: Optional[str],
+        columns: List[str],
+        dtypes: Dict[str, str],
+        chunk_rows: int
+    ) -> Iterator[pd.DataFrame]:
+        empty = True
+        for chunk in ExcelService.iter_chunks(file_path, chunk_rows, sheet):
+            chunk = chunk[columns]
+            # Los tipos inferidos en cada bloque pueden variar (enteros en uno,
+            # decimales en otro): se usan los de todo el archivo
+            for position, name in enumerate(columns):
+                dtype = dtypes.get(name)
+                if dtype is not None and str(chunk.dtypes.iloc[position]) != dtype:
+                    try:
+                        chunk.isetitem(position, chunk.iloc[:, position].astype(dtype))
+                    except (TypeError, ValueError):
+                        pass
+            empty = False
+            yield chunk
+        if empty:
+            yield pd.DataFrame(columns=columns)
+    
+    @staticmethod
+    @timed("read_window")
+    def _read_window(file_path: str, offset: int, limit: int, sheet: Optional[str] = None) -> pd.DataFrame:
+        """
+        Lee solo una ventana de filas del archivo original (archivos grandes sin
+        copia columnar). El coste crece con el desplazamiento, no con el tamaño total.
+        
+        Args:
+            file_path: Ruta al archivo CSV o XLSX
+            offset: Primera fila (desde 0)
+            limit: Número máximo de filas
+            sheet: Hoja ya resuelta (por defecto la primera)
+            
+        Returns:
+            pd.DataFrame: Filas de la ventana con los nombres de columna del archivo
+        """
+        if file_path.endswith('.csv'):
+            kwargs = ExcelService._csv_read_kwargs(ExcelService.get_dialect(file_path))
+            if kwargs["engine"] == "pyarrow":
+                # El motor pyarrow no admite skiprows ni nrows
+                kwargs.update(engine="c", encoding_errors="replace", on_bad_lines="warn")
+            first = 1 if kwargs["header"] is not None else 0
+            window = pd.read_csv(file_path, skiprows=range(first, first + offset), nrows=limit, **kwargs)
+            if kwargs["header"] is None:
+                window.columns = [f"Columna {i + 1}" for i in range(len(window.columns))]
+        else:
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise ImportError("Missing optional dependency 'openpyxl'. Please install it using: pip install openpyxl")
+            
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+                header = ExcelService._header_names(next(worksheet.iter_rows(max_row=1, values_only=True), ()))
+                values = list(worksheet.iter_rows(min_row=offset + 2, max_row=offset + 1 + limit, values_only=True))
+            finally:
+                workbook.close()
+            window = pd.DataFrame(values, columns=header) if values else pd.DataFrame(columns=header)
+        
+        window.index = pd.RangeIndex(offset, offset + len(window))
+        return window
+    
+    @staticmethod
+    def _to_json_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Convierte un DataFrame en una lista de registros serializables a JSON
+        
+        Args:
+            df: DataFrame a convertir
+            
+        Returns:
+            List[Dict[str, Any]]: Registros con valores nulos, fechas ISO o texto
+        """
+        # Conversión por columnas (nulos, fechas y texto), no celda a celda
+        return to_json_records(df)
@@ -0,0 +1,158 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from app.services.conversion import iso_strings, text_values
+
+
+def to_json_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Convierte un DataFrame en registros serializables a JSON: nulos como None,
+    fechas en ISO y el resto como texto. La conversión se hace por columnas.
+
+    Args:
+        df: DataFrame a convertir
+
+    Returns:
+        List[Dict[str, Any]]: Un registro por fila
+    """
+    names = df.columns.tolist()
+    if not names:
+        return [{} for _ in range(len(df))]
+    columns = [text_values(df.iloc[:, position]).tolist() for position in range(len(names))]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def iter_ndjson(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Serializa bloques de filas como JSON por líneas (un objeto por fila),
+    conservando números y booleanos; nulos como null y fechas en ISO
+
+    Args:
+        chunks: Bloques de filas
+
+    Yields:
+        bytes: Texto UTF-8 de cada bloque
+    """
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        dates = [p for p, dtype in enumerate(chunk.dtypes) if pd.api.types.is_datetime64_any_dtype(dtype)]
+        if dates:
+            chunk = chunk.copy(deep=False)
+            for position in dates:
+                series = chunk.iloc[:, position]
+                values = iso_strings(series)
+                values[series.isna().to_numpy()] = None
+                chunk.isetitem(position, pd.Series(values, index=chunk.index, dtype=object))
+        text = chunk.to_json(
+            orient="records", lines=True, force_ascii=False, date_format="iso", default_handler=str
+        )
+        yield (text if text.endswith("\n") else text + "\n").encode("utf-8")
+
+
+def iter_csv(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Serializa bloques de filas como CSV UTF-8 con el encabezado en el primero
+
+    Args:
+        chunks: Bloques de filas
+
+    Yields:
+        bytes: Texto UTF-8 de cada bloque
+    """
+    header = True
+    for chunk in chunks:
+        if not len(chunk) and not header:
+            continue
+        yield chunk.to_csv(index=False, header=header, lineterminator="\n").encode("utf-8")
+        header = False
+
+
+class _BufferSink:
+    """Destino en memoria del escritor Arrow que se vacía tras cada bloque"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self.closed = False
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_table(chunk: pd.DataFrame, schema: Any) -> Any:
+    """Convierte un bloque al esquema del primero (las columnas vacías en este bloque quedan nulas)"""
+    import pyarrow as pa
+
+    arrays = []
+    for position, field in enumerate(schema):
+        series = chunk.iloc[:, position]
+        try:
+            arrays.append(pa.array(series, type=field.type, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            if not series.isna().all():
+                raise
+            arrays.append(pa.nulls(len(series), field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def iter_arrow(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Serializa bloques de filas en formato Arrow IPC (stream): el esquema del
+    primer bloque y un lote de registros por bloque
+
+    Args:
+        chunks: Bloques de filas
+
+    Yields:
+        bytes: Mensajes IPC de cada bloque
+
+    Raises:
+        ImportError: Si pyarrow no está instalado
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Missing optional dependency 'pyarrow'. Please install it using: pip install pyarrow")
+
+    sink = _BufferSink()
+    writer: Optional[Any] = None
+    schema = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                schema = table.schema
+                writer = pa.ipc.new_stream(sink, schema)
+            else:
+                table = _arrow_table(chunk, schema)
+            writer.write_table(table)
+            yield sink.drain()
+        if writer is None:
+            # Sin bloques: un stream vacío sin columnas
+            writer = pa.ipc.new_stream(sink, pa.schema([]))
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+# Formatos de exportación: tipo de contenido, extensión del archivo descargado y serializador
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", ".ndjson", iter_ndjson),
+    "csv": ("text/csv; charset=utf-8", ".csv", iter_csv),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrow", iter_arrow),
+}
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.catalog_service import catalog
+from app.services.excel_service import ExcelService
+from app.services.metrics import FILES_EVICTED
+
+logger = logging.getLogger(__name__)
+
+
+class StorageJanitor:
+    """
+    Limpieza periódica del directorio de archivos: elimina los archivos caducados
+    (sin accesos durante FILE_TTL_SECONDS) y, si se supera STORAGE_QUOTA_BYTES,
+    los usados hace más tiempo, junto con sus artefactos derivados y cachés
+    """
+
+    # Las subidas a medias (.part) con más antigüedad se consideran abandonadas
+    STALE_UPLOAD_SECONDS = 3600.0
+
+    def __init__(self, interval: float, ttl: float, quota: int):
+        self.interval = interval
+        self.ttl = ttl
+        self.quota = quota
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+        self.runs = 0
+        self.expired = 0
+        self.over_quota = 0
+        self.last_run: Optional[float] = None
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        Ejecuta una pasada de limpieza
+
+        Returns:
+            Dict[str, int]: Archivos eliminados por caducidad y por cuota
+        """
+        # Una sola pasada a la vez (tarea periódica y llamadas manuales)
+        with self._lock:
+            ExcelService.sync_catalog()
+            self._remove_stale_uploads()
+
+            expired = 0
+            if self.ttl > 0:
+                for filename in catalog.expired(self.ttl):
+                    expired += self._evict(filename, "expired")
+
+            over_quota = 0
+            if self.quota > 0:
+                used = catalog.storage_bytes()
+                for filename, size in catalog.least_recently_used():
+                    if used <= self.quota:
+                        break
+                    over_quota += self._evict(filename, "quota")
+                    used -= size
+
+            self.runs += 1
+            self.expired += expired
+            self.over_quota += over_quota
+            self.last_run = time.time()
+            if expired or over_quota:
+                logger.info("Limpieza: %d archivos caducados y %d por cuota eliminados", expired, over_quota)
+            return {"expired": expired, "over_quota": over_quota}
+
+    def _evict(self, filename: str, reason: str) -> int:
+        file_path = ExcelService.get_file_path(filename)
+        try:
+            ExcelService.delete_file(file_path)
+        except FileNotFoundError:
+            # Eliminado por otra vía: solo queda la entrada del catálogo
+            catalog.remove(filename)
+            return 0
+        except OSError as e:
+            logger.warning("No se pudo eliminar %s: %s", filename, e)
+            return 0
+        FILES_EVICTED.inc(reason=reason)
+        logger.debug("Eliminado %s (%s)", filename, reason)
+        return 1
+
+    def _remove_stale_uploads(self) -> None:
+        if not os.path.isdir(ExcelService.TEMP_DIR):
+            return
+        cutoff = time.time() - self.STALE_UPLOAD_SECONDS
+        for name in os.listdir(ExcelService.TEMP_DIR):
+            if name.startswith(".upload-") and name.endswith(".part"):
+                path = os.path.join(ExcelService.TEMP_DIR, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                # En un hilo aparte (no en el pool de workers): si el pool fuera de
+                # procesos, las invalidaciones de caché no llegarían a este proceso
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("Error en la limpieza periódica de archivos")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Inicia la limpieza periódica en el event loop actual"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Detiene la limpieza periódica"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del catálogo y de la limpieza"""
+        return {
+            "files": catalog.count(),
+            "storage_bytes": catalog.storage_bytes(),
+            "quota_bytes": self.quota,
+            "ttl_seconds": self.ttl,
+            "runs": self.runs,
+            "expired": self.expired,
+            "over_quota": self.over_quota,
+            "last_run": self.last_run,
+        }
+
+
+# Limpieza compartida por la aplicación
+janitor = StorageJanitor(
+    interval=settings.JANITOR_INTERVAL_SECONDS,
+    ttl=settings.FILE_TTL_SECONDS,
+    quota=settings.STORAGE_QUOTA_BYTES,
+)
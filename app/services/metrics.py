@@ -0,0 +1,281 @@
+import bisect
+import contextvars
+import functools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Límites de los histogramas de latencia, en segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Tramos medidos durante la petición HTTP en curso: [(etapa, segundos)]
+_request_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_spans", default=None
+)
+
+
+def _escape(value: str) -> str:
+    """Escapa el valor de una etiqueta según el formato de texto de Prometheus"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotónico con etiquetas"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """Incrementa el contador para la combinación de etiquetas indicada"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """Valor actual para una combinación de etiquetas"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas (formato de Prometheus)"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinación de etiquetas: (observaciones por tramo, suma, total)
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Registra una observación (en segundos para las latencias)"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, observed in zip(self.buckets + (math.inf,), counts):
+                    cumulative += observed
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    """Valor instantáneo calculado en el momento de la consulta"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], List[Tuple[Sequence[str], float]]],
+        kind: str = "gauge"
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self._collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas expuestas en /metrics"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Genera el texto de exposición de Prometheus (versión 0.0.4)"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "excelia_stage_duration_seconds",
+    "Duración de cada etapa del procesamiento (detección, análisis, resumen, contexto, modelo)",
+    ["stage"],
+))
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "excelia_http_request_duration_seconds",
+    "Duración de las peticiones HTTP hasta el envío de las cabeceras",
+    ["method", "route", "status"],
+))
+HTTP_REQUESTS = registry.register(Counter(
+    "excelia_http_requests_total",
+    "Peticiones HTTP atendidas",
+    ["method", "route", "status"],
+))
+WORKER_JOB_SECONDS = registry.register(Histogram(
+    "excelia_worker_job_duration_seconds",
+    "Tiempo de los trabajos del pool de workers, incluida la espera en cola",
+    ["job"],
+))
+BYTES_PARSED = registry.register(Counter(
+    "excelia_bytes_parsed_total",
+    "Bytes de archivos originales analizados",
+    ["format"],
+))
+ROWS_PARSED = registry.register(Counter(
+    "excelia_rows_parsed_total",
+    "Filas de archivos originales analizadas",
+    ["format"],
+))
+ROWS_EXPORTED = registry.register(Counter(
+    "excelia_rows_exported_total",
+    "Filas exportadas por formato de salida",
+    ["format"],
+))
+LLM_REQUESTS = registry.register(Counter(
+    "excelia_llm_requests_total",
+    "Llamadas al modelo por resultado",
+    ["mode", "outcome"],
+))
+LLM_RETRIES = registry.register(Counter(
+    "excelia_llm_retries_total",
+    "Reintentos de llamadas al modelo por errores transitorios",
+))
+LLM_TOKENS = registry.register(Counter(
+    "excelia_llm_tokens_total",
+    "Tokens consumidos en las llamadas al modelo",
+    ["kind"],
+))
+FILES_EVICTED = registry.register(Counter(
+    "excelia_files_evicted_total",
+    "Archivos eliminados por la limpieza periódica (caducados o por cuota)",
+    ["reason"],
+))
+ANSWERS = registry.register(Counter(
+    "excelia_answers_total",
+    "Respuestas del chat por origen (local, caché, modelo o compartida con una pregunta idéntica en curso)",
+    ["source"],
+))
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Registra la duración de una etapa en el histograma y en la petición en curso"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+    logger.debug("Etapa %s: %.2f ms", stage, seconds * 1000, extra={"stage": stage, "duration_ms": seconds * 1000})
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Mide la duración de una etapa del procesamiento
+
+    Args:
+        stage: Nombre de la etapa (etiqueta del histograma)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def timed(stage: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorador que mide cada llamada a la función como una etapa"""
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_spans() -> Tuple[List[Tuple[str, float]], contextvars.Token]:
+    """Empieza a recoger los tramos de la petición en curso"""
+    spans: List[Tuple[str, float]] = []
+    return spans, _request_spans.set(spans)
+
+
+def stop_request_spans(token: contextvars.Token) -> None:
+    _request_spans.reset(token)
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """
+    Formatea los tramos de una petición como cabecera Server-Timing, sumando
+    las etapas repetidas
+
+    Args:
+        spans: Tramos recogidos [(etapa, segundos)]
+
+    Returns:
+        str: Valor de la cabecera (p. ej. "parse;dur=12.3, summary;dur=1.2")
+    """
+    totals: Dict[str, float] = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(
+        f"{stage.replace('.', '-')};dur={seconds * 1000:.1f}" for stage, seconds in totals.items()
+    )
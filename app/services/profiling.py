@@ -0,0 +1,244 @@
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.sketches import ColumnSketch
+
+
+def _is_numeric(dtype: Any) -> bool:
+    """Indica si un tipo cuenta como numérico en el resumen (igual que select_dtypes('number'))"""
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _is_categorical(dtype: Any) -> bool:
+    """Indica si un tipo cuenta como categórico en el resumen (texto o categoría)"""
+    return (
+        pd.api.types.is_object_dtype(dtype)
+        or isinstance(dtype, pd.CategoricalDtype)
+        or pd.api.types.is_string_dtype(dtype)
+    ) and not _is_numeric(dtype)
+
+
+class SummaryAccumulator:
+    """
+    Acumulador combinable del resumen de un archivo (filas, tipos, valores faltantes
+    y media/mínimo/máximo de las columnas numéricas) y, con APPROX_PROFILE, de los
+    sketches de cada columna (valores distintos, cuantiles y valores más frecuentes).
+    Permite construir el resumen bloque a bloque sin tener la tabla completa en
+    memoria, combinar resultados parciales y guardarse en JSON para actualizarlo
+    más adelante.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.column_names: Optional[List[str]] = None
+        self.dtypes: Dict[str, Any] = {}
+        self.missing: Dict[str, int] = {}
+        # Estadísticas por columna numérica: valores no nulos, suma, mínimo y máximo
+        self.count: Dict[str, int] = {}
+        self.sum: Dict[str, float] = {}
+        self.min: Dict[str, float] = {}
+        self.max: Dict[str, float] = {}
+        # Sketches por columna; None si no se calculan o faltan filas en ellos
+        self.sketches: Optional[Dict[str, ColumnSketch]] = {} if settings.APPROX_PROFILE else None
+
+    def update(self, df: pd.DataFrame) -> "SummaryAccumulator":
+        """
+        Incorpora un bloque de filas al resumen
+
+        Args:
+            df: Bloque de filas con las mismas columnas que los anteriores
+
+        Returns:
+            SummaryAccumulator: El propio acumulador
+        """
+        if self.column_names is None:
+            self.column_names = df.columns.tolist()
+        elif df.columns.tolist() != self.column_names:
+            raise ValueError("Las columnas del bloque no coinciden con las del resumen")
+
+        self.rows += len(df)
+        for col in df.columns:
+            self.dtypes[col] = self._combine_dtypes(self.dtypes.get(col), df[col].dtype)
+
+        # Todas las agregaciones se calculan por columnas, de forma vectorizada
+        for col, value in df.isna().sum().items():
+            self.missing[col] = self.missing.get(col, 0) + int(value)
+
+        numeric = [col for col in df.columns if _is_numeric(df[col].dtype)]
+        if numeric and len(df):
+            values = df[numeric]
+            stats = pd.DataFrame({
+                "count": values.count(),
+                "sum": values.sum(),
+                "min": values.min(),
+                "max": values.max(),
+            })
+            for col, row in stats.iterrows():
+                self._add_stats(col, int(row["count"]), float(row["sum"]), float(row["min"]), float(row["max"]))
+
+        if self.sketches is not None:
+            for col in df.columns:
+                series = df[col]
+                self.sketches.setdefault(col, ColumnSketch()).update(series, _is_numeric(series.dtype))
+        return self
+
+    def merge(self, other: "SummaryAccumulator") -> "SummaryAccumulator":
+        """
+        Combina otro acumulador (filas posteriores del mismo archivo) con este
+
+        Args:
+            other: Acumulador a combinar
+
+        Returns:
+            SummaryAccumulator: El propio acumulador
+        """
+        if other.column_names is None:
+            return self
+        if self.column_names is None:
+            self.column_names = list(other.column_names)
+        elif other.column_names != self.column_names:
+            raise ValueError("Las columnas de los resúmenes no coinciden")
+
+        self.rows += other.rows
+        for col, dtype in other.dtypes.items():
+            self.dtypes[col] = self._combine_dtypes(self.dtypes.get(col), dtype)
+        for col, value in other.missing.items():
+            self.missing[col] = self.missing.get(col, 0) + value
+        for col in other.count:
+            self._add_stats(col, other.count[col], other.sum[col], other.min[col], other.max[col])
+
+        if self.sketches is None or other.sketches is None:
+            # Sketches incompletos: mejor no mostrarlos
+            self.sketches = None
+        else:
+            for col, sketch in other.sketches.items():
+                if col in self.sketches:
+                    self.sketches[col].merge(sketch)
+                else:
+                    self.sketches[col] = sketch
+        return self
+
+    def to_summary(self) -> Dict[str, Any]:
+        """
+        Construye el resumen con el mismo formato que ExcelService.build_summary
+
+        Returns:
+            Dict[str, Any]: Resumen del archivo
+        """
+        columns = self.column_names or []
+        numeric_columns = [col for col in columns if _is_numeric(self.dtypes[col])]
+        summary = {
+            "rows": self.rows,
+            "columns": len(columns),
+            "column_names": list(columns),
+            "dtypes": {col: str(self.dtypes[col]) for col in columns},
+            "missing_values": {col: self.missing.get(col, 0) for col in columns},
+            "numeric_columns": numeric_columns,
+            "categorical_columns": [col for col in columns if _is_categorical(self.dtypes[col])]
+        }
+
+        if numeric_columns:
+            summary["numeric_stats"] = {
+                "mean": {
+                    col: self.sum[col] / self.count[col] if self.count.get(col) else math.nan
+                    for col in numeric_columns
+                },
+                "min": {col: self.min.get(col, math.nan) for col in numeric_columns},
+                "max": {col: self.max.get(col, math.nan) for col in numeric_columns},
+            }
+
+        if self.sketches:
+            summary["approx_profile"] = {
+                col: self.sketches[col].profile(self.rows - self.missing.get(col, 0))
+                for col in columns if col in self.sketches
+            }
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa el acumulador a un diccionario compatible con JSON"""
+        return {
+            "rows": self.rows,
+            "column_names": self.column_names,
+            "dtypes": {col: str(dtype) for col, dtype in self.dtypes.items()},
+            "missing": self.missing,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    def sketches_to_dict(self) -> Optional[Dict[str, Any]]:
+        """
+        Serializa los sketches por separado: ocupan mucho más que el resto del
+        acumulador y solo se necesitan para ampliar o combinar el resumen
+        """
+        if self.sketches is None:
+            return None
+        return {col: sketch.to_dict() for col, sketch in self.sketches.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], sketches: Optional[Dict[str, Any]] = None) -> "SummaryAccumulator":
+        """
+        Reconstruye un acumulador guardado con to_dict
+
+        Args:
+            data: Acumulador serializado
+            sketches: Sketches serializados con sketches_to_dict (sin ellos, el
+                acumulador no incluye el perfil aproximado)
+
+        Returns:
+            SummaryAccumulator: Acumulador reconstruido
+        """
+        accumulator = cls()
+        accumulator.rows = data["rows"]
+        accumulator.column_names = data["column_names"]
+        accumulator.dtypes = {col: _parse_dtype(dtype) for col, dtype in data["dtypes"].items()}
+        accumulator.missing = dict(data["missing"])
+        accumulator.count = dict(data["count"])
+        accumulator.sum = dict(data["sum"])
+        accumulator.min = dict(data["min"])
+        accumulator.max = dict(data["max"])
+        if sketches is not None:
+            accumulator.sketches = {col: ColumnSketch.from_dict(sketch) for col, sketch in sketches.items()}
+        elif accumulator.rows:
+            # Guardado sin sketches: no se pueden completar solo con las filas nuevas
+            accumulator.sketches = None
+        return accumulator
+
+    def _add_stats(self, col: str, count: int, total: float, minimum: float, maximum: float) -> None:
+        if count == 0:
+            self.count.setdefault(col, 0)
+            self.sum.setdefault(col, 0.0)
+            return
+        if self.count.get(col):
+            self.min[col] = min(self.min[col], minimum)
+            self.max[col] = max(self.max[col], maximum)
+        else:
+            self.min[col] = minimum
+            self.max[col] = maximum
+        self.count[col] = self.count.get(col, 0) + count
+        self.sum[col] = self.sum.get(col, 0.0) + total
+
+    @staticmethod
+    def _combine_dtypes(current: Any, new: Any) -> Any:
+        """Tipo resultante de una columna cuyos bloques tienen tipos distintos"""
+        if current is None or str(current) == str(new):
+            return new
+        if _is_numeric(current) and _is_numeric(new):
+            try:
+                return np.result_type(current, new)
+            except TypeError:
+                return np.dtype("float64")
+        return np.dtype("object")
+
+
+def _parse_dtype(name: str) -> Any:
+    """Convierte el nombre de un tipo guardado en JSON en un tipo de pandas/numpy"""
+    try:
+        return pd.api.types.pandas_dtype(name)
+    except TypeError:
+        return np.dtype("object")
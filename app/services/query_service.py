@@ -0,0 +1,476 @@
+import logging
+import re
+import warnings
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.context_builder import normalize_text
+from app.services.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Palabras clave (ya normalizadas: minúsculas y sin tildes) de cada agregación
+AGGREGATION_KEYWORDS = {
+    "sum": ["total", "suma", "sumatoria", "sum"],
+    "mean": ["promedio", "media", "average", "mean", "avg"],
+    "max": ["maximo", "maxima", "max", "mayor", "highest", "maximum", "largest"],
+    "min": ["minimo", "minima", "min", "menor", "lowest", "minimum", "smallest"],
+    "nunique": ["distintos", "distintas", "unicos", "unicas", "unique", "distinct"],
+    "count": ["cuantos", "cuantas", "cuenta", "count", "how many", "numero de", "cantidad de"],
+}
+
+MISSING_KEYWORDS = [
+    "vacio", "vacios", "vacia", "vacias", "faltante", "faltantes", "nulo", "nulos",
+    "nula", "nulas", "empty", "missing", "null", "nulls", "blank", "en blanco", "sin valor",
+]
+
+ROW_KEYWORDS = ["filas", "fila", "registros", "registro", "rows", "row", "records", "lineas"]
+
+GROUP_BY_KEYWORDS = ["por cada", "para cada", "agrupado por", "por", "by", "per", "for each"]
+
+FILTER_KEYWORDS = ["donde", "cuando", "where", "with", "con", "whose", "cuyo", "cuya"]
+
+# Palabras que unen dos condiciones o introducen otra (un filtro con ellas no se interpreta)
+CLAUSE_WORDS = [
+    "y", "e", "o", "u", "and", "or", "pero", "but", "excepto", "except", "excluyendo",
+    "excluding", "salvo", "sin", "without", "solo", "only",
+]
+
+# Palabras de relleno que pueden quedar en una pregunta ya interpretada
+FILLER_WORDS = {
+    "cual", "cuales", "que", "es", "son", "fue", "era", "el", "la", "los", "las", "lo", "hay",
+    "tiene", "tienen", "valor", "valores", "dato", "datos", "dame", "dime", "calcula", "muestra",
+    "quiero", "saber", "archivo", "fichero", "tabla", "what", "which", "is", "are", "was", "the",
+    "there", "tell", "me", "show", "give", "calculate", "file", "table", "please", "columna",
+    "column", "campo", "field",
+}
+
+# Preposiciones admitidas solo delante de la columna consultada ("total de Ventas")
+CONNECTOR_WORDS = {"de", "del", "en", "in", "of", "for", "para"}
+
+# Palabras que pueden ir entre una preposición y la columna ("de la columna Ventas")
+ARTICLE_WORDS = {"el", "la", "los", "las", "the", "columna", "column", "campo", "field"}
+
+# Interrogativos que convierten una segunda columna en etiqueta ("¿qué producto...?")
+LABEL_WORDS = ["que", "cual", "cuales", "which", "what"]
+
+# Expresiones ya interpretadas al clasificar la pregunta
+_CONSUMED_PHRASES = sorted(
+    {keyword for keywords in AGGREGATION_KEYWORDS.values() for keyword in keywords}
+    | set(MISSING_KEYWORDS) | set(ROW_KEYWORDS) | {"numero", "cantidad", "number"},
+    key=len, reverse=True,
+)
+_CONSUMED_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(phrase) for phrase in _CONSUMED_PHRASES) + r")\b")
+
+# Marcas de los fragmentos ya interpretados al revisar lo que queda de la pregunta
+_KEYWORD_MARK = "\x00keyword"
+
+# Operadores de filtro en texto y su equivalente
+FILTER_OPERATORS = [
+    (">=", ">="), ("<=", "<="), ("!=", "!="), ("==", "="), ("=", "="), (">", ">"), ("<", "<"),
+    ("mayor o igual a", ">="), ("menor o igual a", "<="), ("mayor que", ">"), ("menor que", "<"),
+    ("greater than", ">"), ("less than", "<"), ("distinto de", "!="), ("igual a", "="),
+    ("is not", "!="), ("equals", "="), ("es", "="), ("is", "="),
+]
+
+AGGREGATION_LABELS = {
+    "sum": "El total",
+    "mean": "El promedio",
+    "max": "El valor máximo",
+    "min": "El valor mínimo",
+    "nunique": "El número de valores distintos",
+    "count": "El número de valores",
+}
+
+# Máximo de grupos incluidos en una respuesta agrupada
+MAX_GROUPS = 20
+
+
+def _contains_keyword(text: str, keywords: List[str]) -> bool:
+    return any(re.search(rf"\b{re.escape(keyword)}\b", text) for keyword in keywords)
+
+
+def _decategorize(series: pd.Series) -> pd.Series:
+    """Convierte una columna categórica en una columna de sus valores (pd.to_numeric no admite categorías)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    return series
+
+
+def format_value(value: Any) -> str:
+    """Da formato legible a un resultado (enteros con separador de miles, decimales con 2 cifras)"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "sin datos"
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat() if value == value.normalize() else value.isoformat()
+    if isinstance(value, (int, np.integer)):
+        return f"{int(value):,}"
+    if isinstance(value, (float, np.floating)):
+        if float(value).is_integer():
+            return f"{int(value):,}"
+        return f"{float(value):,.2f}"
+    return str(value)
+
+
+class QueryService:
+    """
+    Responde de forma exacta y local (sin llamar al modelo) las preguntas de
+    agregación simples: totales, promedios, máximos, mínimos, conteos, valores
+    vacíos, agrupaciones ("por <columna>") y filtros ("donde <columna> = valor")
+    """
+
+    @staticmethod
+    def try_answer(df: pd.DataFrame, summary: Dict[str, Any], question: str) -> Optional[str]:
+        """
+        Intenta responder la pregunta calculándola directamente sobre el DataFrame
+
+        Args:
+            df: DataFrame del archivo
+            summary: Resumen del archivo
+            question: Pregunta del usuario
+
+        Returns:
+            Optional[str]: Respuesta, o None si la pregunta no se reconoce y debe ir al modelo
+        """
+        try:
+            with span("local_query"):
+                return QueryService._answer(df, summary, question)
+        except Exception as e:
+            # Ante cualquier duda se delega en el modelo
+            logger.info("Consulta local no resuelta: %s", e)
+            return None
+
+    @staticmethod
+    def _answer(df: pd.DataFrame, summary: Dict[str, Any], question: str) -> Optional[str]:
+        columns = summary["column_names"]
+        text = normalize_text(question)
+
+        # Si el DataFrame es solo una muestra, únicamente valen las respuestas del resumen
+        sampled = bool(summary.get("sampled"))
+
+        filters, text = QueryService._extract_filters(text, columns, question)
+        group_by, text = QueryService._extract_group_by(text, columns)
+        if sampled and (filters or group_by):
+            return None
+
+        data = df
+        for column, operator, value in filters:
+            data = data[QueryService._filter_mask(data[column], operator, value)]
+        filter_text = QueryService._describe_filters(filters)
+
+        mentioned = QueryService._find_columns(text, [col for col in columns if col != group_by])
+        aggregation = QueryService._detect_aggregation(text)
+
+        # Valores vacíos de una columna
+        if _contains_keyword(text, MISSING_KEYWORDS) and mentioned and not group_by:
+            column = mentioned[0]
+            if not QueryService._fully_parsed(text, columns, [column]):
+                return None
+            if sampled:
+                missing = summary["missing_values"][column]
+                total = summary["rows"]
+            else:
+                missing = int(data[column].isna().sum())
+                total = len(data)
+            return f"La columna {column} tiene {format_value(missing)} valores vacíos de {format_value(total)} filas{filter_text}."
+
+        # Número de filas
+        if not mentioned and _contains_keyword(text, ROW_KEYWORDS) and aggregation in ("count", "sum", None):
+            if aggregation is None and not _contains_keyword(text, ["numero", "cantidad", "number"]):
+                return None
+            if not QueryService._fully_parsed(text, columns, []):
+                return None
+            if group_by:
+                counts = data.groupby(group_by, dropna=False, observed=True).size().sort_values(ascending=False)
+                return QueryService._format_groups("Número de filas", None, group_by, counts)
+            rows = summary["rows"] if sampled else len(data)
+            return f"Hay {format_value(rows)} filas{filter_text}."
+
+        if aggregation is None or not mentioned:
+            return None
+
+        if sampled:
+            if not QueryService._fully_parsed(text, columns, mentioned[:1]):
+                return None
+            return QueryService._answer_from_summary(summary, aggregation, mentioned[0])
+
+        # La columna a agregar es la primera mencionada que admite la agregación;
+        # otra columna mencionada sirve de etiqueta ("¿qué producto tiene más ventas?")
+        target, series = None, None
+        for column in mentioned:
+            series = QueryService._prepare_series(data[column], aggregation)
+            if series is not None:
+                target = column
+                break
+        if target is None:
+            return None
+        # Otra columna solo se admite como etiqueta tras un interrogativo ("¿qué producto...?")
+        others = [column for column in mentioned if column != target]
+        label_column = None
+        if len(others) == 1 and re.search(
+            rf"\b(?:{'|'.join(LABEL_WORDS)})\s+{re.escape(normalize_text(others[0]))}(?!\w)", text
+        ):
+            label_column = others[0]
+        accepted = [target] + ([label_column] if label_column else [])
+        if not QueryService._fully_parsed(text, columns, accepted):
+            return None
+
+        if group_by:
+            groups = series.groupby(data[group_by], dropna=False, observed=True)
+            # min_count=1: un grupo sin valores no suma 0
+            grouped = groups.sum(min_count=1) if aggregation == "sum" else groups.agg(aggregation)
+            grouped = grouped.sort_values(ascending=aggregation == "min")
+            return QueryService._format_groups(AGGREGATION_LABELS[aggregation], target, group_by, grouped)
+
+        result = series.agg(aggregation)
+        answer = f"{AGGREGATION_LABELS[aggregation]} de {target}{filter_text} es {format_value(result)}"
+
+        # "¿Qué producto tiene la mayor venta?": indicar la fila que alcanza el extremo
+        if aggregation in ("max", "min") and label_column and series.notna().any():
+            position = series.idxmax() if aggregation == "max" else series.idxmin()
+            answer += f" ({label_column}: {format_value(data.loc[position, label_column])})"
+        return answer + "."
+
+    @staticmethod
+    def _answer_from_summary(summary: Dict[str, Any], aggregation: str, column: str) -> Optional[str]:
+        """Responde con las estadísticas exactas del resumen cuando solo hay una muestra en memoria"""
+        stats = summary.get("numeric_stats", {})
+        if column not in summary.get("numeric_columns", []):
+            return None
+
+        count = summary["rows"] - summary["missing_values"][column]
+        if aggregation in ("mean", "min", "max"):
+            value = stats[aggregation][column]
+        elif aggregation == "sum":
+            value = stats["mean"][column] * count if count else 0
+        elif aggregation == "count":
+            value = count
+        else:
+            return None
+        return f"{AGGREGATION_LABELS[aggregation]} de {column} es {format_value(value)}."
+
+    @staticmethod
+    def _prepare_series(series: pd.Series, aggregation: str) -> Optional[pd.Series]:
+        """Convierte la columna al tipo adecuado para la agregación, o None si no aplica"""
+        if aggregation in ("count", "nunique"):
+            return series
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            return series
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series if aggregation in ("max", "min") else None
+
+        # Columnas de texto con fechas o números (las categorías se convierten a sus valores)
+        series = _decategorize(series)
+        non_null = series.dropna()
+        if non_null.empty:
+            return None
+        numbers = pd.to_numeric(series, errors="coerce")
+        if numbers.notna().sum() >= 0.9 * len(non_null):
+            return numbers
+        if aggregation in ("max", "min"):
+            with warnings.catch_warnings():
+                # Sin formato fijo pandas avisa de que interpreta cada valor por separado
+                warnings.simplefilter("ignore", UserWarning)
+                dates = pd.to_datetime(series, errors="coerce")
+            if dates.notna().sum() >= 0.9 * len(non_null):
+                return dates
+        return None
+
+    @staticmethod
+    def _find_columns(text: str, columns: List[str]) -> List[str]:
+        """Columnas mencionadas en la pregunta, en orden de aparición (las más largas primero si se solapan)"""
+        found = QueryService._column_spans(text, columns)
+        # Solo la primera mención de cada columna
+        seen = set()
+        return [column for _, _, column in found if not (column in seen or seen.add(column))]
+
+    @staticmethod
+    def _column_spans(text: str, columns: List[str]) -> List[Tuple[int, int, str]]:
+        """Todas las menciones de columnas (inicio, fin, columna) en orden, sin solaparse"""
+        found: List[Tuple[int, int, str]] = []
+        taken = [False] * (len(text) + 1)
+        for column in sorted(columns, key=lambda col: len(str(col)), reverse=True):
+            name = normalize_text(column)
+            if not name:
+                continue
+            for match in re.finditer(rf"(?<!\w){re.escape(name)}(?!\w)", text):
+                if any(taken[match.start():match.end()]):
+                    continue
+                for i in range(match.start(), match.end()):
+                    taken[i] = True
+                found.append((match.start(), match.end(), column))
+        return sorted(found)
+
+    @staticmethod
+    def _fully_parsed(text: str, columns: List[str], accepted: List[str]) -> bool:
+        """
+        Comprueba que la pregunta (sin filtros ni agrupación) no contiene nada que
+        la respuesta vaya a ignorar: valores, números, otras columnas, condiciones
+        ("excepto", "solo", "en 2023") o cualquier palabra no reconocida
+
+        Args:
+            text: Pregunta normalizada sin los filtros ni la agrupación interpretados
+            columns: Columnas del archivo
+            accepted: Columnas que la respuesta usa
+
+        Returns:
+            bool: True si toda la pregunta está interpretada
+        """
+        tokens: List[Any] = []
+        position = 0
+        for start, end, column in QueryService._column_spans(text, columns):
+            tokens.extend(_CONSUMED_PATTERN.sub(f" {_KEYWORD_MARK} ", text[position:start]).split())
+            tokens.append((column,))
+            position = end
+        tokens.extend(_CONSUMED_PATTERN.sub(f" {_KEYWORD_MARK} ", text[position:]).split())
+
+        for index, token in enumerate(tokens):
+            if isinstance(token, tuple):
+                if token[0] not in accepted:
+                    return False
+            elif token == _KEYWORD_MARK or token in FILLER_WORDS:
+                continue
+            elif token in CONNECTOR_WORDS:
+                # "total de Ventas" sí; "en 2023" o "del Producto A" no
+                following = [t for t in tokens[index + 1:] if t not in ARTICLE_WORDS]
+                if not following or following[0] == _KEYWORD_MARK:
+                    continue
+                if not (isinstance(following[0], tuple) and following[0][0] in accepted):
+                    return False
+            else:
+                return False
+        return True
+
+    @staticmethod
+    def _detect_aggregation(text: str) -> Optional[str]:
+        """Agregación pedida en la pregunta, o None si no se reconoce ninguna"""
+        matches = [
+            aggregation
+            for aggregation, keywords in AGGREGATION_KEYWORDS.items()
+            if _contains_keyword(text, keywords)
+        ]
+        if len(matches) == 1:
+            return matches[0]
+        # "¿cuántos productos distintos...?" -> valores distintos
+        if set(matches) == {"count", "nunique"}:
+            return "nunique"
+        # "¿cuál es el total máximo...?" y similares son ambiguos
+        return None
+
+    @staticmethod
+    def _extract_group_by(text: str, columns: List[str]) -> Tuple[Optional[str], str]:
+        """Busca "por <columna>" y devuelve la columna y la pregunta sin esa parte"""
+        for keyword in GROUP_BY_KEYWORDS:
+            for match in re.finditer(rf"\b{re.escape(keyword)}\s+(.+)$", text):
+                candidates = QueryService._find_columns(match.group(1), columns)
+                if candidates and match.group(1).startswith(normalize_text(candidates[0])):
+                    column = candidates[0]
+                    rest = match.group(1)[len(normalize_text(column)):]
+                    return column, (text[:match.start()] + " " + rest).strip()
+        return None, text
+
+    @staticmethod
+    def _extract_filters(
+        text: str,
+        columns: List[str],
+        question: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, str, str]], str]:
+        """
+        Busca filtros "donde <columna> <operador> <valor>" y los retira de la pregunta.
+        Un filtro que no se entiende entero (otra condición, otra columna en el valor)
+        se deja en la pregunta para que no se responda sin él.
+
+        Args:
+            text: Pregunta normalizada
+            columns: Columnas del archivo
+            question: Pregunta original, de la que se toma el valor tal como se escribió
+
+        Returns:
+            Tuple[List[Tuple[str, str, str]], str]: Filtros (columna, operador, valor) y la pregunta sin ellos
+        """
+        filters = []
+        for keyword in FILTER_KEYWORDS:
+            match = re.search(rf"\b{re.escape(keyword)}\s+(.+)$", text)
+            if not match:
+                continue
+            clause = match.group(1)
+            candidates = QueryService._find_columns(clause, columns)
+            if not candidates or not clause.startswith(normalize_text(candidates[0])):
+                continue
+            column = candidates[0]
+            remainder = clause[len(normalize_text(column)):].strip()
+            for word, operator in FILTER_OPERATORS:
+                if remainder.startswith(word + " ") or (not word.isalpha() and remainder.startswith(word)):
+                    value = remainder[len(word):].strip()
+                    # El valor termina donde empieza una agrupación, que sigue en la pregunta
+                    grouping = re.search(r"\b(?:por|by|per|agrupado)\b", value)
+                    rest = value[grouping.start():] if grouping else ""
+                    value = (value[:grouping.start()] if grouping else value).strip().rstrip(".")
+                    if (
+                        value
+                        and not _contains_keyword(value, CLAUSE_WORDS + FILTER_KEYWORDS)
+                        and not QueryService._find_columns(value, columns)
+                    ):
+                        if question is not None:
+                            value = QueryService._original_text(question, value)
+                        filters.append((column, operator, value))
+                        text = (text[:match.start()] + " " + rest).strip()
+                    break
+            if filters:
+                break
+        return filters, text
+
+    @staticmethod
+    def _original_text(question: str, normalized: str) -> str:
+        """Fragmento de la pregunta original que corresponde a un texto normalizado (o el propio texto)"""
+        words = re.findall(r"[^\s<>=!]+", question)
+        for start in range(len(words)):
+            for end in range(start + 1, len(words) + 1):
+                candidate = normalize_text(" ".join(words[start:end]))
+                if candidate == normalized:
+                    return " ".join(words[start:end]).strip("¿?¡!.,;:\"'()")
+                if len(candidate) >= len(normalized):
+                    break
+        return normalized
+
+    @staticmethod
+    def _filter_mask(series: pd.Series, operator: str, value: str) -> pd.Series:
+        """Máscara vectorizada de un filtro sobre una columna"""
+        number = pd.to_numeric(pd.Series([value.replace(",", ".")]), errors="coerce").iloc[0]
+        if operator in (">", "<", ">=", "<=") or (
+            pd.api.types.is_numeric_dtype(series) and not np.isnan(number)
+        ):
+            if np.isnan(number):
+                raise ValueError(f"Valor no numérico para el filtro: {value}")
+            numbers = pd.to_numeric(_decategorize(series), errors="coerce")
+            comparisons = {
+                ">": numbers > number, "<": numbers < number,
+                ">=": numbers >= number, "<=": numbers <= number,
+                "=": numbers == number, "!=": numbers != number,
+            }
+            return comparisons[operator]
+
+        # Comparación de texto sin distinguir mayúsculas ni tildes, calculada sobre los valores únicos
+        uniques = pd.Series(series.dropna().unique())
+        matching = uniques[uniques.map(normalize_text) == normalize_text(value)]
+        mask = series.isin(matching)
+        return ~mask if operator == "!=" else mask
+
+    @staticmethod
+    def _describe_filters(filters: List[Tuple[str, str, str]]) -> str:
+        if not filters:
+            return ""
+        return " (" + ", ".join(f"{column} {operator} {value}" for column, operator, value in filters) + ")"
+
+    @staticmethod
+    def _format_groups(label: str, target: Optional[str], group_by: str, values: pd.Series) -> str:
+        """Da formato a un resultado agrupado, limitado a MAX_GROUPS grupos"""
+        title = f"{label} de {target} por {group_by}" if target else f"{label} por {group_by}"
+        lines = [f"{title}:"]
+        for key, value in values.head(MAX_GROUPS).items():
+            lines.append(f"- {format_value(key)}: {format_value(value)}")
+        if len(values) > MAX_GROUPS:
+            lines.append(f"(y {len(values) - MAX_GROUPS} grupos más)")
+        return "\n".join(lines)
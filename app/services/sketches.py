@@ -0,0 +1,326 @@
+import base64
+import math
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.util import hash_array
+
+from app.services.conversion import text_values
+
+# Precisión del HyperLogLog: 2^12 registros (error típico ~1,6 %)
+HLL_PRECISION = 12
+# Compresión del resumen de cuantiles: como mucho unos 100 centroides por columna
+DIGEST_COMPRESSION = 100
+# Valores más frecuentes que se conservan por columna (se muestran menos)
+TOP_K_CAPACITY = 64
+TOP_K_SHOWN = 10
+# Cuantiles que se incluyen en el perfil
+QUANTILES = {"p05": 0.05, "p25": 0.25, "median": 0.5, "p75": 0.75, "p95": 0.95}
+# Versión del formato guardado: los sketches de otra versión no se combinan
+SKETCHES_FORMAT = 2
+
+
+class HyperLogLog:
+    """
+    Estimación del número de valores distintos con memoria fija. Dos sketches
+    del mismo tipo se combinan con el máximo de sus registros.
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray) -> None:
+        """
+        Incorpora valores ya convertidos a hashes de 64 bits
+
+        Args:
+            hashes: Hashes uint64 de los valores (repetidos o no)
+        """
+        if not len(hashes):
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        # Posición del primer bit a 1 en los 32 bits siguientes (33 si son todos 0)
+        rest = ((hashes << np.uint64(p)) >> np.uint64(32)).astype(np.float64)
+        _, bit_length = np.frexp(rest)
+        np.maximum.at(self.registers, index, (33 - bit_length).astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        """Número estimado de valores distintos"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Pocos valores: conteo lineal de registros vacíos
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(zlib.compress(self.registers.tobytes())).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        registers = np.frombuffer(zlib.decompress(base64.b64decode(data["registers"])), dtype=np.uint8).copy()
+        return cls(data["precision"], registers)
+
+
+class QuantileDigest:
+    """
+    Resumen de la distribución de una columna numérica al estilo t-digest:
+    centroides (media y peso) más pequeños en los extremos, donde los cuantiles
+    necesitan más precisión. Se combina concatenando centroides y comprimiendo.
+    """
+
+    def __init__(self, compression: int = DIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        Incorpora valores numéricos sin nulos
+
+        Args:
+            values: Valores float64
+        """
+        if not len(values):
+            return
+        values = np.sort(values)
+        self.min = min(self.min, float(values[0]))
+        self.max = max(self.max, float(values[-1]))
+        # Primero se resumen los valores del bloque (ya ordenados) y después se
+        # combinan esos centroides con los anteriores
+        means, weights = self._centroids(values, np.ones(len(values)))
+        self._compress(np.concatenate([self.means, means]), np.concatenate([self.weights, weights]))
+
+    def merge(self, other: "QuantileDigest") -> None:
+        if not len(other.means):
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="stable")
+        self.means, self.weights = self._centroids(means[order], weights[order])
+
+    def _centroids(self, means: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Agrupa centroides ordenados en como mucho compression + 1 centroides"""
+        q = (np.cumsum(weights) - weights / 2) / weights.sum()
+        # Escala arcoseno: intervalos iguales en k son más estrechos cerca de 0 y 1
+        k = np.floor(self.compression * (np.arcsin(2 * q - 1) / np.pi + 0.5)).astype(np.intp)
+        k = np.minimum(k, self.compression)
+        sizes = np.bincount(k, weights=weights)
+        sums = np.bincount(k, weights=weights * means)
+        kept = sizes > 0
+        return sums[kept] / sizes[kept], sizes[kept]
+
+    def quantile(self, q: float) -> float:
+        """Valor aproximado del cuantil q (entre 0 y 1)"""
+        if not len(self.means):
+            return math.nan
+        positions = np.cumsum(self.weights) - self.weights / 2
+        xs = np.concatenate([[0.0], positions, [self.weights.sum()]])
+        ys = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * xs[-1], xs, ys))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.min if len(self.means) else None,
+            "max": self.max if len(self.means) else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileDigest":
+        digest = cls()
+        digest.means = np.asarray(data["means"], dtype=np.float64)
+        digest.weights = np.asarray(data["weights"], dtype=np.float64)
+        if len(digest.means):
+            digest.min, digest.max = data["min"], data["max"]
+        return digest
+
+
+class HeavyHitters:
+    """
+    Valores más frecuentes de una columna con memoria acotada (resumen de
+    Misra-Gries combinable): como mucho TOP_K_CAPACITY contadores. Al superarse
+    la capacidad se resta a todos el valor del contador TOP_K_CAPACITY + 1 y se
+    descartan los que llegan a 0. Lo restado en total (error) acota cada
+    recuento: count <= apariciones reales <= count + error, y un valor descartado
+    aparece como mucho error veces. El error nunca supera filas / (capacidad + 1).
+    """
+
+    def __init__(self, capacity: int = TOP_K_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.error = 0
+
+    @property
+    def truncated(self) -> bool:
+        """Si se descontó algún recuento (mientras no, los recuentos son exactos)"""
+        return self.error > 0
+
+    def update(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        """
+        Incorpora los recuentos de un bloque
+
+        Args:
+            keys: Valores distintos del bloque (texto)
+            counts: Apariciones de cada valor en el bloque
+        """
+        # El bloque se reduce primero a la capacidad (un resumen más que se combina)
+        keys, counts, error = self._reduce(keys, np.asarray(counts, dtype=np.int64), self.capacity)
+        self._combine(dict(zip(keys.tolist(), counts.tolist())), error)
+
+    def merge(self, other: "HeavyHitters") -> None:
+        self._combine(other.counts, other.error)
+
+    def _combine(self, counts: Dict[str, int], error: int) -> None:
+        merged = dict(self.counts)
+        for key, count in counts.items():
+            merged[key] = merged.get(key, 0) + int(count)
+        keys = np.array(list(merged), dtype=object)
+        values = np.fromiter(merged.values(), dtype=np.int64, count=len(merged))
+        keys, values, decrement = self._reduce(keys, values, self.capacity)
+        self.counts = dict(zip(keys.tolist(), values.tolist()))
+        self.error += error + decrement
+
+    @staticmethod
+    def _reduce(keys: np.ndarray, counts: np.ndarray, capacity: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Deja como mucho capacity contadores restando a todos el contador capacity + 1"""
+        if len(counts) <= capacity:
+            return keys, counts, 0
+        position = len(counts) - capacity - 1
+        decrement = int(np.partition(counts, position)[position])
+        kept = counts > decrement
+        return keys[kept], counts[kept] - decrement, decrement
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Valores más frecuentes con su número de apariciones: count es una cota
+        inferior y count + error una superior (error 0 si son exactos)
+        """
+        items = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{"value": key, "count": count, "error": self.error} for key, count in items]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"counts": self.counts, "error": self.error}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HeavyHitters":
+        sketch = cls()
+        sketch.counts = dict(data["counts"])
+        sketch.error = data["error"]
+        return sketch
+
+
+class ColumnSketch:
+    """
+    Sketches de una columna calculados en una pasada por bloque: valores
+    distintos (HyperLogLog), cuantiles en las numéricas y valores más
+    frecuentes en el resto. Se combinan y se guardan en JSON aparte del resumen.
+    """
+
+    def __init__(self):
+        self.distinct = HyperLogLog()
+        self.digest: Optional[QuantileDigest] = None
+        self.heavy_hitters: Optional[HeavyHitters] = None
+
+    def update(self, series: pd.Series, numeric: bool) -> None:
+        """
+        Incorpora un bloque de valores de la columna
+
+        Args:
+            series: Valores de la columna en el bloque
+            numeric: Si la columna cuenta como numérica en el resumen
+        """
+        if numeric:
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            self.distinct.update(hash_array(values))
+            if self.digest is None:
+                self.digest = QuantileDigest()
+            self.digest.update(values)
+            return
+
+        # Recuento por códigos: solo se convierten a texto y se calculan los
+        # hashes de los valores distintos del bloque
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes, uniques = series.cat.codes.to_numpy(), pd.Series(series.dtype.categories)
+        else:
+            codes, uniques = pd.factorize(series)
+            uniques = pd.Series(uniques)
+        codes = codes[codes >= 0]
+        counts = np.bincount(codes, minlength=len(uniques))
+        present = np.flatnonzero(counts)
+        if not len(present):
+            return
+        keys = text_values(uniques.iloc[present])
+        self.distinct.update(hash_array(keys, categorize=False))
+        if self.heavy_hitters is None:
+            self.heavy_hitters = HeavyHitters()
+        self.heavy_hitters.update(keys, counts[present])
+
+    def merge(self, other: "ColumnSketch") -> None:
+        self.distinct.merge(other.distinct)
+        for name in ("digest", "heavy_hitters"):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            if theirs is None:
+                continue
+            if mine is None:
+                setattr(self, name, theirs)
+            else:
+                mine.merge(theirs)
+
+    def profile(self, non_null: int) -> Dict[str, Any]:
+        """
+        Perfil aproximado de la columna
+
+        Args:
+            non_null: Valores no nulos de la columna (límite del número de distintos)
+
+        Returns:
+            Dict[str, Any]: distinct, distinct_exact y, según el tipo, quantiles o top
+        """
+        hitters = self.heavy_hitters
+        if hitters is not None and not hitters.truncated:
+            distinct, exact = len(hitters.counts), True
+        else:
+            distinct, exact = min(int(round(self.distinct.estimate())), non_null), False
+        profile: Dict[str, Any] = {"distinct": distinct, "distinct_exact": exact}
+        if self.digest is not None and len(self.digest.means):
+            profile["quantiles"] = {name: self.digest.quantile(q) for name, q in QUANTILES.items()}
+        if hitters is not None:
+            profile["top"] = hitters.top(TOP_K_SHOWN)
+        return profile
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "distinct": self.distinct.to_dict(),
+            "digest": self.digest.to_dict() if self.digest is not None else None,
+            "heavy_hitters": self.heavy_hitters.to_dict() if self.heavy_hitters is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnSketch":
+        sketch = cls()
+        sketch.distinct = HyperLogLog.from_dict(data["distinct"])
+        if data.get("digest") is not None:
+            sketch.digest = QuantileDigest.from_dict(data["digest"])
+        if data.get("heavy_hitters") is not None:
+            sketch.heavy_hitters = HeavyHitters.from_dict(data["heavy_hitters"])
+        return sketch
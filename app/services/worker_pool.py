@@ -0,0 +1,129 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.services.metrics import WORKER_JOB_SECONDS
+
+
+class WorkerPoolSaturatedError(RuntimeError):
+    """El pool de trabajo tiene todos sus workers ocupados y la cola llena"""
+
+
+class WorkerPool:
+    """
+    Pool de workers (hilos o procesos) para ejecutar el trabajo intensivo en CPU
+    (análisis de archivos, resúmenes, vistas previas) fuera del event loop
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int, timeout: float):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de pool no soportado: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+        # Trabajos aceptados que aún no han terminado (en ejecución + en cola)
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self) -> Executor:
+        # Creación diferida: evita lanzar procesos al importar el módulo
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="excel-worker"
+                    )
+            return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Ejecuta una función en el pool y espera su resultado sin bloquear el event loop
+
+        Args:
+            fn: Función a ejecutar (debe ser serializable si el pool es de procesos)
+            *args: Argumentos posicionales de la función
+            timeout: Tiempo máximo de espera en segundos (por defecto WORKER_JOB_TIMEOUT)
+
+        Returns:
+            Any: Resultado de la función
+
+        Raises:
+            WorkerPoolSaturatedError: Si ya hay demasiados trabajos pendientes
+            asyncio.TimeoutError: Si el trabajo no termina a tiempo
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise WorkerPoolSaturatedError(
+                    "El servidor está procesando demasiados archivos, inténtelo de nuevo en unos segundos"
+                )
+            self._pending += 1
+
+        call = partial(fn, *args)
+        if self.kind == "thread":
+            # Los hilos heredan el contexto de la petición (tramos de tiempo de la etapa)
+            call = partial(contextvars.copy_context().run, call)
+        start = time.perf_counter()
+        try:
+            future = self._get_executor().submit(call)
+        except BaseException:
+            self._release(None)
+            raise
+        # El hueco se libera cuando el trabajo termina realmente, no cuando deja de esperarse
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        finally:
+            WORKER_JOB_SECONDS.observe(time.perf_counter() - start, job=getattr(fn, "__name__", "job"))
+
+    def _release(self, _future: Any) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve la ocupación y los contadores del pool"""
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    def shutdown(self) -> None:
+        """Detiene el pool sin esperar a los trabajos en cola"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Pool compartido por los endpoints
+worker_pool = WorkerPool(
+    kind=settings.WORKER_POOL_KIND,
+    max_workers=settings.WORKER_POOL_SIZE,
+    max_queue=settings.WORKER_POOL_QUEUE,
+    timeout=settings.WORKER_JOB_TIMEOUT,
+)
@@ -0,0 +1,74 @@
+"""
+Compara dos resultados de benchmarks.run (p. ej. de dos commits).
+
+Uso:
+    python -m benchmarks.compare base.json head.json [--metric p95_ms] [--threshold 0.10]
+
+Sale con código 1 si algún escenario empeora más que el umbral indicado.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+# Métricas en las que un valor mayor es peor
+METRICS = ("p50_ms", "p95_ms", "peak_rss_mb")
+
+
+def load(path: str) -> Tuple[Dict[str, Any], Dict[Tuple[str, str], Dict[str, Any]]]:
+    """Carga un archivo de resultados indexado por (archivo, escenario)"""
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return report["meta"], {(r["name"], r["scenario"]): r for r in report["results"]}
+
+
+def compare(
+    base: Dict[Tuple[str, str], Dict[str, Any]],
+    head: Dict[Tuple[str, str], Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Calcula la variación relativa de cada métrica en los escenarios comunes
+
+    Returns:
+        List[Dict[str, Any]]: Una fila por escenario con los valores y variaciones
+    """
+    rows = []
+    for key in sorted(base.keys() & head.keys()):
+        row = {"name": key[0], "scenario": key[1]}
+        for metric in METRICS:
+            old, new = base[key][metric], head[key][metric]
+            row[metric] = (old, new, (new - old) / old if old else 0.0)
+        rows.append(row)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmark")
+    parser.add_argument("base", help="Resultados de referencia")
+    parser.add_argument("head", help="Resultados a comparar")
+    parser.add_argument("--metric", default="p95_ms", choices=METRICS, help="Métrica para detectar regresiones")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento relativo tolerado")
+    args = parser.parse_args(argv)
+
+    base_meta, base = load(args.base)
+    head_meta, head = load(args.head)
+    print(f"base: {base_meta.get('commit')}  head: {head_meta.get('commit')}")
+
+    regressions = 0
+    for row in compare(base, head):
+        old, new, change = row[args.metric]
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESIÓN"
+            regressions += 1
+        print(f"{row['name']:<40} {row['scenario']:<20} {old:10.2f} -> {new:10.2f} ({change:+7.1%}){flag}")
+
+    missing = sorted(base.keys() ^ head.keys())
+    if missing:
+        print(f"{len(missing)} escenarios solo aparecen en uno de los resultados")
+    print(f"{regressions} regresiones en {args.metric} por encima de {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Formas de tabla: número de columnas de cada tipo (entero, decimal, fecha, categoría, texto)
+SHAPES: Dict[str, Dict[str, int]] = {
+    "narrow": {"int": 1, "float": 2, "date": 1, "category": 1, "text": 1},
+    "wide": {"int": 10, "float": 30, "date": 5, "category": 10, "text": 5},
+}
+
+# Variantes de CSV: (codificación, delimitador)
+CSV_VARIANTS: Dict[str, Dict[str, str]] = {
+    "utf8_comma": {"encoding": "utf-8", "sep": ","},
+    "cp1252_semicolon": {"encoding": "cp1252", "sep": ";"},
+    "utf8sig_tab": {"encoding": "utf-8-sig", "sep": "\t"},
+    "utf16_pipe": {"encoding": "utf-16", "sep": "|"},
+}
+
+# Límite de filas de una hoja de Excel (sin contar el encabezado)
+XLSX_MAX_ROWS = 1_048_575
+
+CATEGORIES = ["Laptop", "Teléfono", "Tablet", "Monitor", "Impresora", "Cámara", "Auriculares", "Ratón"]
+REGIONS = ["Norte", "Sur", "Este", "Oeste", "Centro"]
+WORDS = ["pedido", "envío", "devolución", "garantía", "factura", "cliente", "urgente", "revisión"]
+
+
+def generate_frame(rows: int, shape: str = "narrow", seed: int = 0, start: int = 0) -> pd.DataFrame:
+    """
+    Genera un bloque de filas sintéticas con tipos mixtos
+
+    Args:
+        rows: Número de filas
+        shape: Forma de la tabla (clave de SHAPES)
+        seed: Semilla del generador aleatorio
+        start: Índice de la primera fila (para generar archivos por bloques)
+
+    Returns:
+        pd.DataFrame: Bloque de datos
+    """
+    counts = SHAPES[shape]
+    rng = np.random.default_rng(seed + start)
+    columns = {}
+
+    for i in range(counts["int"]):
+        name = "Ventas" if i == 0 else f"Unidades {i}"
+        columns[name] = rng.integers(0, 10_000, size=rows)
+    for i in range(counts["float"]):
+        values = rng.normal(500, 150, size=rows).round(2)
+        # Un 2 % de valores faltantes para ejercitar el recuento de nulos
+        values[rng.random(rows) < 0.02] = np.nan
+        columns["Precio" if i == 0 else f"Importe {i}"] = values
+    for i in range(counts["date"]):
+        base = np.datetime64("2023-01-01") + np.timedelta64(i * 30, "D")
+        columns["Fecha" if i == 0 else f"Fecha {i}"] = base + rng.integers(0, 365, size=rows).astype("timedelta64[D]")
+    for i in range(counts["category"]):
+        pool = CATEGORIES if i % 2 == 0 else REGIONS
+        columns["Producto" if i == 0 else f"Categoría {i}"] = np.asarray(pool, dtype=object)[rng.integers(0, len(pool), size=rows)]
+    for i in range(counts["text"]):
+        words = np.asarray(WORDS, dtype=object)
+        first = words[rng.integers(0, len(WORDS), size=rows)]
+        second = words[rng.integers(0, len(WORDS), size=rows)]
+        ids = (np.arange(start, start + rows)).astype(str)
+        columns["Comentario" if i == 0 else f"Nota {i}"] = first + " " + second + " #" + ids
+
+    return pd.DataFrame(columns)
+
+
+def write_csv(
+    path: str,
+    rows: int,
+    shape: str = "narrow",
+    variant: str = "utf8_comma",
+    seed: int = 0,
+    chunk_rows: int = 100_000
+) -> str:
+    """
+    Escribe un CSV sintético por bloques, sin tener la tabla completa en memoria
+    (permite generar archivos de decenas de millones de filas)
+
+    Args:
+        path: Ruta del archivo a crear
+        rows: Número de filas de datos
+        shape: Forma de la tabla (clave de SHAPES)
+        variant: Codificación y delimitador (clave de CSV_VARIANTS)
+        seed: Semilla del generador aleatorio
+        chunk_rows: Filas por bloque de escritura
+
+    Returns:
+        str: Ruta del archivo creado
+    """
+    options = CSV_VARIANTS[variant]
+    # utf-16 y utf-8-sig solo llevan BOM al principio: el resto de bloques se
+    # codifican sin él y se añaden en binario
+    encoding = {"utf-16": "utf-16-le", "utf-8-sig": "utf-8"}.get(options["encoding"], options["encoding"])
+    bom = {"utf-16": "\ufeff", "utf-8-sig": "\ufeff"}.get(options["encoding"], "")
+
+    with open(path, "wb") as f:
+        written = 0
+        while written < rows:
+            size = min(chunk_rows, rows - written)
+            chunk = generate_frame(size, shape, seed, start=written)
+            text = chunk.to_csv(sep=options["sep"], index=False, header=written == 0, date_format="%Y-%m-%d")
+            if written == 0:
+                text = bom + text
+            f.write(text.encode(encoding, errors="replace"))
+            written += size
+    return path
+
+
+def write_xlsx(
+    path: str,
+    rows: int,
+    shape: str = "narrow",
+    sheets: int = 1,
+    seed: int = 0,
+    chunk_rows: int = 50_000
+) -> str:
+    """
+    Escribe un libro XLSX sintético en modo de solo escritura (streaming)
+
+    Args:
+        path: Ruta del archivo a crear
+        rows: Número de filas de datos por hoja (como máximo XLSX_MAX_ROWS)
+        shape: Forma de la tabla (clave de SHAPES)
+        sheets: Número de hojas; la primera tiene `rows` filas y las demás la mitad
+        seed: Semilla del generador aleatorio
+        chunk_rows: Filas generadas por bloque
+
+    Returns:
+        str: Ruta del archivo creado
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for index in range(sheets):
+        worksheet = workbook.create_sheet(title=f"Hoja {index + 1}")
+        sheet_rows = min(rows if index == 0 else max(rows // 2, 1), XLSX_MAX_ROWS)
+        written = 0
+        while written < sheet_rows:
+            size = min(chunk_rows, sheet_rows - written)
+            chunk = generate_frame(size, shape, seed + index, start=written)
+            if written == 0:
+                worksheet.append(chunk.columns.tolist())
+            # NaN se escribe como celda vacía (las fechas quedan como Timestamp, que openpyxl admite)
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                worksheet.append(row)
+            written += size
+    workbook.save(path)
+    return path
+
+
+def build_corpus(
+    directory: str,
+    sizes: List[int],
+    shapes: List[str],
+    variants: Optional[List[str]] = None,
+    xlsx_sheets: int = 3,
+    xlsx_max_rows: int = 10_000
+) -> List[Dict[str, object]]:
+    """
+    Genera el conjunto de archivos del benchmark
+
+    Args:
+        directory: Directorio de salida
+        sizes: Números de filas
+        shapes: Formas de tabla
+        variants: Variantes de CSV (por defecto todas)
+        xlsx_sheets: Hojas de los libros XLSX
+        xlsx_max_rows: Tamaño máximo para el que se generan libros XLSX
+            (la escritura de XLSX es lenta y el formato admite pocas filas)
+
+    Returns:
+        List[Dict[str, object]]: Descripción de cada archivo (name, path, format, rows, shape, variant, bytes)
+    """
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for rows in sizes:
+        for shape in shapes:
+            for variant in variants or list(CSV_VARIANTS):
+                name = f"{shape}_{rows}_{variant}.csv"
+                path = write_csv(os.path.join(directory, name), rows, shape, variant)
+                corpus.append({"name": name, "path": path, "format": "csv", "rows": rows,
+                               "shape": shape, "variant": variant, "bytes": os.path.getsize(path)})
+            if rows <= xlsx_max_rows:
+                name = f"{shape}_{rows}_{xlsx_sheets}sheets.xlsx"
+                path = write_xlsx(os.path.join(directory, name), rows, shape, xlsx_sheets)
+                corpus.append({"name": name, "path": path, "format": "xlsx", "rows": rows,
+                               "shape": shape, "variant": f"{xlsx_sheets}sheets", "bytes": os.path.getsize(path)})
+    return corpus
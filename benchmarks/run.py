@@ -0,0 +1,415 @@
+"""
+Benchmark de los endpoints de subida, vista previa y chat.
+
+Genera archivos sintéticos (CSV con varias codificaciones y delimitadores, XLSX
+con varias hojas), ejecuta la aplicación FastAPI en el mismo proceso con la
+llamada al modelo sustituida por un stub y guarda en JSON la latencia (p50/p95),
+el pico de memoria (RSS) y el rendimiento de cada escenario.
+
+Uso:
+    python -m benchmarks.run --sizes 1000,100000 --shapes narrow,wide --output bench_results.json
+    python -m benchmarks.compare base.json head.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generators import CSV_VARIANTS, SHAPES, build_corpus
+
+# Pregunta que resuelve el motor de consultas local (sin modelo)
+LOCAL_QUESTION = "¿Cuál es la suma de Ventas?"
+# Pregunta que requiere el modelo; se numera para no acertar en el caché de respuestas
+AI_QUESTION = "Describe las tendencias principales de los datos ({})"
+# Preguntas al modelo por petición en el escenario de chat por lotes
+BATCH_SIZE = 20
+
+
+class RssSampler:
+    """Mide el pico de memoria residente del proceso mientras está activo"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def current_rss() -> int:
+        """Memoria residente actual en bytes (0 si no se puede leer)"""
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss está en KiB en Linux y en bytes en macOS
+            return peak if sys.platform == "darwin" else peak * 1024
+        except ImportError:
+            return 0
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RssSampler":
+        self.peak = self.current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current_rss())
+
+
+class _StubCompletions:
+    """Sustituto de client.chat.completions con latencia configurable"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        # Flujos devueltos (para comprobar que se cierran)
+        self.streams: List["_StubStream"] = []
+
+    async def create(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs: Any) -> Any:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        answer = f"Respuesta simulada ({prompt_chars} caracteres de contexto)."
+        # Aproximación de ~4 caracteres por token
+        usage = SimpleNamespace(prompt_tokens=prompt_chars // 4, completion_tokens=len(answer) // 4)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))], usage=usage)
+
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))], usage=None)
+            for word in answer.split(" ")
+        ]
+        chunks.append(SimpleNamespace(choices=[], usage=usage))
+        self.streams.append(_StubStream(chunks))
+        return self.streams[-1]
+
+
+class _StubStream:
+    """Sustituto del flujo de respuesta de OpenAI (iterable asíncrono que se cierra)"""
+
+    def __init__(self, chunks: List[Any]):
+        self._chunks = iter(chunks)
+        self.closed = False
+
+    def __aiter__(self) -> "_StubStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self.closed:
+            raise StopAsyncIteration
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def install_llm_stub(latency: float) -> _StubCompletions:
+    """
+    Sustituye el cliente de OpenAI por un stub que no sale a la red
+
+    Args:
+        latency: Segundos de espera simulada por llamada
+
+    Returns:
+        _StubCompletions: Stub instalado (cuenta las llamadas)
+    """
+    from app.services.ai_service import AIService
+
+    completions = _StubCompletions(latency)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    AIService.get_client = classmethod(lambda cls: client)
+    return completions
+
+
+def summarize(samples: List[float], elapsed: float, peak_rss: int, baseline_rss: int, nbytes: int) -> Dict[str, Any]:
+    """
+    Calcula las estadísticas de un escenario
+
+    Args:
+        samples: Latencias en segundos
+        elapsed: Tiempo total del escenario en segundos
+        peak_rss: Pico de memoria residente durante el escenario
+        baseline_rss: Memoria residente al empezar el escenario
+        nbytes: Tamaño del archivo procesado
+
+    Returns:
+        Dict[str, Any]: Latencias en ms, rendimiento y memoria en MiB
+    """
+    values = np.asarray(samples) * 1000
+    mean = float(values.mean())
+    return {
+        "iterations": len(samples),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "mean_ms": mean,
+        "min_ms": float(values.min()),
+        "max_ms": float(values.max()),
+        "throughput_ops": len(samples) / elapsed if elapsed else 0.0,
+        "throughput_mb_s": nbytes / 2 ** 20 / (mean / 1000) if mean else 0.0,
+        "peak_rss_mb": peak_rss / 2 ** 20,
+        "rss_growth_mb": (peak_rss - baseline_rss) / 2 ** 20,
+    }
+
+
+def measure(
+    fn: Callable[[int], Any],
+    iterations: int,
+    setup: Optional[Callable[[int], Any]] = None,
+    teardown: Optional[Callable[[int], Any]] = None
+) -> Dict[str, Any]:
+    """
+    Ejecuta un escenario varias veces midiendo solo la llamada principal
+
+    Args:
+        fn: Función a medir (recibe el número de iteración)
+        iterations: Número de repeticiones
+        setup: Preparación antes de cada iteración (no se mide)
+        teardown: Limpieza después de cada iteración (no se mide)
+
+    Returns:
+        Dict[str, Any]: Latencias en segundos, tiempo total y memoria
+    """
+    samples = []
+    baseline = RssSampler.current_rss()
+    with RssSampler() as sampler:
+        for i in range(iterations):
+            if setup is not None:
+                setup(i)
+            start = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - start)
+            if teardown is not None:
+                teardown(i)
+    return {"samples": samples, "elapsed": sum(samples), "peak_rss": sampler.peak, "baseline_rss": baseline}
+
+
+def check(response: Any) -> Any:
+    """Falla si la respuesta del endpoint no es correcta"""
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def run_file(client: Any, entry: Dict[str, Any], iterations: int) -> List[Dict[str, Any]]:
+    """
+    Ejecuta todos los escenarios sobre un archivo
+
+    Args:
+        client: TestClient de la aplicación
+        entry: Descripción del archivo (ver build_corpus)
+        iterations: Repeticiones por escenario
+
+    Returns:
+        List[Dict[str, Any]]: Un resultado por escenario
+    """
+    from app.services.ai_service import AIService
+    from app.services.cache_service import answer_cache, context_cache, dataset_cache
+    from app.services.excel_service import ExcelService
+
+    with open(entry["path"], "rb") as f:
+        content = f.read()
+    state: Dict[str, Any] = {}
+
+    def clear_caches(_i: int = 0) -> None:
+        dataset_cache.clear()
+        context_cache.clear()
+        answer_cache.clear()
+
+    def upload(_i: int) -> None:
+        response = check(client.post("/api/upload/", files={"file": (entry["name"], content, "application/octet-stream")}))
+        state["filename"] = response.json()["filename"]
+
+    def remove_upload(_i: int) -> None:
+        check(client.delete(f"/api/files/{state['filename']}"))
+
+    scenarios: Dict[str, Dict[str, Any]] = {}
+    # Subida completa (guardado, análisis, copia columnar y vista previa); el archivo
+    # se elimina después de cada iteración para que no actúe la deduplicación
+    scenarios["upload"] = measure(upload, iterations, setup=clear_caches, teardown=remove_upload)
+
+    upload(0)
+    filename = state["filename"]
+    file_path = ExcelService.get_file_path(filename)
+
+    scenarios["preview_cold"] = measure(
+        lambda i: check(client.get(f"/api/files/{filename}/preview")), iterations, setup=clear_caches
+    )
+    if entry["format"] == "xlsx":
+        scenarios["preview_sheet2_cold"] = measure(
+            lambda i: check(client.get(f"/api/files/{filename}/preview", params={"sheet": "Hoja 2"})),
+            iterations, setup=clear_caches
+        )
+
+    # Servicio: lectura con la copia columnar y análisis del archivo original
+    scenarios["read_file_cold"] = measure(lambda i: ExcelService.read_file(file_path), iterations, setup=clear_caches)
+    scenarios["parse_file"] = measure(lambda i: ExcelService._parse_file(file_path), iterations)
+
+    # Con el DataFrame en caché, la vista previa no vuelve a leer el archivo
+    df, summary = ExcelService.read_file(file_path)
+    scenarios["preview_warm"] = measure(
+        lambda i: check(client.get(f"/api/files/{filename}/preview")), iterations
+    )
+    scenarios["generate_context"] = measure(
+        lambda i: AIService.generate_dataframe_context(df, summary), iterations
+    )
+
+    scenarios["chat_local"] = measure(
+        lambda i: check(client.post("/api/chat/", json={"filename": filename, "question": LOCAL_QUESTION})),
+        iterations
+    )
+    scenarios["chat_ai"] = measure(
+        lambda i: check(client.post("/api/chat/", json={"filename": filename, "question": AI_QUESTION.format(i)})),
+        iterations
+    )
+    scenarios["chat_stream_ai"] = measure(
+        lambda i: check(client.post(
+            "/api/chat/stream", json={"filename": filename, "question": AI_QUESTION.format(f"s{i}")}
+        )),
+        iterations
+    )
+    scenarios["chat_batch_ai"] = measure(
+        lambda i: check(client.post("/api/chat/batch", json={
+            "filename": filename,
+            "questions": [LOCAL_QUESTION] + [AI_QUESTION.format(f"b{i}-{n}") for n in range(BATCH_SIZE)],
+        })),
+        iterations
+    )
+
+    # Exportación completa desde la copia columnar, por bloques (memoria acotada)
+    for export_format in ("ndjson", "csv", "arrow"):
+        scenarios[f"export_{export_format}"] = measure(
+            lambda i, f=export_format: check(client.get(f"/api/files/{filename}/export", params={"format": f})),
+            iterations, setup=clear_caches
+        )
+
+    remove_upload(0)
+    clear_caches()
+
+    results = []
+    for name, data in scenarios.items():
+        result = {key: entry[key] for key in ("name", "format", "rows", "shape", "variant", "bytes")}
+        result["scenario"] = name
+        result.update(summarize(data["samples"], data["elapsed"], data["peak_rss"], data["baseline_rss"], entry["bytes"]))
+        results.append(result)
+        print(f"  {name:<20} p50={result['p50_ms']:9.2f} ms  p95={result['p95_ms']:9.2f} ms  "
+              f"rss={result['peak_rss_mb']:8.1f} MiB")
+    return results
+
+
+def git_revision() -> Dict[str, Any]:
+    """Commit actual del repositorio (para comparar resultados entre commits)"""
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de subida, vista previa y chat")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Números de filas separados por comas (p. ej. 1000,1000000,10000000)")
+    parser.add_argument("--shapes", default="narrow,wide", help=f"Formas de tabla: {', '.join(SHAPES)}")
+    parser.add_argument("--variants", default=",".join(CSV_VARIANTS),
+                        help=f"Variantes de CSV: {', '.join(CSV_VARIANTS)}")
+    parser.add_argument("--xlsx-sheets", type=int, default=3, help="Hojas de los libros XLSX")
+    parser.add_argument("--xlsx-max-rows", type=int, default=10_000,
+                        help="Tamaño máximo para el que se generan libros XLSX")
+    parser.add_argument("--iterations", type=int, default=10, help="Repeticiones por escenario")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Latencia simulada del modelo en segundos")
+    parser.add_argument("--output", default="bench_results.json", help="Archivo JSON de resultados")
+    parser.add_argument("--workdir", default=None,
+                        help="Directorio de trabajo (por defecto uno temporal que se borra al terminar)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    output = os.path.abspath(args.output)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="excelia-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    started = datetime.now().isoformat(timespec="seconds")
+
+    # La aplicación guarda los archivos en "temp_files" relativo al directorio actual
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        corpus = build_corpus(
+            os.path.join(workdir, "corpus"),
+            sizes=[int(size) for size in args.sizes.split(",")],
+            shapes=args.shapes.split(","),
+            variants=args.variants.split(","),
+            xlsx_sheets=args.xlsx_sheets,
+            xlsx_max_rows=args.xlsx_max_rows,
+        )
+
+        from fastapi.testclient import TestClient
+        import main as app_main
+
+        stub = install_llm_stub(args.llm_latency)
+        results = []
+        with TestClient(app_main.app) as client:
+            for entry in corpus:
+                print(f"{entry['name']} ({entry['bytes'] / 2 ** 20:.1f} MiB)")
+                results.extend(run_file(client, entry, args.iterations))
+    finally:
+        os.chdir(previous_cwd)
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "started": started,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "llm_calls": stub.calls,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,30 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import time
+import asyncio
+import logging
 
 from app.api.upload import router as upload_router
 from app.api.chat import router as chat_router
+from app.api.cache import router as cache_router
+from app.api.metrics import router as metrics_router
+from app.core.config import settings
+from app.services.worker_pool import worker_pool
+from app.services.ai_service import AIService
+from app.services.excel_service import ExcelService
+from app.services.catalog_service import catalog
+from app.services.janitor import janitor
+from app.services.metrics import (
+    HTTP_REQUESTS, HTTP_REQUEST_SECONDS, server_timing, start_request_spans, stop_request_spans
+)
+
+# Configurar los logs (sustituyen a los print de diagnóstico)
+logging.basicConfig(
+    level=settings.LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("excelia.requests")
 
 # Crear la aplicación FastAPI
 app = FastAPI(
@@ -21,9 +42,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Medir cada petición: histograma por ruta, cabecera Server-Timing con las etapas
+# y una línea de log con el desglose
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    spans, token = start_request_spans()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        stop_request_spans(token)
+        # Plantilla de la ruta (no la URL) para no crear una serie por archivo
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=status)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=status)
+        if settings.LOG_REQUESTS:
+            logger.info(
+                "%s %s %d %.1f ms %s", request.method, request.url.path, status, elapsed * 1000,
+                server_timing(spans),
+                extra={"route": route, "status": status, "duration_ms": elapsed * 1000, "spans": spans}
+            )
+    
+    if spans:
+        response.headers["Server-Timing"] = server_timing(spans)
+    return response
+
 # Montar los routers
 app.include_router(upload_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
+app.include_router(cache_router, prefix="/api")
+app.include_router(metrics_router)
+
+# Sincronizar el catálogo de archivos e iniciar la limpieza periódica
+@app.on_event("startup")
+async def start_janitor():
+    await asyncio.to_thread(ExcelService.sync_catalog)
+    janitor.start()
+
+# Detener la limpieza y el pool de workers y cerrar el cliente de OpenAI al apagar el servidor
+@app.on_event("shutdown")
+async def shutdown_worker_pool():
+    await janitor.stop()
+    worker_pool.shutdown()
+    await AIService.close()
+    catalog.close()
 
 # Endpoint raíz
 @app.get("/")
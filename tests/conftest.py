@@ -0,0 +1,25 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.services.cache_service import answer_cache, context_cache, dataset_cache, metadata_cache
+from app.services.excel_service import ExcelService
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Cliente de la API con un directorio de archivos (y catálogo) propio"""
+    monkeypatch.setattr(ExcelService, "TEMP_DIR", str(tmp_path))
+    for cache in (dataset_cache, metadata_cache, context_cache, answer_cache):
+        cache.clear()
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def upload(client):
+    """Sube un CSV y devuelve el nombre con el que se guardó"""
+    def upload(name: str, content: bytes) -> str:
+        response = client.post("/api/upload/", files={"file": (name, content, "text/csv")})
+        assert response.status_code == 200, response.text
+        return response.json()["filename"]
+    return upload
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from app.services.ai_service import AIService
+from app.services.excel_service import ExcelService
+
+
+class FakeClient:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    async def close(self):
+        self.closed.set()
+
+
+@pytest.fixture(autouse=True)
+def reset_client(monkeypatch):
+    monkeypatch.setattr(AIService, "_client", None)
+    monkeypatch.setattr(AIService, "_semaphore", None)
+    monkeypatch.setattr(AIService, "_loop", None)
+
+
+async def bind(client=None):
+    AIService._bind_loop()
+    if client is not None:
+        AIService._client = client
+    await asyncio.sleep(0)
+
+
+def test_client_of_a_finished_loop_is_closed_when_rebinding():
+    previous = FakeClient()
+    asyncio.run(bind(previous))
+
+    asyncio.run(bind())
+    assert previous.closed.is_set()
+    assert AIService._client is None
+
+
+def test_client_of_a_running_loop_is_closed_in_that_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        previous = FakeClient()
+        asyncio.run_coroutine_threadsafe(bind(previous), loop).result()
+
+        asyncio.run(bind())
+        assert previous.closed.wait(timeout=5)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+class Stream:
+    def __init__(self, words):
+        self.words = iter(words)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            word = next(self.words)
+        except StopIteration:
+            raise StopAsyncIteration
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))], usage=None)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_stream_is_closed_when_the_client_stops_reading(monkeypatch):
+    stream = Stream(["Uno ", "dos ", "tres"])
+
+    async def create(**kwargs):
+        return stream
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(AIService, "get_client", classmethod(lambda cls: client))
+    df = pd.DataFrame({"Ventas": [1, 2]})
+
+    async def read_first():
+        answer = AIService.stream_answer(df, ExcelService.build_summary(df), "¿Qué tendencia hay?")
+        first = await answer.__anext__()
+        # El cliente SSE se desconecta tras el primer fragmento
+        await answer.aclose()
+        return first
+
+    assert asyncio.run(read_first()) == "Uno "
+    assert stream.closed
@@ -0,0 +1,110 @@
+import gc
+import glob
+
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.services.cache_service import dataset_cache
+from app.services.excel_service import ExcelService
+from app.services.profiling import SummaryAccumulator
+
+CSV = b"Producto,Ventas,Precio\nA,10,1.5\nB,20,2.5\nA,30,3.0\nB,15,0.5\n"
+
+
+def append(client, filename, content):
+    return client.post(f"/api/files/{filename}/append", files={"file": ("nuevas.csv", content)})
+
+
+def segments(filename):
+    sidecar = ExcelService.sidecar_path(ExcelService.get_file_path(filename))
+    return glob.glob(f"{glob.escape(sidecar)}.segments-*/*.feather")
+
+
+def test_append_writes_segments_that_match_a_fresh_parse(client, upload):
+    filename = upload("ventas.csv", CSV)
+    assert append(client, filename, b"Producto,Ventas,Precio\nC,40,4.25\n").status_code == 200
+    response = append(client, filename, b"Producto,Ventas,Precio\nA,,1.0\n")
+    assert response.status_code == 200
+    assert response.json()["rows"] == 6
+    # Las filas nuevas se guardan aparte: la copia columnar no se reescribe
+    assert len(segments(filename)) == 2
+
+    file_path = ExcelService.get_file_path(filename)
+    dataset_cache.clear()
+    df, summary = ExcelService.read_file(file_path)
+    fresh, _ = ExcelService.compact(pd.read_csv(file_path))
+    expected = SummaryAccumulator().update(fresh).to_summary()
+    pd.testing.assert_frame_equal(df.astype(object), fresh.astype(object), check_dtype=False)
+    for key in ("rows", "missing_values", "numeric_columns", "numeric_stats"):
+        assert summary[key] == expected[key]
+
+    rows = client.get(f"/api/files/{filename}/rows", params={"offset": 4}).json()["rows"]
+    assert rows == [
+        {"Producto": "C", "Ventas": "40.0", "Precio": "4.25"},
+        {"Producto": "A", "Ventas": None, "Precio": "1.0"},
+    ]
+
+
+def test_append_rewrites_the_sidecar_when_the_compacted_type_is_too_small(client, upload):
+    filename = upload("ventas.csv", CSV)
+    assert append(client, filename, b"Producto,Ventas,Precio\nC,40,4.25\n").status_code == 200
+    # Ventas se compactó como int8: 1000 no cabe y se vuelve a compactar todo
+    assert append(client, filename, b"Producto,Ventas,Precio\nC,1000,1.0\n").status_code == 200
+    assert segments(filename) == []
+
+    page = client.get(f"/api/files/{filename}/rows", params={"columns": "Ventas"}).json()
+    assert [row["Ventas"] for row in page["rows"]] == ["10", "20", "30", "15", "40", "1000"]
+
+
+def test_append_compacts_after_too_many_segments(client, upload, monkeypatch):
+    monkeypatch.setattr(settings, "SIDECAR_MAX_SEGMENTS", 2)
+    filename = upload("ventas.csv", CSV)
+    for value in (40, 50):
+        assert append(client, filename, f"Producto,Ventas,Precio\nC,{value},1.0\n".encode()).status_code == 200
+    assert len(segments(filename)) == 2
+    assert append(client, filename, b"Producto,Ventas,Precio\nC,60,1.0\n").status_code == 200
+    assert segments(filename) == []
+    assert client.get(f"/api/files/{filename}/rows").json()["total_rows"] == 7
+
+
+@pytest.mark.parametrize("content", [
+    b"Producto,Importe,Precio\nC,40,1.0\n",
+    b"Producto,Ventas,Precio\nC,cuarenta,1.0\n",
+    b"Producto,Ventas,Precio\nC,40.5,1.0\n",
+    b"Producto,Ventas\nC,40\n",
+])
+def test_append_rejects_rows_that_do_not_match_the_schema(client, upload, content):
+    filename = upload("ventas.csv", CSV)
+    response = append(client, filename, content)
+    assert response.status_code == 422
+    assert client.get(f"/api/files/{filename}/rows").json()["total_rows"] == 4
+
+
+def test_append_validates_dates(client, upload, monkeypatch):
+    # El motor pyarrow reconoce las fechas y horas ISO al analizar el CSV
+    monkeypatch.setattr(settings, "CSV_ENGINE", "pyarrow")
+    filename = upload("pedidos.csv", b"Fecha,Ventas\n2024-01-01 09:00:00,10\n2024-01-02 10:30:00,20\n")
+    assert append(client, filename, b"Fecha,Ventas\nayer,30\n").status_code == 422
+
+    assert append(client, filename, b"Fecha,Ventas\n2024-01-03 08:15:00,30\n").status_code == 200
+    df, summary = ExcelService.read_file(ExcelService.get_file_path(filename))
+    assert summary["dtypes"]["Fecha"].startswith("datetime64")
+    assert df["Fecha"].iloc[-1] == pd.Timestamp("2024-01-03 08:15:00")
+
+
+def test_delete_removes_segments(client, upload):
+    filename = upload("ventas.csv", CSV)
+    assert append(client, filename, b"Producto,Ventas,Precio\nC,40,1.0\n").status_code == 200
+    sidecar = ExcelService.sidecar_path(ExcelService.get_file_path(filename))
+    assert segments(filename)
+
+    assert client.delete(f"/api/files/{filename}").status_code == 200
+    assert glob.glob(f"{glob.escape(sidecar)}*") == []
+
+
+def test_append_locks_are_released_after_use(client, upload):
+    filename = upload("ventas.csv", CSV)
+    assert append(client, filename, b"Producto,Ventas,Precio\nC,40,1.0\n").status_code == 200
+    gc.collect()
+    assert len(ExcelService._append_locks) == 0
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from app.services.cache_service import LRUCache, answer_cache, context_cache, invalidate_dataset_version
+
+
+def test_lru_cache_evicts_least_recently_used_by_bytes():
+    cache = LRUCache(10, len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    # Usar "a" la convierte en la más reciente: se expulsa "b"
+    assert cache.get("a") == "xxxx"
+    cache.put("c", "xxxx")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "xxxx" and cache.get("c") == "xxxx"
+    stats = cache.stats()
+    assert stats["bytes"] == 8 and stats["evictions"] == 1
+
+
+def test_lru_cache_skips_entries_larger_than_the_cache():
+    cache = LRUCache(10, len)
+    cache.put("a", "xxxx")
+    cache.put("grande", "x" * 11)
+    assert cache.get("grande") is None
+    assert cache.get("a") == "xxxx"
+
+    # Reemplazar una entrada descuenta su tamaño anterior
+    cache.put("a", "xxxxxxxx")
+    assert cache.stats()["bytes"] == 8
+
+
+def test_lru_cache_entries_expire_after_ttl():
+    cache = LRUCache(100, len, ttl=0.05)
+    cache.put("a", "respuesta")
+    assert cache.get("a") == "respuesta"
+
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["entries"] == 0 and stats["bytes"] == 0
+
+
+class Profile:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+@pytest.fixture
+def version_caches():
+    for cache in (context_cache, answer_cache):
+        cache.clear()
+    yield
+    for cache in (context_cache, answer_cache):
+        cache.clear()
+
+
+def test_invalidate_dataset_version_only_drops_that_version(version_caches):
+    answer_cache.put(("v1", None, "total", "modelo", 0.3), "100")
+    answer_cache.put(("v2", None, "total", "modelo", 0.3), "200")
+    context_cache.put(("v1", "Hoja1"), Profile(10))
+
+    assert invalidate_dataset_version("v1") == 2
+    assert answer_cache.get(("v1", None, "total", "modelo", 0.3)) is None
+    assert context_cache.get(("v1", "Hoja1")) is None
+    assert answer_cache.get(("v2", None, "total", "modelo", 0.3)) == "200"
@@ -0,0 +1,18 @@
+CSV = b"Producto,Ventas\nA,10\nB,20\n"
+
+
+def test_catalog_lists_uploaded_files(client, upload):
+    names = [upload(f"ventas{n}.csv", CSV + str(n).encode() + b",0\n") for n in range(3)]
+
+    listed = client.get("/api/files/", params={"limit": 2}).json()
+    assert len(listed) == 2 and set(listed) <= set(names)
+    page = client.get("/api/files/catalog", params={"offset": 1, "limit": 5}).json()
+    assert page["total"] == 3
+    assert len(page["files"]) == 2
+
+
+def test_metrics_report_catalog_stats(client, upload):
+    upload("ventas.csv", CSV)
+    text = client.get("/metrics").text
+    assert "excelia_catalog_files 1" in text
+    assert "excelia_catalog_storage_bytes 0" not in text
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.services.excel_service import ExcelService
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame({
+        "region": rng.choice(["Norte", "Sur", "Este"], 200),
+        "unidades": rng.integers(0, 500, 200).astype(float),
+        "importe": rng.normal(100, 15, 200).round(2),
+    })
+    # Valores faltantes repartidos entre bloques
+    df.loc[::17, "unidades"] = np.nan
+    df.loc[::23, "region"] = None
+    return df
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_ROWS", 37)
+    monkeypatch.setattr(settings, "CHUNKED_SAMPLE_ROWS", 20)
+
+
+def load_both(paths, monkeypatch):
+    """Resumen completo del primer archivo y por bloques del segundo (mismo contenido)"""
+    monkeypatch.setattr(settings, "CHUNKED_THRESHOLD_BYTES", 1 << 40)
+    df, full = ExcelService._load(paths[0])
+    monkeypatch.setattr(settings, "CHUNKED_THRESHOLD_BYTES", 0)
+    sample, chunked = ExcelService._load(paths[1])
+    return df, full, sample, chunked
+
+
+def assert_same_summary(full, chunked):
+    for key in ("rows", "columns", "column_names", "missing_values", "numeric_columns"):
+        assert chunked[key] == full[key]
+    for stat, values in full["numeric_stats"].items():
+        assert chunked["numeric_stats"][stat] == pytest.approx(values)
+    region = full["approx_profile"]["region"]
+    assert chunked["approx_profile"]["region"]["top"] == region["top"]
+    assert chunked["approx_profile"]["region"]["distinct"] == region["distinct"]
+
+
+def test_chunked_csv_summary_matches_full_load(tmp_path, frame, small_chunks, monkeypatch):
+    paths = [str(tmp_path / name) for name in ("completo.csv", "bloques.csv")]
+    for path in paths:
+        frame.to_csv(path, index=False)
+
+    df, full, sample, chunked = load_both(paths, monkeypatch)
+    assert chunked["sampled"] and chunked["sample_rows"] == 20
+    assert_same_summary(full, chunked)
+    pd.testing.assert_frame_equal(sample.astype(object), df.head(20).astype(object), check_dtype=False)
+
+    # Segunda carga: el resumen guardado se reutiliza sin recorrer el archivo
+    _, again = ExcelService._load(paths[1])
+    assert again == chunked
+
+
+def test_chunked_xlsx_summary_matches_full_load(tmp_path, frame, small_chunks, monkeypatch):
+    pytest.importorskip("openpyxl")
+    paths = [str(tmp_path / name) for name in ("completo.xlsx", "bloques.xlsx")]
+    for path in paths:
+        frame.to_excel(path, index=False)
+
+    _, full, _, chunked = load_both(paths, monkeypatch)
+    assert chunked["sampled"]
+    assert_same_summary(full, chunked)
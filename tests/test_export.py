@@ -0,0 +1,75 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+
+ROWS = 2500
+
+
+@pytest.fixture
+def dataset(client, upload, monkeypatch):
+    """Archivo con más filas que EXPORT_CHUNK_ROWS (la exportación va en varios bloques)"""
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_ROWS", 1000)
+    df = pd.DataFrame({
+        "id": np.arange(ROWS),
+        "importe": np.where(np.arange(ROWS) % 7 == 0, np.nan, np.arange(ROWS) / 4),
+        "nota": [None if i % 5 == 0 else f"n{i}" for i in range(ROWS)],
+    })
+    filename = upload("año fiscal.csv", df.to_csv(index=False).encode("utf-8"))
+    return filename, df
+
+
+def export(client, filename, format, **params):
+    response = client.get(f"/api/files/{filename}/export", params={"format": format, **params})
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_ndjson_export_round_trips(client, dataset):
+    filename, df = dataset
+    response = export(client, filename, "ndjson")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == ROWS
+    assert records[1] == {"id": 1, "importe": 0.25, "nota": "n1"}
+    assert records[0] == {"id": 0, "importe": None, "nota": None}
+    pd.testing.assert_frame_equal(pd.DataFrame(records), df, check_dtype=False)
+
+
+def test_csv_export_has_one_header_and_every_row(client, dataset):
+    filename, df = dataset
+    text = export(client, filename, "csv").text
+    lines = text.splitlines()
+    assert lines[0] == "id,importe,nota"
+    assert lines.count("id,importe,nota") == 1
+    assert len(lines) == ROWS + 1
+    pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(text)), df, check_dtype=False)
+
+
+def test_arrow_export_is_a_readable_ipc_stream(client, dataset):
+    pa = pytest.importorskip("pyarrow")
+    filename, df = dataset
+    content = export(client, filename, "arrow", columns="id,importe").content
+
+    reader = pa.ipc.open_stream(content)
+    batches = list(reader)
+    assert len(batches) == 3
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    assert table.column_names == ["id", "importe"]
+    assert table.column("id").to_pylist() == list(range(ROWS))
+    assert table.column("importe").null_count == df["importe"].isna().sum()
+
+
+def test_export_download_name_and_errors(client, dataset):
+    filename, _ = dataset
+    response = export(client, filename, "csv")
+    assert response.headers["content-disposition"] == "attachment; filename*=UTF-8''a%C3%B1o%20fiscal.csv"
+    assert export(client, filename, "ndjson").headers["content-disposition"].endswith("fiscal.ndjson")
+
+    assert client.get(f"/api/files/{filename}/export", params={"format": "xml"}).status_code == 400
+    assert client.get(f"/api/files/{filename}/export", params={"columns": "nada"}).status_code == 400
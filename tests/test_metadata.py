@@ -0,0 +1,45 @@
+import glob
+import threading
+
+from app.services.excel_service import ExcelService
+
+
+def test_concurrent_sheet_metadata_writes(tmp_path):
+    file_path = str(tmp_path / "libro.csv")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("a,b\n1,2\n")
+
+    errors = []
+
+    def write(sheet):
+        try:
+            for i in range(200):
+                ExcelService.save_sheet_metadata(file_path, sheet, shape={"rows": i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(f"Hoja{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # Ninguna escritura pisa las de las otras hojas
+    datasets = ExcelService.load_metadata(file_path)["datasets"]
+    assert {sheet: values["shape"]["rows"] for sheet, values in datasets.items()} == {
+        f"Hoja{n}": 199 for n in range(4)
+    }
+    assert glob.glob(str(tmp_path / "*.tmp")) == []
+
+
+def test_metadata_is_discarded_when_the_file_changes(tmp_path):
+    file_path = str(tmp_path / "datos.csv")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("a\n1\n")
+    ExcelService.save_metadata(file_path, version="v1")
+    assert ExcelService.load_metadata(file_path)["version"] == "v1"
+
+    with open(file_path, "a", encoding="utf-8") as f:
+        f.write("22\n")
+    assert ExcelService.load_metadata(file_path) == {}
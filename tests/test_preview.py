@@ -0,0 +1,23 @@
+from app.services.cache_service import dataset_cache
+from app.services.excel_service import ExcelService
+
+# Un campo entre comillas con saltos de línea, terminadores \r\n y líneas en blanco al final
+CSV = b'Producto,Nota\r\nA,"primera\r\nsegunda\r\ntercera"\r\nB,ok\r\n\r\n\r\n'
+
+
+def test_preview_does_not_report_a_line_count_as_the_row_count(client):
+    file_path = ExcelService.get_file_path("notas.csv")
+    with open(file_path, "wb") as f:
+        f.write(CSV)
+
+    preview = ExcelService.get_preview(file_path)
+    assert preview["rows_exact"] is False
+    assert preview["rows"] is None
+    assert [row["Producto"] for row in preview["preview_data"]] == ["A", "B"]
+
+    # Tras el análisis completo las dimensiones quedan guardadas y son exactas
+    ExcelService.read_file(file_path)
+    dataset_cache.clear()
+    preview = ExcelService.get_preview(file_path)
+    assert preview["rows_exact"] is True
+    assert preview["rows"] == 2
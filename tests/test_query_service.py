@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from app.services.query_service import QueryService
+
+
+@pytest.fixture
+def dataset():
+    df = pd.DataFrame({
+        "Producto": ["A", "B", "A", "C"],
+        "Ventas": [10, 20, 30, 40],
+        "Region": ["N", "S", "N", "S"],
+        "Año": [2022, 2023, 2023, 2022],
+    })
+    summary = {"column_names": list(df.columns), "rows": len(df)}
+    return df, summary
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("¿Cuál es el total de Ventas?", "El total de Ventas es 100."),
+    ("¿Cuál es la suma de Ventas?", "El total de Ventas es 100."),
+    ("What is the average Ventas?", "El promedio de Ventas es 25."),
+    ("max Ventas", "El valor máximo de Ventas es 40."),
+    ("¿Cuántas filas hay?", "Hay 4 filas."),
+    ("¿Cuántas filas hay donde Region = N?", "Hay 2 filas (Region = N)."),
+    ("total de Ventas donde Region = N", "El total de Ventas (Region = N) es 40."),
+    ("total de Ventas donde Año >= 2023", "El total de Ventas (Año >= 2023) es 50."),
+    ("total de Ventas donde Ventas > 15.5", "El total de Ventas (Ventas > 15.5) es 90."),
+    ("¿Cuántos valores distintos de Producto hay?", "El número de valores distintos de Producto es 3."),
+    ("¿Cuántos valores vacíos hay en la columna Ventas?", "La columna Ventas tiene 0 valores vacíos de 4 filas."),
+    ("¿Qué Producto tiene la mayor Ventas?", "El valor máximo de Ventas es 40 (Producto: C)."),
+])
+def test_answers_simple_questions(dataset, question, expected):
+    df, summary = dataset
+    assert QueryService.try_answer(df, summary, question) == expected
+
+
+def test_answers_grouped_questions(dataset):
+    df, summary = dataset
+    answer = QueryService.try_answer(df, summary, "suma de Ventas por Region")
+    assert answer == "El total de Ventas por Region:\n- S: 60\n- N: 40"
+
+    # La agrupación que sigue a un filtro también se aplica
+    answer = QueryService.try_answer(df, summary, "total de Ventas donde Region = N por Producto")
+    assert answer == "El total de Ventas por Producto:\n- A: 40"
+
+
+@pytest.mark.parametrize("question", [
+    "¿Cuál es el total de Ventas del Producto A?",
+    "Total de Ventas en la Region N",
+    "total de Ventas en 2023",
+    "promedio de Ventas excluyendo Region S",
+    "max Ventas for Producto A",
+    "¿Cuántas filas hay con Region N?",
+    "suma de Ventas por Region excepto N",
+    "Total Ventas por Producto, solo 2023",
+    "total de Ventas donde Region = N y Año = 2023",
+    "¿Cuántos Productos distintos hay?",
+    "Describe las tendencias principales de los datos",
+])
+def test_declines_questions_with_unparsed_parts(dataset, question):
+    df, summary = dataset
+    assert QueryService.try_answer(df, summary, question) is None
+
+
+def test_filter_value_keeps_original_case():
+    df = pd.DataFrame({"Region": ["R1", "R2", "R1"], "Ventas": [1, 2, 3]})
+    summary = {"column_names": list(df.columns), "rows": len(df)}
+    answer = QueryService.try_answer(df, summary, "total de Ventas donde Region = R1")
+    assert answer == "El total de Ventas (Region = R1) es 4."
+
+
+def test_sampled_dataset_answers_from_summary_only(dataset):
+    df, summary = dataset
+    summary = dict(
+        summary,
+        sampled=True,
+        numeric_columns=["Ventas", "Año"],
+        missing_values={"Producto": 0, "Ventas": 0, "Region": 0, "Año": 0},
+        numeric_stats={"mean": {"Ventas": 25.0}, "min": {"Ventas": 10}, "max": {"Ventas": 40}},
+    )
+    assert QueryService.try_answer(df.head(2), summary, "promedio de Ventas") == "El promedio de Ventas es 25."
+    assert QueryService.try_answer(df.head(2), summary, "total de Ventas donde Region = N") is None
@@ -0,0 +1,30 @@
+CSV = b"Producto,Ventas\nA,10\nB,20\nC,30\n"
+
+
+def test_rows_page_and_projection(client, upload):
+    filename = upload("ventas.csv", CSV)
+    response = client.get(f"/api/files/{filename}/rows", params={"offset": 1, "limit": 5, "columns": "Ventas"})
+    assert response.status_code == 200
+    page = response.json()
+    assert page["total_rows"] == 3
+    assert page["rows"] == [{"Ventas": "20"}, {"Ventas": "30"}]
+
+
+def test_rows_etag_returns_304_until_the_file_changes(client, upload):
+    filename = upload("ventas.csv", CSV)
+    url = f"/api/files/{filename}/rows"
+    first = client.get(url)
+    etag = first.headers["etag"]
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    # Otra página u otras columnas tienen otra ETag
+    assert client.get(url, params={"limit": 1}).headers["etag"] != etag
+
+    appended = client.post(f"/api/files/{filename}/append", files={"file": ("nuevas.csv", b"Producto,Ventas\nD,40\n")})
+    assert appended.status_code == 200
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["total_rows"] == 4
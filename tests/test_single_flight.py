@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.services.cache_service import answer_flight, parse_flight
+
+
+class CountingJob:
+    """Trabajo lento que cuenta sus ejecuciones"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return self.result
+
+
+@pytest.mark.parametrize("flight", [parse_flight, answer_flight])
+def test_concurrent_callers_share_one_execution(flight):
+    job = CountingJob("resultado")
+
+    async def main():
+        return await asyncio.gather(*(flight.run(("v1", "compartido"), job) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["resultado"] * 10
+    assert job.calls == 1
+    assert not flight.in_flight(("v1", "compartido"))
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_job():
+    job = CountingJob("resultado")
+    key = ("v1", "cancelado")
+
+    async def main():
+        first = asyncio.create_task(parse_flight.run(key, job))
+        second = asyncio.create_task(parse_flight.run(key, job))
+        await asyncio.sleep(0.01)
+        # La petición que inició el trabajo se cancela; la otra recibe el resultado
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "resultado"
+    assert job.calls == 1
+
+
+def test_errors_are_shared_by_all_callers():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("archivo no válido")
+
+    async def main():
+        return await asyncio.gather(
+            *(answer_flight.run(("v1", "error"), fail) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
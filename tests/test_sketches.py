@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from pandas.util import hash_array
+
+from app.services.profiling import SummaryAccumulator
+from app.services.sketches import HeavyHitters, HyperLogLog, QuantileDigest
+
+
+def test_hyperloglog_merge_matches_single_pass():
+    values = np.arange(100_000, dtype=np.float64)
+    whole = HyperLogLog()
+    whole.update(hash_array(values))
+    merged = HyperLogLog()
+    for part in np.array_split(values, 7):
+        sketch = HyperLogLog()
+        sketch.update(hash_array(part))
+        merged.merge(sketch)
+
+    assert np.array_equal(merged.registers, whole.registers)
+    assert abs(merged.estimate() - 100_000) / 100_000 < 0.05
+
+
+def test_quantile_digest_merge_keeps_rank_error_small():
+    rng = np.random.default_rng(7)
+    values = rng.lognormal(size=200_000)
+    merged = QuantileDigest()
+    for part in np.array_split(values, 20):
+        digest = QuantileDigest()
+        digest.update(part)
+        merged.merge(digest)
+
+    ordered = np.sort(values)
+    for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+        rank = np.searchsorted(ordered, merged.quantile(q)) / len(values)
+        assert abs(rank - q) < 0.01
+    assert merged.min == ordered[0] and merged.max == ordered[-1]
+
+
+def test_heavy_hitters_merge_is_exact_below_capacity():
+    first, second = HeavyHitters(), HeavyHitters()
+    first.update(np.array(["a", "b"], dtype=object), np.array([3, 1]))
+    second.update(np.array(["b", "c"], dtype=object), np.array([4, 2]))
+    first.merge(second)
+
+    assert not first.truncated
+    assert first.top(3) == [
+        {"value": "b", "count": 5, "error": 0},
+        {"value": "a", "count": 3, "error": 0},
+        {"value": "c", "count": 2, "error": 0},
+    ]
+
+
+def assert_counts_within_bound(sketch, truth):
+    for key, count in truth.items():
+        estimate = sketch.counts.get(key, 0)
+        assert estimate <= count <= estimate + sketch.error
+
+
+def test_heavy_hitters_bound_covers_a_key_never_in_a_block_top_k():
+    # "x" aparece en todos los bloques pero siempre por debajo de 80 valores
+    # exclusivos del bloque: ningún bloque lo tiene entre sus 64 más frecuentes
+    sketch, truth, rows = HeavyHitters(), {"x": 0}, 0
+    for block in range(50):
+        keys = np.array([f"b{block}-{i}" for i in range(80)] + ["x"], dtype=object)
+        counts = np.array([10] * 80 + [5])
+        sketch.update(keys, counts)
+        truth.update({key: int(count) for key, count in zip(keys, counts) if key != "x"})
+        truth["x"] += 5
+        rows += int(counts.sum())
+
+    assert sketch.truncated
+    assert_counts_within_bound(sketch, truth)
+    assert sketch.error <= rows / (sketch.capacity + 1)
+    assert all(item["error"] == sketch.error for item in sketch.top(10))
+
+
+def test_heavy_hitters_keep_keys_above_the_error_bound():
+    rng = np.random.default_rng(5)
+    parts = []
+    for _ in range(20):
+        values = np.concatenate([
+            np.array(["frecuente"] * 300, dtype=object),
+            np.array([f"v{n}" for n in rng.integers(0, 5000, 3000)], dtype=object),
+        ])
+        parts.append(values)
+
+    blocks, merged = [], HeavyHitters()
+    for values in parts:
+        keys, counts = np.unique(values, return_counts=True)
+        block = HeavyHitters()
+        block.update(keys, counts)
+        blocks.append(block)
+        merged.merge(block)
+
+    keys, counts = np.unique(np.concatenate(parts), return_counts=True)
+    truth = dict(zip(keys.tolist(), counts.tolist()))
+    assert_counts_within_bound(merged, truth)
+    assert merged.top(1)[0]["value"] == "frecuente"
+    assert merged.counts["frecuente"] + merged.error >= truth["frecuente"] >= merged.counts["frecuente"]
+
+
+def test_accumulator_chunks_and_round_trip_match_single_pass():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({
+        "region": rng.choice(["Norte", "Sur", "Este"], 30_000),
+        "importe": rng.normal(100, 15, 30_000).round(2),
+    })
+    whole = SummaryAccumulator().update(df).to_summary()["approx_profile"]
+
+    first = SummaryAccumulator().update(df.iloc[:10_000])
+    # Los sketches se guardan aparte del acumulador
+    assert "sketches" not in first.to_dict()
+    restored = SummaryAccumulator.from_dict(first.to_dict(), first.sketches_to_dict())
+    restored.update(df.iloc[10_000:20_000])
+    restored.merge(SummaryAccumulator().update(df.iloc[20_000:]))
+    profile = restored.to_summary()["approx_profile"]
+
+    assert profile["region"]["top"] == whole["region"]["top"]
+    assert profile["region"]["distinct"] == 3 and profile["region"]["distinct_exact"]
+    for name, value in whole["importe"]["quantiles"].items():
+        assert abs(profile["importe"]["quantiles"][name] - value) < 0.5
+
+
+def test_accumulator_without_stored_sketches_has_no_profile():
+    accumulator = SummaryAccumulator().update(pd.DataFrame({"a": [1, 2, 3]}))
+    restored = SummaryAccumulator.from_dict(accumulator.to_dict())
+    assert restored.sketches is None
+    assert "approx_profile" not in restored.to_summary()
@@ -0,0 +1,49 @@
+import asyncio
+import glob
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.services.excel_service import ExcelService, FileTooLargeError
+
+CSV = b"Producto,Ventas\nA,10\nB,20\nC,30\n"
+
+
+def test_upload_over_the_limit_returns_413(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", 16)
+    response = client.post("/api/upload/", files={"file": ("ventas.csv", CSV, "text/csv")})
+    assert response.status_code == 413
+    assert glob.glob(str(tmp_path / ".upload-*")) == []
+
+
+def test_streamed_upload_over_the_limit_leaves_no_partial_file(client, tmp_path, monkeypatch):
+    # Sin tamaño declarado: el límite se comprueba al recibir los bloques
+    monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", 16)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 8)
+    upload = UploadFile(io.BytesIO(CSV), filename="ventas.csv")
+    with pytest.raises(FileTooLargeError):
+        asyncio.run(ExcelService.save_upload(upload, "ventas.csv"))
+    assert glob.glob(str(tmp_path / ".upload-*")) == []
+    assert glob.glob(str(tmp_path / "*ventas.csv")) == []
+
+
+def test_reupload_of_the_same_bytes_is_deduplicated(client, tmp_path, monkeypatch):
+    first = client.post("/api/upload/", files={"file": ("ventas.csv", CSV, "text/csv")}).json()
+    assert first["deduplicated"] is False
+
+    parses = []
+    parse_file = ExcelService._parse_file
+    monkeypatch.setattr(
+        ExcelService, "_parse_file", staticmethod(lambda *args: parses.append(args) or parse_file(*args))
+    )
+    second = client.post("/api/upload/", files={"file": ("copia.csv", CSV, "text/csv")}).json()
+    assert second["deduplicated"] is True
+    assert second["filename"] == first["filename"]
+    assert parses == []
+    assert len(glob.glob(str(tmp_path / "*.csv"))) == 1
+
+    # Un contenido distinto sí se analiza
+    client.post("/api/upload/", files={"file": ("ventas.csv", CSV + b"D,40\n", "text/csv")})
+    assert len(parses) == 1
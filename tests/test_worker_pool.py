@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from app.services import excel_service
+from app.services.excel_service import ExcelService
+from app.services.worker_pool import WorkerPool, WorkerPoolSaturatedError
+
+CSV = b"Producto,Ventas\nA,10\nB,20\n"
+
+
+@pytest.fixture
+def busy_pool(monkeypatch):
+    """Pool de un solo hueco (sin cola) ocupado por un trabajo bloqueado"""
+    pool = WorkerPool("thread", max_workers=1, max_queue=0, timeout=30)
+    monkeypatch.setattr(excel_service, "worker_pool", pool)
+    release = threading.Event()
+    holder = threading.Thread(target=asyncio.run, args=(pool.run(release.wait),))
+    holder.start()
+    while pool.stats()["pending"] < 1:
+        time.sleep(0.01)
+    yield pool
+    release.set()
+    holder.join()
+    pool.shutdown()
+
+
+def test_saturated_pool_rejects_jobs(busy_pool):
+    with pytest.raises(WorkerPoolSaturatedError):
+        asyncio.run(busy_pool.run(sum, [1, 2]))
+    assert busy_pool.stats()["rejected"] == 1
+
+
+def test_saturated_pool_returns_503(client, busy_pool):
+    response = client.post("/api/upload/", files={"file": ("ventas.csv", CSV, "text/csv")})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+def test_slow_job_returns_504(client, monkeypatch):
+    pool = WorkerPool("thread", max_workers=1, max_queue=1, timeout=0.05)
+    monkeypatch.setattr(excel_service, "worker_pool", pool)
+    parse_file = ExcelService._parse_file
+    monkeypatch.setattr(
+        ExcelService, "_parse_file", staticmethod(lambda *args: time.sleep(0.3) or parse_file(*args))
+    )
+    try:
+        response = client.post("/api/upload/", files={"file": ("ventas.csv", CSV, "text/csv")})
+        assert response.status_code == 504
+        assert pool.stats()["timeouts"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_process_pool_runs_jobs_in_another_process(tmp_path):
+    file_path = str(tmp_path / "ventas.csv")
+    with open(file_path, "wb") as f:
+        f.write(CSV)
+    pool = WorkerPool("process", max_workers=1, max_queue=1, timeout=60)
+    try:
+        assert asyncio.run(pool.run(os.getpid)) != os.getpid()
+        df = asyncio.run(pool.run(ExcelService._parse_file, file_path))
+        assert df["Ventas"].tolist() == [10, 20]
+        assert pool.stats()["completed"] == 2
+    finally:
+        pool.shutdown()